@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class ProjectConfig(AppConfig):
+    """Project-wide wiring that doesn't belong to any one app."""
+    name = 'Assignment1'
+
+    def ready(self):
+        from .db import record_connection
+
+        # Count new database connections for the pool statistics endpoint
+        connection_created.connect(record_connection)
@@ -0,0 +1,101 @@
+"""
+Database connection management for the production settings.
+
+``configure_pooling()`` turns a plain ``DATABASES`` entry into one of three
+connection strategies, selected with ``DB_POOL_MODE``:
+
+``persistent``
+    Keep one connection per worker for ``CONN_MAX_AGE`` seconds, checked
+    with ``CONN_HEALTH_CHECKS`` before reuse. Works with psycopg2.
+``psycopg``
+    Django's native connection pool (psycopg 3 and ``psycopg_pool``).
+``pgbouncer``
+    Persistent connections to a PgBouncer running in transaction mode;
+    server-side cursors are disabled since they can't span transactions.
+
+``pool_stats()`` reports what each worker is doing with its connections.
+"""
+import importlib.util
+import os
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+
+POOL_MODES = ('persistent', 'psycopg', 'pgbouncer')
+
+_lock = threading.Lock()
+_opened = {}
+_started = time.time()
+
+
+def configure_pooling(database, mode='persistent', conn_max_age=600, min_size=2,
+                      max_size=10, timeout=10, connect_timeout=5):
+    """Return a copy of ``database`` configured for the given pool ``mode``."""
+    if mode not in POOL_MODES:
+        raise ImproperlyConfigured(
+            f"DB_POOL_MODE must be one of {', '.join(POOL_MODES)}, not {mode!r}."
+        )
+
+    database = {**database, 'OPTIONS': {**database.get('OPTIONS', {})}}
+    database['OPTIONS'].setdefault('connect_timeout', connect_timeout)
+
+    if mode == 'psycopg':
+        if importlib.util.find_spec('psycopg_pool') is None:
+            raise ImproperlyConfigured(
+                "DB_POOL_MODE 'psycopg' requires psycopg 3 with the pool extra "
+                "(pip install 'psycopg[binary,pool]')."
+            )
+        # Django refuses persistent connections alongside a pool
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': min_size,
+            'max_size': max_size,
+            'timeout': timeout,
+        }
+        # psycopg_pool takes its own connect timeout from the pool settings
+        database['OPTIONS'].pop('connect_timeout')
+    else:
+        database['CONN_MAX_AGE'] = conn_max_age
+        database['CONN_HEALTH_CHECKS'] = True
+        if mode == 'pgbouncer':
+            database['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+    return database
+
+
+def record_connection(sender, connection, **kwargs):
+    """``connection_created`` receiver counting new connections per alias."""
+    with _lock:
+        _opened[connection.alias] = _opened.get(connection.alias, 0) + 1
+
+
+def pool_stats():
+    """Return connection statistics for every configured database in this worker."""
+    from django.conf import settings
+    from django.db import connections
+
+    stats = {
+        'pid': os.getpid(),
+        'mode': getattr(settings, 'DB_POOL_MODE', 'persistent'),
+        'uptime': round(time.time() - _started, 1),
+        'databases': {},
+    }
+    for alias in connections:
+        connection = connections[alias]
+        entry = {
+            'vendor': connection.vendor,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+            'connected': connection.connection is not None,
+            'connections_opened': _opened.get(alias, 0),
+            'expires_in': None,
+            'pool': None,
+        }
+        if connection.close_at is not None:
+            entry['expires_in'] = round(connection.close_at - time.monotonic(), 1)
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            entry['pool'] = pool.get_stats()
+        stats['databases'][alias] = entry
+    return stats
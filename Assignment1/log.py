@@ -0,0 +1,165 @@
+"""
+Structured, non-blocking logging.
+
+``QueueStreamHandler`` is what the ``LOGGING`` settings attach to loggers:
+request threads only put records on an in-memory queue and a background
+``QueueListener`` formats and writes them, so a slow stdout never shows up
+in response times. ``JsonFormatter`` writes one JSON object per line with
+any ``extra=`` fields included, and ``DebugSampler`` keeps only a fraction
+of DEBUG records per logger so debug output can stay on under load.
+
+Hot paths should still check ``logger.isEnabledFor(logging.DEBUG)`` before
+building debug messages; a disabled level then costs one cached lookup.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else came from ``extra=``
+RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'taskName',
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """
+    Keep a fraction of DEBUG records, per logger.
+
+    ``rates`` maps logger names to the fraction of their DEBUG records to
+    keep; a logger without an entry uses its nearest configured parent, and
+    ``default`` otherwise. Records above DEBUG always pass.
+    """
+
+    def __init__(self, rates=None, default=1.0):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.default = default
+        self._resolved = {}
+
+    def rate_for(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = self.default
+            parts = name.split('.')
+            for i in range(len(parts), 0, -1):
+                prefix = '.'.join(parts[:i])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class QueueStreamHandler(QueueHandler):
+    """
+    Hand records to a background thread that writes them to ``stream``.
+
+    The queue holds at most ``queue_size`` records; when the writer falls
+    that far behind, new records are dropped and counted in ``dropped``
+    rather than blocking the caller. The formatter set on this handler is
+    applied by the writer thread.
+
+    The writer starts with the first record each process logs: a process
+    forked after logging was configured (``gunicorn --preload`` workers)
+    inherits the handler but not its thread, so it gets a queue and writer
+    of its own.
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.target = logging.StreamHandler(stream)
+        self.dropped = 0
+        self._drop_lock = threading.Lock()
+        self.listener = None
+        self._pid = None
+
+    def _start_listener(self):
+        # Called with the handler lock held, which logging resets after a fork
+        if self.listener is not None:
+            # The parent's writer thread didn't survive the fork
+            atexit.unregister(self.listener.stop)
+            self.queue = queue.Queue(self.queue_size)
+            self._drop_lock = threading.Lock()
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+        self._pid = os.getpid()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Resolve the message and traceback now, while the arguments are
+        # still what the caller meant; formatting happens on the writer.
+        # Other handlers see the same record, so change a copy.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+
+    def flush(self):
+        """Block until every queued record has been written."""
+        if self._pid == os.getpid() and self.listener._thread is not None:
+            self.listener.stop()
+            self.listener.start()
+        self.target.flush()
+
+    def close(self):
+        try:
+            if self.listener is not None:
+                atexit.unregister(self.listener.stop)
+                if self._pid == os.getpid() and self.listener._thread is not None:
+                    self.listener.stop()
+        finally:
+            self.target.close()
+            super().close()
@@ -0,0 +1,74 @@
+"""
+Cold-start helpers for the serverless deployment.
+
+``lazy_admin_urls()`` mounts the admin without running admin autodiscovery
+at startup; ``warmup()`` front-loads the URLconf and hot templates so the
+first request doesn't pay for them.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WARMUP_TEMPLATES = [
+    'Base.html',
+    'booking/home.html',
+    'booking/room_list.html',
+    'booking/room_detail.html',
+    'booking/reservation_form.html',
+    'booking/my_reservations.html',
+]
+
+
+class LazyAdminURLConf:
+    """
+    URLconf whose patterns are built the first time the admin is resolved
+    or reversed. Pair with ``SimpleAdminConfig``, which skips autodiscovery.
+    """
+
+    @cached_property
+    def urlpatterns(self):
+        from django.contrib import admin
+        admin.autodiscover()
+        return admin.site.get_urls()
+
+
+def lazy_admin_urls():
+    """Return an ``include()``-style triple for ``path('admin/', ...)``."""
+    return LazyAdminURLConf(), 'admin', 'admin'
+
+
+def warmup(templates=None):
+    """
+    Populate the URL resolver and compile hot templates.
+
+    Returns a dict of timings in milliseconds. Failures are logged rather
+    than raised, so a broken template can't stop the worker from starting.
+    """
+    from django.template import TemplateDoesNotExist, TemplateSyntaxError
+    from django.template.loader import get_template
+    from django.urls import get_resolver
+
+    timings = {}
+
+    started = time.perf_counter()
+    resolver = get_resolver()
+    resolver.url_patterns
+    resolver.reverse_dict
+    timings['urlconf'] = (time.perf_counter() - started) * 1000
+
+    if templates is None:
+        templates = getattr(settings, 'WARMUP_TEMPLATES', DEFAULT_WARMUP_TEMPLATES)
+    for name in templates:
+        started = time.perf_counter()
+        try:
+            get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError) as e:
+            logger.warning("Warmup could not compile template %s: %s", name, e)
+            continue
+        timings[name] = (time.perf_counter() - started) * 1000
+
+    return timings
@@ -12,9 +12,11 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
-import dotenv
 
-dotenv.load_dotenv()
+# Vercel provides the environment directly; skip dotenv on cold starts there
+if os.environ.get('VERCEL') != '1':
+    import dotenv
+    dotenv.load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -54,15 +56,23 @@ INSTALLED_APPS = [
     'widget_tweaks',
     
     # Local apps
+    'Assignment1.apps.ProjectConfig',  # Project-wide signal wiring (connection counts)
     'booking',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',  # Serves STATIC_ROOT with .gz negotiation
+    'booking.metrics.RequestMetricsMiddleware',  # Prometheus request latency and query counts
+    'booking.perf.PerformanceMiddleware',  # Per-route timings; off unless PERF_INSTRUMENTATION
+    'booking.memory.MemoryProfilingMiddleware',  # Per-request peak memory; off unless MEMORY_PROFILING
+    'booking.query_budget.QueryBudgetMiddleware',  # Enforces per-view query budgets
+    'booking.slow_queries.SlowQueryMiddleware',  # Tags slow queries with the view that ran them
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'booking.profiling.ProfilingMiddleware',  # cProfile on ?_profile=1 from staff, or 1 in PROFILE_SAMPLE_RATE
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'booking.middleware.TimezoneMiddleware',  # Custom timezone middleware
@@ -72,7 +82,7 @@ ROOT_URLCONF = 'Assignment1.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'booking.perf.InstrumentedDjangoTemplates',
         'DIRS': [
             BASE_DIR / 'templates',
         ],
@@ -95,6 +105,13 @@ WSGI_APPLICATION = 'Assignment1.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    }
+}
+
 # Check if running in Vercel production environment
 
 #DATABASES = {
@@ -177,10 +194,32 @@ STATICFILES_FINDERS = [
     'django.contrib.staticfiles.finders.AppDirectoriesFinder',
 ]
 
+# {% static %} resolves to the content-hashed names in staticfiles.json, which
+# custom_collectstatic writes; WhiteNoise serves those with far-future headers.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+# Fall back to the unhashed name for files missing from the manifest
+WHITENOISE_MANIFEST_STRICT = False
+
 # Media files (User uploaded content)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Stream every upload to a temporary file instead of buffering it in memory
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Let the front-end server send media files: None, 'x-sendfile' or 'x-accel-redirect'
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'  # nginx internal location for MEDIA_ROOT
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -229,12 +268,24 @@ CRISPY_TEMPLATE_PACK = 'bootstrap5'
 
 # Authentication backends
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
+    'booking.backends.ProfileModelBackend',  # Loads the profile with the user
+    'django.contrib.auth.backends.ModelBackend',  # Sessions created before ProfileModelBackend
 ]
 
+# Cache
+# Use a cache shared between workers (Redis, Memcached or the database cache)
+# in production so room catalog invalidations reach every process.
+CACHES = {
+    'default': {
+        'BACKEND': 'booking.perf.InstrumentedLocMemCache',
+    }
+}
+
 # Session settings
 SESSION_COOKIE_AGE = 1209600  # 2 weeks, in seconds
 SESSION_SAVE_EVERY_REQUEST = True
+SESSION_ENGINE = 'booking.sessions'  # Sessions that skip redundant saves; cached only with a shared cache
+SESSION_REFRESH_FRACTION = 0.1  # Re-save an unchanged session once 10% of its age has passed
 
 # Security settings (for production, these should be more restrictive)
 if not DEBUG:
@@ -250,22 +301,30 @@ if not DEBUG:
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
 # Logging configuration
+# Sampled fraction of DEBUG records kept per logger, e.g. {'booking.api': 0.01}
+LOG_DEBUG_SAMPLE_RATES = {}
+
+# JSON lines written by a background thread (see Assignment1/log.py)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
-            'style': '{',
+        'json': {
+            '()': 'Assignment1.log.JsonFormatter',
+        },
+    },
+    'filters': {
+        'debug_sampler': {
+            '()': 'Assignment1.log.DebugSampler',
+            'rates': LOG_DEBUG_SAMPLE_RATES,
         },
     },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            '()': 'Assignment1.log.QueueStreamHandler',
+            'formatter': 'json',
+            'filters': ['debug_sampler'],
         },
-        # REMOVE the file handler entirely
-        # 'file': {...}
     },
     'loggers': {
         'django': {
@@ -275,20 +334,36 @@ LOGGING = {
         },
         'booking': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            'level': os.getenv('BOOKING_LOG_LEVEL', 'INFO'),
             'propagate': True,
         },
     },
 }
 
 
-
-
 # Custom settings
 MAX_RESERVATION_HOURS = 8  # Maximum duration for a reservation in hours
 MIN_RESERVATION_NOTICE = 1  # Minimum notice in hours before a reservation can be made
 MAX_DAYS_IN_ADVANCE = 90  # Maximum days in advance a reservation can be made
 UPCOMING_RESERVATION_DAYS = 7  # Number of days to show in the upcoming reservations list
+ROOM_CATALOG_CHECK_INTERVAL = 1.0  # Seconds between checks of the shared room catalog version
+ROOM_CATALOG_MAX_AGE = 60.0  # Seconds before a worker rebuilds its room catalog regardless of version
+ROOM_IMAGE_WIDTHS = (320, 640, 960, 1280)  # Widths of the generated room image variants
+ROOM_THUMBNAIL_WORKERS = 2  # Threads resizing uploaded room images; 0 resizes inline
+PAGE_CACHE_TIMEOUT = 300  # Seconds anonymous room list pages stay cached
+PAGE_CACHE_HOME_TIMEOUT = 30  # Seconds the anonymous home page (rooms available now) stays cached
+PERF_INSTRUMENTATION = os.getenv('PERF_INSTRUMENTATION', str(DEBUG)) == 'True'  # Per-request timings by route; defaults to DEBUG
+PERF_SERVER_TIMING = 'all' if DEBUG else 'staff'  # Who gets the Server-Timing header: all, staff or off
+QUERY_BUDGET_MODE = 'raise' if DEBUG else 'off'  # Over-budget views: raise, log or off
+SLOW_QUERY_THRESHOLD_MS = 100  # Queries at least this slow go to the slow-query log; None disables it
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', str(DEBUG)) == 'True'  # Plan the first slow run of each SELECT; re-runs it on PostgreSQL
+SLOW_QUERY_BUFFER_SIZE = 200  # Slow queries kept in memory for /staff/slow-queries/
+PROFILE_SAMPLE_RATE = int(os.getenv('PROFILE_SAMPLE_RATE', '0'))  # Profile 1 in N requests; 0 disables sampling
+PROFILE_STORE_SIZE = 20  # Request profiles kept in memory for /api/admin/profiles/
+MEMORY_PROFILING = os.getenv('MEMORY_PROFILING', 'False') == 'True'  # tracemalloc every request; slow, diagnostics only
+MEMORY_PROFILING_TOP = 10  # Allocation sites recorded per request; 0 skips the snapshots
+MEMORY_PROFILING_BUFFER_SIZE = 50  # Profiled requests kept in memory for /api/admin/memory/
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']  # Clients allowed to scrape /metrics; None allows anyone
 
 # Timezone settings
 USER_TIME_ZONE = 'Pacific/Auckland'  # Default timezone for users
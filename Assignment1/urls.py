@@ -7,12 +7,21 @@ The `urlpatterns` list routes URLs to views. For more information please see:
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from django.views.generic import RedirectView
 
+from booking.metrics import metrics_view
+from booking.views import serve_media
+
+# The serverless profile defers admin autodiscovery until the admin is used
+if getattr(settings, 'LAZY_ADMIN', False):
+    from .serverless import lazy_admin_urls
+    admin_urls = lazy_admin_urls()
+else:
+    admin_urls = admin.site.urls
+
 urlpatterns = [
     # Admin site
-    path('admin/', admin.site.urls),
+    path('admin/', admin_urls),
     
     # Booking app
     path('', include('booking.urls')),
@@ -20,6 +29,9 @@ urlpatterns = [
     # API endpoints
     path('api/', include('booking.api.urls')),
     
+    # Prometheus scrape endpoint
+    path('metrics', metrics_view, name='metrics'),
+    
     # Favicon redirect (add favicon.ico to your static files)
     path('favicon.ico', RedirectView.as_view(url='/static/favicon.ico', permanent=True)),
     
@@ -27,9 +39,11 @@ urlpatterns = [
     path('accounts/', include('django.contrib.auth.urls')),
 ]
 
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Uploaded media, with ETag/Range support and optional X-Sendfile offload.
+# Served in production too; set MEDIA_SENDFILE to hand transfers to the front end.
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name='media'),
+]
 
 # Add any additional URL patterns here if needed
 
@@ -1,26 +1,48 @@
 from .settings import *
+from .db import configure_pooling
 import os
 
-
-from dotenv import load_dotenv
-load_dotenv()
+# settings.py has already loaded .env where one is used
 
 # Security settings
 DEBUG = os.getenv('DJANGO_DEBUG', 'False') == 'True'
 SECRET_KEY = os.getenv('DJANGO_SECRET_KEY', 'insecure-default-key')
 ALLOWED_HOSTS = ['.vercel.app', 'localhost', '127.0.0.1']
 
+# settings.py derived these from its own DEBUG
+PERF_INSTRUMENTATION = os.getenv('PERF_INSTRUMENTATION', str(DEBUG)) == 'True'
+PERF_SERVER_TIMING = os.getenv('PERF_SERVER_TIMING', 'staff')
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', str(DEBUG)) == 'True'
+QUERY_BUDGET_MODE = 'raise' if DEBUG else os.getenv('QUERY_BUDGET_MODE', 'off')
+
 # Database configuration for Vercel
+# Connection setup (a TLS handshake per request) dominated request latency;
+# see Assignment1/db.py for the available pool modes.
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'persistent')
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '600'))
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '5'))
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('PGDATABASE'),
-        'USER': os.getenv('PGUSER'),
-        'PASSWORD': os.getenv('PGPASSWORD'),
-       'HOST': os.getenv('PGHOST'),
-        'PORT': os.getenv('PGPORT'),
-        'OPTIONS': {'sslmode': 'require'}
-   }
+    'default': configure_pooling(
+        {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('PGDATABASE'),
+            'USER': os.getenv('PGUSER'),
+            'PASSWORD': os.getenv('PGPASSWORD'),
+            'HOST': os.getenv('PGHOST'),
+            'PORT': os.getenv('PGPORT'),
+            'OPTIONS': {'sslmode': 'require'}
+        },
+        mode=DB_POOL_MODE,
+        conn_max_age=DB_CONN_MAX_AGE,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        connect_timeout=DB_CONNECT_TIMEOUT,
+    )
 }
 
 # Static files configuration for Vercel
@@ -50,15 +72,22 @@ LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
-            'style': '{',
+        'json': {
+            '()': 'Assignment1.log.JsonFormatter',
+        },
+    },
+    'filters': {
+        'debug_sampler': {
+            '()': 'Assignment1.log.DebugSampler',
+            'rates': LOG_DEBUG_SAMPLE_RATES,
         },
     },
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler',  # stdout
-            'formatter': 'verbose',
+            '()': 'Assignment1.log.QueueStreamHandler',
+            'stream': 'ext://sys.stdout',
+            'formatter': 'json',
+            'filters': ['debug_sampler'],
         },
     },
     'root': {
@@ -74,7 +103,7 @@ LOGGING = {
         # add your app loggers if needed
         'booking': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            'level': os.getenv('BOOKING_LOG_LEVEL', 'INFO'),
             'propagate': False,
         },
     },
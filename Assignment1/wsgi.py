@@ -8,19 +8,20 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
 import os
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
-from pathlib import Path
 
-# Use vercel settings in production
+# Use the lean serverless settings in production
 if os.environ.get('VERCEL') == '1':
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Assignment1.vercel_settings')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Assignment1.serverless_settings')
 else:
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Assignment1.settings')
 
 application = get_wsgi_application()
 
-# Only use WhiteNoise if not on Vercel (Vercel handles static files differently)
-if not os.environ.get('VERCEL') == '1':
-    from whitenoise import WhiteNoise
-    application = WhiteNoise(application, root=Path(__file__).parent.parent / 'staticfiles')
-    application.add_files(Path(__file__).parent.parent / 'media', prefix='media/')
\ No newline at end of file
+# Resolve the URLconf and compile hot templates during function init,
+# rather than on the first request
+if getattr(settings, 'WARMUP_ON_STARTUP', False):
+    from Assignment1.serverless import warmup
+    warmup()
+
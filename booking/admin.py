@@ -1,9 +1,13 @@
 from django.contrib import admin
+from django.db import transaction
 from django.utils.html import format_html
 from django.utils import timezone
 from .models import (
     Profile, Room, Reservation, Notification
 )
+from .page_cache import bump_generation
+from .room_state import schedule_room_refresh
+from .search import search_rooms, search_reservations
 
 
 class ProfileAdmin(admin.ModelAdmin):
@@ -15,7 +19,7 @@ class ProfileAdmin(admin.ModelAdmin):
 
 class RoomAdmin(admin.ModelAdmin):
     list_display = ('name', 'room_type', 'capacity', 'floor', 'is_active', 'get_equipment')
-    list_filter = ('room_type', 'is_active', 'has_projector', 'has_whiteboard', 'has_video_conference')
+    list_filter = ('room_type', 'is_active') + tuple(field for name, field in Room.AMENITIES)
     search_fields = ('name', 'description', 'floor')
     list_editable = ('is_active',)
     readonly_fields = ('image_preview',)
@@ -24,7 +28,7 @@ class RoomAdmin(admin.ModelAdmin):
             'fields': ('name', 'room_type', 'capacity', 'floor', 'is_active', 'description')
         }),
         ('Equipment', {
-            'fields': ('has_projector', 'has_whiteboard', 'has_video_conference')
+            'fields': tuple(field for name, field in Room.AMENITIES)
         }),
         ('Image', {
             'fields': ('image', 'image_preview')
@@ -32,13 +36,11 @@ class RoomAdmin(admin.ModelAdmin):
     )
 
     def get_equipment(self, obj):
-        equipment = []
-        if obj.has_projector:
-            equipment.append("Projector")
-        if obj.has_whiteboard:
-            equipment.append("Whiteboard")
-        if obj.has_video_conference:
-            equipment.append("Video Conference")
+        equipment = [
+            Room._meta.get_field(field).verbose_name
+            for name, field in Room.AMENITIES
+            if getattr(obj, field)
+        ]
         return ", ".join(equipment) if equipment else "None"
     get_equipment.short_description = 'Equipment'
 
@@ -48,6 +50,11 @@ class RoomAdmin(admin.ModelAdmin):
         return "No image uploaded"
     image_preview.short_description = 'Preview'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return search_rooms(queryset, search_term), False
+
 
 class ReservationAdmin(admin.ModelAdmin):
     list_display = ('title', 'room', 'user', 'start_time', 'end_time', 'status', 'is_active', 'is_upcoming', 'is_past')
@@ -71,18 +78,33 @@ class ReservationAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return search_reservations(queryset, search_term), False
+
+    def set_status(self, queryset, status):
+        """Bulk-update ``status`` and do what the skipped save signals would have."""
+        with transaction.atomic():
+            room_ids = set(queryset.values_list('room_id', flat=True))
+            updated = queryset.update(status=status)
+            if updated:
+                schedule_room_refresh(room_ids)
+                bump_generation()
+        return updated
+
     def approve_reservations(self, request, queryset):
-        updated = queryset.filter(status='PENDING').update(status='APPROVED')
+        updated = self.set_status(queryset.filter(status='PENDING'), 'APPROVED')
         self.message_user(request, f"{updated} reservations were successfully approved.")
     approve_reservations.short_description = "Approve selected pending reservations"
 
     def reject_reservations(self, request, queryset):
-        updated = queryset.filter(status='PENDING').update(status='REJECTED')
+        updated = self.set_status(queryset.filter(status='PENDING'), 'REJECTED')
         self.message_user(request, f"{updated} reservations were rejected.")
     reject_reservations.short_description = "Reject selected pending reservations"
 
     def cancel_reservations(self, request, queryset):
-        updated = queryset.exclude(status='CANCELLED').update(status='CANCELLED')
+        updated = self.set_status(queryset.exclude(status='CANCELLED'), 'CANCELLED')
         self.message_user(request, f"{updated} reservations were cancelled.")
     cancel_reservations.short_description = "Cancel selected reservations"
 
@@ -1,4 +1,4 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 
@@ -11,4 +11,11 @@ router.register(r'users', views.UserViewSet, basename='user')
 urlpatterns = [
     path('', include(router.urls)),
     path('me/', views.CurrentUserView.as_view(), name='current-user'),
+    path('admin/db-pool/', views.DatabasePoolStatsView.as_view(), name='db-pool-stats'),
+    path('admin/sessions/', views.SessionStatsView.as_view(), name='session-stats'),
+    path('admin/perf/', views.PerformanceStatsView.as_view(), name='perf-stats'),
+    path('admin/profiles/', views.ProfileListView.as_view(), name='profile-list'),
+    path('admin/memory/', views.MemoryStatsView.as_view(), name='memory-stats'),
+    re_path(r'^admin/profiles/(?P<profile_id>[0-9a-f]{32})/(?P<kind>pstats|collapsed)/$',
+            views.ProfileDownloadView.as_view(), name='profile-download'),
 ]
@@ -1,19 +1,30 @@
+import logging
+
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.utils import timezone
 from datetime import datetime, time, timedelta
+from django.db.models import Prefetch
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 
 from ..models import Room, Reservation, Notification
+from ..search import search_rooms, search_reservations
+from ..utils import day_window, overlap_q
+from ..principal import get_principal
+from ..recommender import recommend_rooms
 from ..serializers import (
     RoomSerializer, ReservationSerializer, 
-    NotificationSerializer, UserSerializer
+    NotificationSerializer, UserSerializer,
+    RoomRecommendationSerializer, RoomRecommendationResultSerializer
 )
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 class RoomViewSet(viewsets.ReadOnlyModelViewSet):
@@ -23,6 +34,7 @@ class RoomViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Room.objects.filter(is_active=True)
     serializer_class = RoomSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'list': 9, 'retrieve': 9, 'availability': 9, 'default': 12}
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -37,21 +49,55 @@ class RoomViewSet(viewsets.ReadOnlyModelViewSet):
         if min_capacity:
             queryset = queryset.filter(capacity__gte=min_capacity)
             
-        # Filter by equipment
-        has_projector = self.request.query_params.get('has_projector', None)
-        if has_projector == 'true':
-            queryset = queryset.filter(has_projector=True)
-            
-        has_whiteboard = self.request.query_params.get('has_whiteboard', None)
-        if has_whiteboard == 'true':
-            queryset = queryset.filter(has_whiteboard=True)
-            
-        has_video = self.request.query_params.get('has_video_conference', None)
-        if has_video == 'true':
-            queryset = queryset.filter(has_video_conference=True)
+        # Filter by equipment, either as has_<amenity>=true flags or as a
+        # comma-separated ?amenities=projector,wifi list
+        amenities = [
+            field for name, field in Room.AMENITIES
+            if self.request.query_params.get(field, None) == 'true'
+        ]
+        amenity_list = self.request.query_params.get('amenities', None)
+        if amenity_list:
+            amenities += [name.strip() for name in amenity_list.split(',') if name.strip()]
+        try:
+            queryset = queryset.with_amenities(amenities)
+        except ValueError as e:
+            raise ValidationError({'amenities': str(e)})
+        
+        # Full-text search, best match first
+        query = self.request.query_params.get('q', None)
+        if query:
+            queryset = search_rooms(queryset, query)
             
         return queryset
     
+    @action(detail=False, methods=['get'])
+    def recommend(self, request):
+        """
+        Recommend the smallest free rooms for a time window and group size.
+        
+        Query parameters: start_time, end_time, attendees, and optionally
+        amenities (comma-separated) and limit.
+        """
+        params = RoomRecommendationSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        
+        rooms = recommend_rooms(
+            data['start_time'],
+            data['end_time'],
+            data['attendees'],
+            amenities=data.get('amenities', 0),
+            limit=data['limit']
+        )
+        return Response({
+            'start_time': data['start_time'],
+            'end_time': data['end_time'],
+            'attendees': data['attendees'],
+            'rooms': RoomRecommendationResultSerializer(
+                rooms, many=True, context={'attendees': data['attendees']}
+            ).data
+        })
+    
     @action(detail=True, methods=['get'])
     def availability(self, request, pk=None):
         """
@@ -70,60 +116,44 @@ class RoomViewSet(viewsets.ReadOnlyModelViewSet):
             # Parse the date and make it timezone-aware
             date = datetime.strptime(date_str, '%Y-%m-%d').date()
             tz = timezone.get_current_timezone()
-            start_of_day = timezone.make_aware(datetime.combine(date, time.min), tz)
-            end_of_day = timezone.make_aware(datetime.combine(date, time.max), tz)
+            start_of_day, end_of_day = day_window(date, tz)
         except ValueError:
             return Response(
                 {'error': 'Invalid date format. Use YYYY-MM-DD'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get all reservations for this room on the given date
-        reservations = room.reservations.filter(
-            start_time__date=date,
+        # Get all reservations for this room that overlap the given date
+        reservations = list(room.reservations.filter(
+            overlap_q(start_of_day, end_of_day),
             status__in=['PENDING', 'APPROVED']
-        ).order_by('start_time')
+        ).order_by('start_time'))
         
         # Generate time slots (9 AM to 5 PM, 10-minute slots)
         time_slots = []
         start_time = timezone.make_aware(datetime.combine(date, time(9, 0)), tz)
         end_time = timezone.make_aware(datetime.combine(date, time(17, 0)), tz)
+        debug = logger.isEnabledFor(logging.DEBUG)
         
         current_time = start_time
         while current_time < end_time:
             slot_end = current_time + timedelta(minutes=10)  # Changed to 10-minute intervals
             
-            # Convert current slot times to the same timezone for comparison
-            current_slot_start = current_time.astimezone(tz)
-            current_slot_end = slot_end.astimezone(tz)
-            
-            # Debug log
-            print(f"\nChecking slot: {current_slot_start.time()} - {current_slot_end.time()}")
-            
-            # By default, assume the slot is available
-            is_available = True
-            
-            # If there are no reservations, the slot is available
-            if not reservations.exists():
-                print("  No reservations for this room on this date")
-            else:
-                for res in reservations:
-                    # Ensure reservation times are in the same timezone
-                    res_start = res.start_time.astimezone(tz)
-                    res_end = res.end_time.astimezone(tz)
-                    
-                    # Debug log
-                    print(f"  Checking against reservation: {res_start.time()} - {res_end.time()}")
-                    
-                    # Check for overlap - if any part of the reservation is within our time slot
-                    if (res_start < current_slot_end and res_end > current_slot_start):
-                        print(f"  !!! CONFLICT DETECTED - Marking as BOOKED !!!")
-                        is_available = False
-                        break
-                    else:
-                        print("  No conflict with this reservation")
+            # Check for overlap - if any part of a reservation is within our time slot
+            conflict = next(
+                (res for res in reservations
+                 if res.start_time < slot_end and res.end_time > current_time),
+                None
+            )
+            is_available = conflict is None
             
-            print(f"  Final status: {'AVAILABLE' if is_available else 'BOOKED'}")
+            if debug:
+                logger.debug('Availability slot checked', extra={
+                    'room_id': room.pk,
+                    'slot_start': current_time.isoformat(),
+                    'available': is_available,
+                    'conflict_id': conflict.pk if conflict else None,
+                })
             
             time_slots.append({
                 'start': current_time.astimezone(tz).strftime('%H:%M'),
@@ -148,20 +178,29 @@ class ReservationViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ReservationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'list': 10, 'retrieve': 10, 'default': 25}
     
     def get_queryset(self):
         # Regular users can only see their own reservations
         # Admins can see all reservations
-        if self.request.user.is_staff or getattr(self.request.user.profile, 'is_admin', False):
-            return Reservation.objects.all().order_by('-start_time')
-        return Reservation.objects.filter(user=self.request.user).order_by('-start_time')
+        if get_principal(self.request).is_admin:
+            queryset = Reservation.objects.all().order_by('-start_time')
+        else:
+            queryset = Reservation.objects.filter(user=self.request.user).order_by('-start_time')
+        
+        # Full-text search, best match first
+        query = self.request.query_params.get('q', None)
+        if query:
+            queryset = search_reservations(queryset, query)
+        
+        return queryset.with_related()
     
     def perform_create(self, serializer):
         # Set the user to the current user when creating a reservation
         reservation = serializer.save(user=self.request.user)
         
         # If the user is an admin, auto-approve the reservation
-        if self.request.user.is_staff or getattr(self.request.user.profile, 'is_admin', False):
+        if get_principal(self.request).is_admin:
             reservation.status = 'APPROVED'
             reservation.created_by_admin = True
             reservation.save()
@@ -169,7 +208,7 @@ class ReservationViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve a pending reservation (admin only)."""
-        if not (request.user.is_staff or getattr(request.user.profile, 'is_admin', False)):
+        if not get_principal(request).is_admin:
             return Response(
                 {'error': 'You do not have permission to perform this action'},
                 status=status.HTTP_403_FORBIDDEN
@@ -190,7 +229,7 @@ class ReservationViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def reject(self, request, pk=None):
         """Reject a pending reservation (admin only)."""
-        if not (request.user.is_staff or getattr(request.user.profile, 'is_admin', False)):
+        if not get_principal(request).is_admin:
             return Response(
                 {'error': 'You do not have permission to perform this action'},
                 status=status.HTTP_403_FORBIDDEN
@@ -214,9 +253,7 @@ class ReservationViewSet(viewsets.ModelViewSet):
         reservation = self.get_object()
         
         # Check if the user has permission to cancel this reservation
-        if (request.user != reservation.user and 
-            not request.user.is_staff and 
-            not getattr(request.user.profile, 'is_admin', False)):
+        if request.user != reservation.user and not get_principal(request).is_admin:
             return Response(
                 {'error': 'You do not have permission to cancel this reservation'},
                 status=status.HTTP_403_FORBIDDEN
@@ -240,10 +277,13 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 10
     
     def get_queryset(self):
         # Users can only see their own notifications
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        return Notification.objects.filter(user=self.request.user).prefetch_related(
+            Prefetch('reservation', queryset=Reservation.objects.with_related())
+        ).order_by('-created_at')
     
     @action(detail=False, methods=['get'])
     def unread(self, request):
@@ -280,13 +320,14 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.filter(is_active=True)
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 6
     
     def get_queryset(self):
         # Regular users can only see their own profile
         # Admins can see all users
-        if self.request.user.is_staff or getattr(self.request.user.profile, 'is_admin', False):
-            return User.objects.filter(is_active=True)
-        return User.objects.filter(id=self.request.user.id)
+        if get_principal(self.request).is_admin:
+            return User.objects.filter(is_active=True).select_related('profile')
+        return User.objects.filter(id=self.request.user.id).select_related('profile')
 
 
 class CurrentUserView(APIView):
@@ -298,3 +339,86 @@ class CurrentUserView(APIView):
     def get(self, request):
         serializer = UserSerializer(request.user)
         return Response(serializer.data)
+
+
+class DatabasePoolStatsView(APIView):
+    """
+    API endpoint reporting database connection and pool statistics for the
+    worker that serves the request (admin only).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        from Assignment1.db import pool_stats
+        return Response(pool_stats())
+
+
+class SessionStatsView(APIView):
+    """
+    API endpoint reporting session cache and write counters for the worker
+    that serves the request (admin only).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        from ..sessions import session_stats
+        return Response(session_stats())
+
+
+class PerformanceStatsView(APIView):
+    """
+    API endpoint reporting per-route request timings, query counts and
+    cache hit rates for the worker that serves the request (admin only).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        from ..perf import perf_stats
+        return Response(perf_stats())
+
+
+class MemoryStatsView(APIView):
+    """
+    API endpoint reporting per-route peak memory, per-serializer object
+    sizes and the allocation sites of recent requests for the worker that
+    serves the request (admin only; needs MEMORY_PROFILING).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        from ..memory import memory_stats
+        return Response(memory_stats())
+
+
+class ProfileListView(APIView):
+    """
+    API endpoint listing the request profiles stored by the worker that
+    serves the request (admin only).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        from ..profiling import list_profiles
+        return Response(list_profiles())
+
+
+class ProfileDownloadView(APIView):
+    """
+    API endpoint downloading a stored profile as pstats data or as collapsed
+    stacks for flame graphs (admin only).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, profile_id, kind):
+        from ..profiling import collapsed_stacks, dump_pstats, get_profile
+        profile = get_profile(profile_id)
+        if profile is None:
+            return Response({'detail': 'Profile not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if kind == 'pstats':
+            response = HttpResponse(dump_pstats(profile['stats']), content_type='application/octet-stream')
+            filename = f'{profile_id}.prof'
+        else:
+            response = HttpResponse(collapsed_stacks(profile['stats']), content_type='text/plain; charset=utf-8')
+            filename = f'{profile_id}.collapsed.txt'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -0,0 +1,301 @@
+"""
+Benchmarks for the booking hot paths.
+
+Each benchmark is a function registered with ``@benchmark(name)`` that
+makes one call into the code under test, optionally with a ``prepare``
+function whose per-call setup is left out of the measurements. The
+runner reports p50/p95 latency, database queries per call and the peak
+memory allocated per call (measured in a separate ``tracemalloc`` pass
+so tracing doesn't inflate the timings). Benchmarks that handle a batch
+declare its size with ``items`` and also report allocated bytes per item.
+
+``manage.py benchmark`` runs the suite against a throwaway database
+filled by ``booking.dataset``, saves the results as a JSON baseline and
+compares a run against a saved baseline with ``compare``.
+"""
+import platform
+import statistics
+import tracemalloc
+from contextlib import ExitStack
+from datetime import datetime, time, timedelta
+from time import perf_counter
+
+import django
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client, RequestFactory
+from django.utils import timezone
+
+from .models import Reservation, Room
+from .query_budget import QueryCounter
+
+BENCHMARKS = {}
+ALLOCATION_RUNS = 5
+# Latency changes smaller than this are noise, whatever the tolerance
+LATENCY_FLOOR_MS = 0.5
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Benchmark:
+    def __init__(self, name, func, prepare=None, items=None):
+        self.name = name
+        self.func = func
+        self.prepare = prepare
+        self.items = items
+
+    def __call__(self, context):
+        argument = self.prepare(context) if self.prepare else None
+        return lambda: self.func(context, argument)
+
+
+def benchmark(name, prepare=None, items=None):
+    """Register the decorated function as the benchmark ``name``."""
+    def decorator(func):
+        BENCHMARKS[name] = Benchmark(name, func, prepare, items)
+        return func
+    return decorator
+
+
+class BenchmarkContext:
+    """Users, clients and fixtures the benchmarks share, picked from the dataset."""
+
+    def __init__(self):
+        self.room = Room.objects.annotate(bookings=Count('reservations')).order_by('-bookings', 'pk').first()
+        self.user = (
+            User.objects.filter(is_staff=False)
+            .annotate(bookings=Count('reservations')).order_by('-bookings', 'pk').first()
+        )
+        self.staff = User.objects.filter(is_staff=True).order_by('pk').first()
+        if self.room is None or self.user is None or self.staff is None:
+            raise BenchmarkError('The dataset needs rooms, users and a staff user; run generate_dataset.')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+        self.factory = RequestFactory()
+
+        today = timezone.localdate()
+        self.day = today + timedelta(days=1)
+        while self.day.weekday() >= 5:
+            self.day += timedelta(days=1)
+        # Bookings made by the benchmarks go after the dataset's last one
+        last = Reservation.objects.order_by('-end_time').values_list('end_time', flat=True).first()
+        self._next_day = max(timezone.localdate(last) if last else today, today) + timedelta(days=1)
+        self._next_hour = 9
+
+    def free_slot(self):
+        """A one-hour slot in business hours that no reservation uses yet."""
+        if self._next_hour >= 17:
+            self._next_day += timedelta(days=1)
+            self._next_hour = 9
+        start = timezone.make_aware(datetime.combine(self._next_day, time(self._next_hour)))
+        self._next_hour += 1
+        return start, start + timedelta(hours=1)
+
+    def busy_window(self):
+        tz = timezone.get_current_timezone()
+        start = timezone.make_aware(datetime.combine(self.day, time(9)), tz)
+        return start, start + timedelta(hours=8)
+
+
+def expect(response, status=200):
+    if response.status_code != status:
+        raise BenchmarkError(f'Got status {response.status_code}, expected {status}')
+    return response
+
+
+@benchmark('conflict_check')
+def conflict_check(context, _):
+    context.room.is_available(*context.busy_window())
+
+
+@benchmark('availability_ajax')
+def availability_ajax(context, _):
+    expect(context.client.get(f'/api/rooms/{context.room.pk}/availability/', {'date': context.day.isoformat()}))
+
+
+@benchmark('availability_api')
+def availability_api(context, _):
+    from .api.views import RoomViewSet
+    request = context.factory.get(f'/api/rooms/{context.room.pk}/availability/', {'date': context.day.isoformat()})
+    request.user = context.user
+    request._dont_enforce_csrf_checks = True
+    response = RoomViewSet.as_view({'get': 'availability'})(request, pk=context.room.pk)
+    response.render()
+    expect(response)
+
+
+@benchmark('room_list_filtered')
+def room_list_filtered(context, _):
+    expect(context.client.get('/rooms/', {'capacity': '8', 'has_projector': 'on', 'has_wifi': 'on'}))
+
+
+@benchmark('reservation_list_api')
+def reservation_list_api(context, _):
+    expect(context.staff_client.get('/api/reservations/'))
+
+
+@benchmark('notification_context')
+def notification_context(context, _):
+    from .context_processors import notifications
+    request = context.factory.get('/')
+    request.user = context.user
+    result = notifications(request)
+    list(result['recent_notifications'])
+
+
+@benchmark('reservation_create')
+def reservation_create(context, _):
+    start, end = context.free_slot()
+    expect(context.client.post('/api/reservations/', {
+        'title': 'Benchmark booking',
+        'room_id': context.room.pk,
+        'start_time': start.isoformat(),
+        'end_time': end.isoformat(),
+    }, content_type='application/json'), 201)
+
+
+def pending_reservation(context):
+    start, end = context.free_slot()
+    return Reservation.objects.create(
+        user=context.user, room=context.room, title='Benchmark booking',
+        start_time=start, end_time=end,
+    )
+
+
+@benchmark('reservation_approve', prepare=pending_reservation)
+def reservation_approve(context, reservation):
+    expect(context.staff_client.post(f'/api/reservations/{reservation.pk}/approve/'))
+
+
+@benchmark('home_page')
+def home_page(context, _):
+    expect(context.client.get('/'))
+
+
+SERIALIZED_RESERVATIONS = 100
+
+
+def reservation_page(context):
+    request = context.factory.get('/api/reservations/')
+    request.user = context.staff
+    reservations = list(
+        Reservation.objects.order_by('-start_time').with_related()[:SERIALIZED_RESERVATIONS]
+    )
+    if len(reservations) < SERIALIZED_RESERVATIONS:
+        raise BenchmarkError(f'The dataset needs at least {SERIALIZED_RESERVATIONS} reservations.')
+    return request, reservations
+
+
+@benchmark('reservation_serialize', prepare=reservation_page, items=SERIALIZED_RESERVATIONS)
+def reservation_serialize(context, page):
+    from .serializers import ReservationSerializer
+    request, reservations = page
+    ReservationSerializer(reservations, many=True, context={'request': request}).data
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(bench, context, repeat, warmup):
+    for _ in range(warmup):
+        bench(context)()
+
+    timings, queries = [], []
+    for _ in range(repeat):
+        call = bench(context)
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(counter))
+            start = perf_counter()
+            call()
+            timings.append(perf_counter() - start)
+        queries.append(counter.count)
+
+    allocations = []
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        for _ in range(min(repeat, ALLOCATION_RUNS)):
+            call = bench(context)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            call()
+            allocations.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    result = {
+        'runs': repeat,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        'queries': statistics.median_low(queries),
+        'alloc_kib': round(statistics.median(allocations) / 1024, 1),
+    }
+    if bench.items:
+        result['alloc_bytes_per_item'] = round(statistics.median(allocations) / bench.items)
+    return result
+
+
+def run_benchmarks(names=None, repeat=30, warmup=3, progress=None):
+    """Run the named benchmarks (all of them by default) and return the results."""
+    names = names or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise BenchmarkError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    context = BenchmarkContext()
+    results = {}
+    for name in names:
+        try:
+            results[name] = measure(BENCHMARKS[name], context, repeat, warmup)
+        except BenchmarkError as exc:
+            raise BenchmarkError(f'{name}: {exc}') from exc
+        if progress:
+            progress(name, results[name])
+    return {
+        'meta': {
+            'time': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'rows': {
+                'rooms': Room.objects.count(),
+                'users': User.objects.count(),
+                'reservations': Reservation.objects.count(),
+            },
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, tolerance=0.2):
+    """
+    Return the regressions of ``current`` against ``baseline`` as messages.
+
+    Latency and allocations regress when they grow by more than
+    ``tolerance`` (a fraction); query counts regress on any increase.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if (result[key] > base[key] * (1 + tolerance)
+                    and result[key] - base[key] > LATENCY_FLOOR_MS):
+                regressions.append(f'{name}: {key} {base[key]} -> {result[key]}')
+        if result['queries'] > base['queries']:
+            regressions.append(f"{name}: queries {base['queries']} -> {result['queries']}")
+        if result['alloc_kib'] > base['alloc_kib'] * (1 + tolerance):
+            regressions.append(f"{name}: alloc_kib {base['alloc_kib']} -> {result['alloc_kib']}")
+    return regressions
@@ -0,0 +1,235 @@
+"""
+Process-local snapshot of the room catalog.
+
+Rooms change rarely but are read on nearly every request, so each worker
+keeps an immutable snapshot of them in memory. A version stamp held in the
+shared cache is bumped whenever a Room is saved or deleted; workers compare
+it against their snapshot's version (one cached integer, checked at most
+every ``ROOM_CATALOG_CHECK_INTERVAL`` seconds) and rebuild when it moves.
+
+For invalidation to reach other workers, the ``default`` cache must be
+shared between them (Redis, Memcached or the database cache). With the
+local-memory cache each worker only sees its own changes, so snapshots are
+also rebuilt once they are ``ROOM_CATALOG_MAX_AGE`` seconds old, which
+bounds how long another worker's edit can go unseen.
+"""
+import threading
+import time
+from bisect import bisect_left
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+
+from .metrics import count_cache_lookup
+from .models import Room
+
+VERSION_CACHE_KEY = 'booking:room_catalog_version'
+DEFAULT_CHECK_INTERVAL = 1.0
+DEFAULT_MAX_AGE = 60.0
+
+
+class RoomRecord:
+    """
+    Read-only view of one room, shaped like a Room for templates and forms.
+
+    ``to_model()`` materializes a full Room instance without a query when a
+    real model object is needed, such as for a foreign key assignment.
+    """
+    __slots__ = ('_db', '_field_names', '_values', 'pk', 'id', 'name', 'room_type', 'building',
+                 'floor', 'room_number', 'capacity', 'amenities', 'is_active',
+                 'requires_approval', 'description', 'image', 'thumbnails', 'max_occupancy',
+                 'updated_at')
+
+    def __init__(self, room, field_names):
+        set_attr = object.__setattr__
+        values = tuple(getattr(room, name) for name in field_names)
+        set_attr(self, '_db', room._state.db)
+        set_attr(self, '_field_names', field_names)
+        set_attr(self, '_values', tuple(
+            value.name if isinstance(value, FieldFile) else value for value in values
+        ))
+        set_attr(self, 'pk', room.pk)
+        for name in self.__slots__[4:]:
+            set_attr(self, name, getattr(room, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __str__(self):
+        return f"{self.name} ({self.get_room_type_display()}, {self.capacity} people)"
+
+    def __repr__(self):
+        return f"<RoomRecord: {self}>"
+
+    def get_room_type_display(self):
+        return dict(Room.ROOM_TYPES).get(self.room_type, self.room_type)
+
+    def get_building_display(self):
+        return dict(Room.BUILDING_CHOICES).get(self.building, self.building)
+
+    def has_amenities(self, mask):
+        return self.amenities & mask == mask
+
+    def to_model(self):
+        return Room.from_db(self._db, self._field_names, self._values)
+
+
+# has_projector, has_wifi, ... read from the amenity bitmask
+for _bit, (_name, _field) in enumerate(Room.AMENITIES):
+    setattr(RoomRecord, _field, property(lambda self, mask=1 << _bit: self.has_amenities(mask)))
+
+
+class RoomCatalog:
+    """Immutable snapshot of every room, with indexes over the active ones."""
+    __slots__ = ('version', 'built_at', 'rooms', 'all_rooms', 'by_id', 'by_type', 'by_building',
+                 '_by_capacity', '_capacities')
+
+    def __init__(self, version, records):
+        set_attr = object.__setattr__
+        records = tuple(sorted(records, key=lambda record: record.name))
+        active = tuple(record for record in records if record.is_active)
+        by_capacity = tuple(sorted(active, key=lambda record: (record.capacity, record.name)))
+
+        by_type, by_building = {}, {}
+        for record in active:
+            by_type.setdefault(record.room_type, []).append(record)
+            by_building.setdefault(record.building, []).append(record)
+
+        set_attr(self, 'version', version)
+        set_attr(self, 'built_at', time.monotonic())
+        set_attr(self, 'all_rooms', records)
+        set_attr(self, 'rooms', active)
+        set_attr(self, 'by_id', MappingProxyType({record.pk: record for record in records}))
+        set_attr(self, 'by_type', MappingProxyType({k: tuple(v) for k, v in by_type.items()}))
+        set_attr(self, 'by_building', MappingProxyType({k: tuple(v) for k, v in by_building.items()}))
+        set_attr(self, '_by_capacity', by_capacity)
+        set_attr(self, '_capacities', tuple(record.capacity for record in by_capacity))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def get(self, pk, active_only=True):
+        """Return the record for ``pk``, or None if it is unknown (or inactive)."""
+        try:
+            record = self.by_id.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+        if record is None or (active_only and not record.is_active):
+            return None
+        return record
+
+    def with_capacity(self, min_capacity):
+        """Active rooms seating at least ``min_capacity``, smallest first."""
+        return self._by_capacity[bisect_left(self._capacities, min_capacity):]
+
+    def filter(self, room_type=None, building=None, min_capacity=None, amenities=0, ids=None):
+        """
+        Return active rooms matching every given criterion, ordered by name.
+
+        When ``ids`` is given the result keeps its order instead, so ranked
+        search results can be restricted by the catalog filters.
+        """
+        if ids is not None:
+            candidates = [self.by_id[pk] for pk in ids if pk in self.by_id]
+            candidates = [record for record in candidates if record.is_active]
+        else:
+            candidates = self.rooms
+            if room_type:
+                candidates = self.by_type.get(room_type, ())
+            if building:
+                by_building = self.by_building.get(building, ())
+                if len(by_building) < len(candidates):
+                    candidates = by_building
+
+        return [
+            record for record in candidates
+            if (not room_type or record.room_type == room_type)
+            and (not building or record.building == building)
+            and (min_capacity is None or record.capacity >= min_capacity)
+            and record.amenities & amenities == amenities
+        ]
+
+
+_lock = threading.Lock()
+_catalog = None
+_checked_at = 0.0
+
+
+def _check_interval():
+    return getattr(settings, 'ROOM_CATALOG_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+
+
+def _max_age():
+    return getattr(settings, 'ROOM_CATALOG_MAX_AGE', DEFAULT_MAX_AGE)
+
+
+def current_version():
+    """Return the shared catalog version, seeding it if the cache is empty."""
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        # Seed from the clock so a flushed cache never repeats a version a
+        # worker may still be holding.
+        cache.add(VERSION_CACHE_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def _build(version):
+    field_names = tuple(
+        field.attname for field in Room._meta.concrete_fields if field.name != 'search_vector'
+    )
+    rooms = Room.objects.defer('search_vector').order_by()
+    return RoomCatalog(version, [RoomRecord(room, field_names) for room in rooms])
+
+
+def get_room_catalog():
+    """Return the current room catalog, rebuilding it if it is stale."""
+    global _catalog, _checked_at
+    catalog = _catalog
+    now = time.monotonic()
+    if catalog is not None and now - _checked_at < _check_interval():
+        return catalog
+
+    version = current_version()
+    if (catalog is not None and catalog.version == version
+            and now - catalog.built_at < _max_age()):
+        _checked_at = now
+        count_cache_lookup('room_catalog', True)
+        return catalog
+
+    count_cache_lookup('room_catalog', False)
+
+    with _lock:
+        if (_catalog is None or _catalog.version != version
+                or now - _catalog.built_at >= _max_age()):
+            # Read the version before the rows, so a concurrent bump always
+            # leaves this snapshot looking stale rather than current.
+            _catalog = _build(version)
+        _checked_at = now
+        return _catalog
+
+
+def invalidate_local():
+    """Drop this worker's snapshot so the next read rebuilds it."""
+    global _catalog
+    _catalog = None
+
+
+def _bump():
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, time.time_ns(), None)
+    invalidate_local()
+
+
+def bump_version(using=None):
+    """Invalidate the catalog in every worker once the current transaction commits."""
+    invalidate_local()
+    transaction.on_commit(_bump, using=using)
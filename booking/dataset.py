@@ -0,0 +1,386 @@
+"""
+Synthetic datasets for load and benchmark testing.
+
+``DatasetGenerator`` builds rooms, users with profiles, reservations and
+notifications in volumes set by the caller, from a seeded ``random.Random``
+so the same seed always produces the same rows. Rows get explicit primary
+keys above the current maximum, so the whole dataset can be streamed in
+batches without reading ids back; each batch of reservations is followed by
+its attendees and notifications.
+
+Rows are written with ``bulk_create``, or ``COPY`` on PostgreSQL, so none
+of the per-row ``save()`` logic or signals run; ``finalize()`` afterwards
+does their set-based equivalents (room state snapshot, catalog and page
+cache invalidation). The full-text search index is left for
+``rebuild_search_index``.
+
+Reservations fall on business hours in ``TIME_ZONE``, mostly on weekdays,
+with half-hour starts and a spread of durations. Pending and approved
+bookings never overlap in a room; when a room's day is full the booking
+becomes a cancelled or rejected one, which may. Most bookings list some of
+their expected attendees, never the owner.
+"""
+import csv
+import io
+import itertools
+import json
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connections, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Notification, Profile, Reservation, Room
+
+ROOM_TYPE_WEIGHTS = {'MEETING': 55, 'CONFERENCE': 25, 'TRAINING': 15, 'AUDITORIUM': 5}
+ROOM_CAPACITY = {
+    'MEETING': (4, 12),
+    'CONFERENCE': (10, 40),
+    'TRAINING': (15, 60),
+    'AUDITORIUM': (80, 400),
+}
+# Probability of each amenity flag by room type
+AMENITY_ODDS = {
+    'MEETING': {'has_projector': 0.3, 'has_whiteboard': 0.9, 'has_video_conference': 0.4,
+                'has_teleconference': 0.3, 'has_wifi': 0.98, 'has_tv': 0.5, 'has_podium': 0.0},
+    'CONFERENCE': {'has_projector': 0.8, 'has_whiteboard': 0.7, 'has_video_conference': 0.8,
+                   'has_teleconference': 0.7, 'has_wifi': 1.0, 'has_tv': 0.6, 'has_podium': 0.1},
+    'TRAINING': {'has_projector': 0.95, 'has_whiteboard': 0.9, 'has_video_conference': 0.3,
+                 'has_teleconference': 0.2, 'has_wifi': 1.0, 'has_tv': 0.3, 'has_podium': 0.4},
+    'AUDITORIUM': {'has_projector': 1.0, 'has_whiteboard': 0.1, 'has_video_conference': 0.7,
+                   'has_teleconference': 0.5, 'has_wifi': 1.0, 'has_tv': 0.2, 'has_podium': 0.95},
+}
+FIRST_NAMES = [
+    'Aroha', 'Ben', 'Chloe', 'Daniel', 'Emma', 'Finn', 'Grace', 'Hannah', 'Isaac', 'Jack',
+    'Kate', 'Liam', 'Mia', 'Noah', 'Olivia', 'Priya', 'Quinn', 'Ruby', 'Sam', 'Tama',
+    'Wei', 'Yusuf', 'Zoe', 'Amir', 'Lucia', 'Mateo', 'Sofia', 'Hiroshi', 'Ana', 'Oliver',
+]
+LAST_NAMES = [
+    'Smith', 'Wilson', 'Williams', 'Brown', 'Taylor', 'Jones', 'Singh', 'Wang', 'Ngata', 'Lee',
+    'Chen', 'Patel', 'Kim', 'Martin', 'Walker', 'Thompson', 'Clarke', 'Nguyen', 'Garcia', 'Tane',
+]
+DEPARTMENTS = ['Engineering', 'Sales', 'Marketing', 'Finance', 'HR', 'Operations', 'Legal', 'Support']
+TITLES = [
+    'Team stand-up', 'Sprint planning', 'Retrospective', 'Design review', 'Client call',
+    'Quarterly review', 'One-on-one', 'Interview', 'Training session', 'Board meeting',
+    'All hands', 'Workshop', 'Budget planning', 'Project kickoff', 'Vendor demo',
+]
+# Minutes, weighted towards short meetings
+DURATIONS = [30, 60, 90, 120, 180, 240]
+DURATION_WEIGHTS = [25, 40, 12, 12, 7, 4]
+# Minutes left free after the previous booking of the day
+GAPS = [0, 0, 30, 30, 60, 90, 120, 180]
+DAY_START = 8 * 60
+DAY_END = 18 * 60
+WEEKEND_WEIGHT = 0.05
+PAST_STATUSES = (['COMPLETED', 'CANCELLED', 'REJECTED', 'APPROVED'], [80, 12, 5, 3])
+FUTURE_STATUSES = (['APPROVED', 'PENDING', 'CANCELLED', 'REJECTED'], [65, 20, 10, 5])
+OPEN_STATUSES = {'PENDING', 'APPROVED'}
+# Share of bookings that list attendees, and the most any of them lists
+ATTENDEE_LIST_ODDS = 0.6
+MAX_LISTED_ATTENDEES = 12
+# Notification types a reservation can plausibly have, in the order they'd be sent
+NOTIFICATION_TYPES = {
+    'PENDING': ['BOOKING_CONFIRMATION', 'REMINDER'],
+    'APPROVED': ['BOOKING_CONFIRMATION', 'ADMIN_APPROVAL', 'REMINDER'],
+    'COMPLETED': ['BOOKING_CONFIRMATION', 'ADMIN_APPROVAL', 'REMINDER'],
+    'REJECTED': ['BOOKING_CONFIRMATION', 'ADMIN_REJECTION'],
+    'CANCELLED': ['BOOKING_CONFIRMATION', 'BOOKING_CANCELLATION'],
+}
+NOTIFICATION_MESSAGES = {
+    'BOOKING_CONFIRMATION': "Your reservation '{title}' has been received.",
+    'ADMIN_APPROVAL': "Your reservation '{title}' has been approved.",
+    'ADMIN_REJECTION': "Your reservation '{title}' has been rejected.",
+    'BOOKING_CANCELLATION': "Your reservation '{title}' has been cancelled.",
+    'REMINDER': "Reminder: '{title}' starts soon.",
+}
+
+
+def next_pk(model, using):
+    return (model.objects.using(using).aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+class DatasetGenerator:
+    """Deterministic rooms, users, reservations and notifications for ``seed``."""
+
+    def __init__(self, rooms, users, reservations, notifications, seed=0,
+                 days_back=365, days_ahead=90, prefix='gen', password=None,
+                 using='default'):
+        self.counts = {
+            'rooms': rooms, 'users': users,
+            'reservations': reservations, 'notifications': notifications,
+        }
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.tag = f'{prefix}{seed}'
+        self.password = make_password(password)
+        self.using = using
+        self.now = timezone.now().replace(microsecond=0)
+        self.tz = timezone.get_default_timezone()
+
+        self.today = today = timezone.localtime(self.now, self.tz).date()
+        self.days = [today + timedelta(days=offset) for offset in range(-days_back, days_ahead + 1)]
+        self.day_weights = list(itertools.accumulate(
+            WEEKEND_WEIGHT if day.weekday() >= 5 else 1.0 for day in self.days
+        ))
+        self.first_room = next_pk(Room, using)
+        self.first_user = next_pk(User, using)
+        self.first_reservation = next_pk(Reservation, using)
+        self.pending_attendees = []
+        self.pending_notifications = []
+
+    def exists(self):
+        """Whether a dataset with this prefix and seed was already generated."""
+        return User.objects.using(self.using).filter(username__startswith=f'{self.tag}_').exists()
+
+    def room_rows(self):
+        rng = self.random
+        types, weights = zip(*ROOM_TYPE_WEIGHTS.items())
+        buildings = [code for code, _label in Room.BUILDING_CHOICES]
+        self.capacities = []
+        for n in range(self.counts['rooms']):
+            room_type = rng.choices(types, weights)[0]
+            building = rng.choice(buildings)
+            floor = rng.randint(1, 12)
+            capacity = rng.randint(*ROOM_CAPACITY[room_type])
+            room = Room(
+                pk=self.first_room + n,
+                name=f'{building.title()} {room_type.title()} {self.tag}-{n}',
+                room_type=room_type,
+                building=building,
+                floor=floor,
+                room_number=f'{building[0]}{floor}-{n % 1000:03d}',
+                capacity=capacity,
+                is_active=rng.random() < 0.97,
+                requires_approval=room_type in ('CONFERENCE', 'AUDITORIUM') and rng.random() < 0.3,
+                created_at=self.now,
+                updated_at=self.now,
+                **{field: rng.random() < odds for field, odds in AMENITY_ODDS[room_type].items()},
+            )
+            room.amenities = room.compute_amenities()
+            self.capacities.append(capacity)
+            yield room
+
+    def user_rows(self):
+        rng = self.random
+        for n in range(self.counts['users']):
+            first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            yield User(
+                pk=self.first_user + n,
+                username=f'{self.tag}_{n}',
+                first_name=first_name,
+                last_name=last_name,
+                email=f'{first_name}.{last_name}.{n}@example.com'.lower(),
+                password=self.password,
+                # One in a hundred users is staff, to approve bookings
+                is_staff=n % 100 == 0,
+                date_joined=self.now - timedelta(days=rng.randint(0, 3 * 365)),
+            )
+
+    def profile_rows(self):
+        rng = self.random
+        for n in range(self.counts['users']):
+            yield Profile(
+                user_id=self.first_user + n,
+                department=rng.choice(DEPARTMENTS),
+                is_admin=n % 100 == 0,
+            )
+
+    def _place(self, free_from, room_index, day_index, duration):
+        """Start minute of a non-overlapping booking, or None if the day is full."""
+        slot = room_index * len(self.days) + day_index
+        start = max(free_from[slot], DAY_START) + self.random.choice(GAPS)
+        if start + duration > DAY_END:
+            return None
+        free_from[slot] = start + duration
+        return start
+
+    def reservation_rows(self):
+        rng = self.random
+        room_count, user_count = self.counts['rooms'], self.counts['users']
+        if not room_count or not user_count:
+            return
+        # A few rooms are far more popular than the rest
+        room_weights = list(itertools.accumulate(
+            1 / (rank + 1) ** 0.6 for rank in range(room_count)
+        ))
+        staff = range(self.first_user, self.first_user + user_count, 100)
+        # Minute of the day each room is free from, by (room, day)
+        free_from = [0] * (room_count * len(self.days))
+        for n in range(self.counts['reservations']):
+            room_index = rng.choices(range(room_count), cum_weights=room_weights)[0]
+            day_index = rng.choices(range(len(self.days)), cum_weights=self.day_weights)[0]
+            duration = rng.choices(DURATIONS, DURATION_WEIGHTS)[0]
+            day = self.days[day_index]
+            is_past = day < self.today
+            statuses, weights = PAST_STATUSES if is_past else FUTURE_STATUSES
+            status = rng.choices(statuses, weights)[0]
+
+            start_minute = None
+            if status in OPEN_STATUSES:
+                start_minute = self._place(free_from, room_index, day_index, duration)
+                if start_minute is None:
+                    status = rng.choice(['CANCELLED', 'REJECTED'])
+            if start_minute is None:
+                start_minute = rng.randrange(DAY_START, DAY_END - duration + 1, 30)
+
+            start = datetime.combine(day, time(), tzinfo=self.tz) + timedelta(minutes=start_minute)
+            reservation = Reservation(
+                pk=self.first_reservation + n,
+                user_id=self.first_user + rng.randrange(user_count),
+                room_id=self.first_room + room_index,
+                title=rng.choice(TITLES),
+                start_time=start,
+                end_time=start + timedelta(minutes=duration),
+                status=status,
+                approved_by_id=rng.choice(staff) if status in ('APPROVED', 'COMPLETED') else None,
+                expected_attendees=max(1, min(
+                    self.capacities[room_index], round(rng.lognormvariate(1.3, 0.6))
+                )),
+                requires_catering=rng.random() < 0.05,
+                is_private=rng.random() < 0.1,
+                reminder_sent=is_past,
+                created_at=self.now,
+                updated_at=self.now,
+            )
+            self.pending_attendees.extend(self.attendees_for(reservation))
+            self.pending_notifications.extend(self.notifications_for(n, reservation, is_past))
+            yield reservation
+
+    def attendees_for(self, reservation):
+        """Attendee rows of ``reservation``, drawn from the other users."""
+        rng = self.random
+        others = self.counts['users'] - 1
+        most = min(reservation.expected_attendees - 1, others, MAX_LISTED_ATTENDEES)
+        if most < 1 or rng.random() >= ATTENDEE_LIST_ODDS:
+            return []
+        owner = reservation.user_id - self.first_user
+        Attendee = Reservation.attendees.through
+        return [
+            Attendee(
+                reservation_id=reservation.pk,
+                # Skip over the owner's index
+                user_id=self.first_user + index + (index >= owner),
+            )
+            for index in rng.sample(range(others), rng.randint(1, most))
+        ]
+
+    def notifications_for(self, n, reservation, is_past):
+        """The notifications of the ``n``th reservation, spreading the total evenly."""
+        per_reservation = self.counts['notifications'] / self.counts['reservations']
+        count = round(per_reservation * (n + 1)) - round(per_reservation * n)
+        types = NOTIFICATION_TYPES[reservation.status]
+        return [
+            Notification(
+                user_id=reservation.user_id,
+                reservation_id=reservation.pk,
+                message=NOTIFICATION_MESSAGES[notification_type].format(title=reservation.title),
+                notification_type=notification_type,
+                is_read=self.random.random() < (0.85 if is_past else 0.4),
+                created_at=self.now,
+            )
+            for notification_type in itertools.islice(itertools.cycle(types), count)
+        ]
+
+    def generate(self, batch_size=5000, use_copy=None, progress=None):
+        """Write the dataset and return the number of rows written per model."""
+        connection = connections[self.using]
+        if use_copy is None:
+            use_copy = connection.vendor == 'postgresql'
+        write = copy_rows if use_copy else bulk_create_rows
+        Attendee = Reservation.attendees.through
+        written = {
+            model._meta.label: 0
+            for model in (Room, User, Profile, Reservation, Attendee, Notification)
+        }
+
+        def flush(model, batch):
+            with transaction.atomic(using=self.using):
+                write(model, batch, self.using)
+            written[model._meta.label] += len(batch)
+            if progress:
+                progress(model, written[model._meta.label])
+
+        for model, rows in [
+            (Room, self.room_rows()),
+            (User, self.user_rows()),
+            (Profile, self.profile_rows()),
+            (Reservation, self.reservation_rows()),
+        ]:
+            while batch := list(itertools.islice(rows, batch_size)):
+                flush(model, batch)
+                # Attendees and notifications follow the batch of reservations they point at
+                attendees, self.pending_attendees = self.pending_attendees, []
+                notifications, self.pending_notifications = self.pending_notifications, []
+                for related_model, related in [(Attendee, attendees), (Notification, notifications)]:
+                    for start in range(0, len(related), batch_size):
+                        flush(related_model, related[start:start + batch_size])
+        self.finalize()
+        return written
+
+    def finalize(self):
+        """Catch up on the work the skipped signals would have done."""
+        from .catalog import bump_version
+        from .page_cache import bump_generation
+        from .room_state import refresh_room_state
+        connection = connections[self.using]
+        sequences = connection.ops.sequence_reset_sql(no_style(), [Room, User, Reservation])
+        if sequences:
+            with connection.cursor() as cursor:
+                for sql in sequences:
+                    cursor.execute(sql)
+        refresh_room_state()
+        bump_version(using=self.using)
+        bump_generation(using=self.using)
+
+
+def bulk_create_rows(model, objs, using):
+    model._base_manager.using(using).bulk_create(objs)
+
+
+def copy_buffer(model, objs, connection):
+    """Return the columns of ``model`` and ``objs`` as CSV for ``COPY``."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not (field.primary_key and objs[0].pk is None)
+    ]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for obj in objs:
+        row = []
+        for field in fields:
+            value = getattr(obj, field.attname)
+            if value is None:
+                value = r'\N'
+            elif isinstance(field, models.JSONField):
+                # get_db_prep_save() gives psycopg's Jsonb adapter, which csv
+                # would write as an SQL literal
+                value = json.dumps(value, cls=field.encoder)
+            else:
+                value = field.get_db_prep_value(value, connection, prepared=False)
+            row.append(value)
+        writer.writerow(row)
+    buffer.seek(0)
+    return fields, buffer
+
+
+def copy_rows(model, objs, using):
+    """Write ``objs`` with PostgreSQL ``COPY ... FROM STDIN``."""
+    connection = connections[using]
+    fields, buffer = copy_buffer(model, objs, connection)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    sql = (
+        f"COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) "
+        r"FROM STDIN WITH (FORMAT csv, NULL '\N')"
+    )
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):
+            raw.copy_expert(sql, buffer)
+        else:
+            with raw.copy(sql) as copy:
+                copy.write(buffer.getvalue())
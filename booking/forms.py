@@ -4,11 +4,51 @@ from datetime import datetime, time, timedelta
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
+from django.forms.models import ModelChoiceIterator, ModelChoiceIteratorValue
+from .catalog import get_room_catalog
 from .models import Room, Reservation, Profile
 
 User = get_user_model()
 
 
+class RoomCatalogChoiceIterator(ModelChoiceIterator):
+    """Yields room choices from the in-process catalog instead of a query."""
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for record in get_room_catalog().rooms:
+            yield (ModelChoiceIteratorValue(record.pk, record), self.field.label_from_instance(record))
+
+    def __len__(self):
+        return len(get_room_catalog()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(len(get_room_catalog()))
+
+
+class RoomChoiceField(forms.ModelChoiceField):
+    """Active-room choice field backed by the room catalog, so it costs no queries."""
+    iterator = RoomCatalogChoiceIterator
+
+    def __init__(self, **kwargs):
+        kwargs['queryset'] = Room.objects.filter(is_active=True)
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, Room):
+            value = value.pk
+        record = get_room_catalog().get(value)
+        if record is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return record.to_model()
+
+
 class UserRegistrationForm(UserCreationForm):
     """Form for user registration."""
     email = forms.EmailField(required=True)
@@ -53,10 +93,26 @@ class RoomSearchForm(forms.Form):
         label='Has Whiteboard',
         initial=True
     )
-    has_video = forms.BooleanField(
+    has_video_conference = forms.BooleanField(
         required=False,
         label='Has Video Conference'
     )
+    has_teleconference = forms.BooleanField(
+        required=False,
+        label='Has Teleconference'
+    )
+    has_wifi = forms.BooleanField(
+        required=False,
+        label='Has WiFi'
+    )
+    has_tv = forms.BooleanField(
+        required=False,
+        label='Has TV'
+    )
+    has_podium = forms.BooleanField(
+        required=False,
+        label='Has Podium'
+    )
     date = forms.DateField(
         required=False,
         widget=forms.DateInput(attrs={'type': 'date'}),
@@ -96,12 +152,18 @@ class RoomSearchForm(forms.Form):
 
 class ReservationForm(forms.ModelForm):
     """Form for creating and updating reservations."""
+    # Set by clean() when the slot is already booked
+    slot_taken = False
+
     class Meta:
         model = Reservation
         fields = [
             'title', 'room', 'description', 'start_time', 
             'end_time', 'attendees'
         ]
+        field_classes = {
+            'room': RoomChoiceField,
+        }
         widgets = {
             'start_time': forms.DateTimeInput(
                 attrs={'type': 'datetime-local'},
@@ -119,11 +181,7 @@ class ReservationForm(forms.ModelForm):
         }
     
     def __init__(self, *args, **kwargs):
-        from django.db import connection
         try:
-            # Ensure we have a valid database connection
-            connection.ensure_connection()
-            
             super().__init__(*args, **kwargs)
             
             # Set the time inputs to use the correct format
@@ -144,8 +202,7 @@ class ReservationForm(forms.ModelForm):
                 'class': 'form-control datetimepicker'
             })
             
-            # Optimize querysets
-            self.fields['room'].queryset = Room.objects.filter(is_active=True).only('id', 'name', 'room_type', 'capacity')
+            # Optimize querysets (room choices come from the room catalog)
             self.fields['attendees'].queryset = User.objects.filter(is_active=True).only('id', 'username', 'first_name', 'last_name')
             
             # Set initial values for new reservations
@@ -181,6 +238,7 @@ class ReservationForm(forms.ModelForm):
             exclude_pk = self.instance.pk if self.instance else None
             
             if not room.is_available(start_time, end_time, exclude_booking_id=exclude_pk):
+                self.slot_taken = True
                 self.add_error(
                     None, 
                     'The selected time slot is not available. Please choose a different time or room.'
@@ -236,10 +294,11 @@ class ProfileForm(forms.ModelForm):
     """Form for user profile updates."""
     class Meta:
         model = Profile
-        fields = ['phone_number', 'department']
+        fields = ['phone_number', 'department', 'timezone']
         widgets = {
             'phone_number': forms.TextInput(attrs={'placeholder': 'e.g., +1 (555) 123-4567'}),
-            'department': forms.TextInput(attrs={'placeholder': 'e.g., Engineering, Marketing'})
+            'department': forms.TextInput(attrs={'placeholder': 'e.g., Engineering, Marketing'}),
+            'timezone': forms.TextInput(attrs={'placeholder': 'e.g., Pacific/Auckland'})
         }
 
 
@@ -0,0 +1,402 @@
+"""
+Load test of the end-to-end booking flow against a running server.
+
+Each simulated user logs in through ``/accounts/login/``, searches rooms,
+loads a week of availability for one of them (seven calls), books a free
+slot, renames the booking, polls its notifications and cancels some of
+its bookings, for ``--iterations`` rounds. An admin session approves the
+bookings as they come in. Users pick from the same few rooms and days,
+so bookings contend the way they do at the start of term.
+
+The report gives throughput, latency percentiles per operation and the
+error and conflict rates, then fetches every booking the run made and
+checks that no two pending or approved ones overlap in a room.
+
+Only the standard library is used, so this runs without Django as
+
+    python booking/loadtest.py --base-url http://127.0.0.1:8000 --password secret
+
+as well as through ``manage.py loadtest``. Users log in as
+``--user-template`` filled with 1, 2, ...; ``generate_dataset --password``
+creates matching ones (``gen0_1``, ``gen0_2``, ... with ``gen0_0`` staff).
+Requests run on one keep-alive connection per user, in a thread pool of
+``--concurrency`` threads driven by asyncio.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+OPEN_STATUSES = {'PENDING', 'APPROVED'}
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+# How many of the matching rooms users choose between
+ROOM_CHOICES = 5
+
+
+class HttpSession:
+    """A cookie-keeping client on one keep-alive connection."""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.base_url = base_url
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connect = lambda: connection_class(parts.netloc, timeout=timeout)
+        self.connection = self.connect()
+        self.cookies = {}
+
+    def request(self, method, path, params=None, json_body=None, form=None):
+        """Return ``(status, body)``; a dropped connection is retried once."""
+        if params:
+            path = f'{path}?{urlencode(params)}'
+        # Django checks the Referer of unsafe HTTPS requests against the host
+        headers = {'Accept': 'application/json', 'Referer': self.base_url + path}
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body)
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if method not in ('GET', 'HEAD') and 'csrftoken' in self.cookies:
+            headers['X-CSRFToken'] = self.cookies['csrftoken']
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+
+        for attempt in (1, 2):
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.connection.close()
+                self.connection = self.connect()
+                if attempt == 2:
+                    raise
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return response.status, data
+
+    def close(self):
+        self.connection.close()
+
+
+class Stats:
+    """Latencies and outcomes by operation."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(lambda: defaultdict(int))
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, operation, seconds, outcome):
+        self.latencies[operation].append(seconds)
+        self.outcomes[operation][outcome] += 1
+
+    def report(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        total = len(all_latencies)
+        errors = sum(outcomes['error'] for outcomes in self.outcomes.values())
+        creates = sum(self.outcomes['create'].values())
+        operations = {}
+        for operation, values in sorted(self.latencies.items()):
+            operations[operation] = {
+                'requests': len(values),
+                'p50_ms': round(percentile(values, 0.50) * 1000, 1),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 1),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 1),
+                **dict(self.outcomes[operation]),
+            }
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(all_latencies, 0.50) * 1000, 1) if total else None,
+            'p95_ms': round(percentile(all_latencies, 0.95) * 1000, 1) if total else None,
+            'p99_ms': round(percentile(all_latencies, 0.99) * 1000, 1) if total else None,
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'conflict_rate': round(self.outcomes['create']['conflict'] / creates, 4) if creates else 0.0,
+            'operations': operations,
+        }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def find_overlaps(reservations):
+    """Pairs of pending or approved reservations that overlap in the same room."""
+    by_room = defaultdict(list)
+    for reservation in reservations:
+        if reservation['status'] in OPEN_STATUSES:
+            by_room[reservation['room_id']].append(reservation)
+    overlaps = []
+    for bookings in by_room.values():
+        bookings.sort(key=lambda reservation: reservation['start_time'])
+        for earlier, later in zip(bookings, bookings[1:]):
+            if later['start_time'] < earlier['end_time']:
+                overlaps.append((earlier['id'], later['id']))
+    return overlaps
+
+
+class LoadTest:
+    def __init__(self, base_url, users, password, admin=None, iterations=3,
+                 user_template='gen0_{}', days=5, cancel_rate=0.3, seed=None, concurrency=None):
+        self.base_url = base_url.rstrip('/')
+        self.users = users
+        self.password = password
+        self.admin = admin
+        self.iterations = iterations
+        self.user_template = user_template
+        self.days = days
+        self.cancel_rate = cancel_rate
+        self.random = random.Random(seed)
+        self.stats = Stats()
+        self.created = {}
+        self.approvals = asyncio.Queue()
+        # Caps the requests in flight; by default every session has one
+        self.executor = ThreadPoolExecutor(max_workers=concurrency or users + 1, thread_name_prefix='loadtest')
+
+    async def call(self, session, operation, method, path, ok=(200,), conflict=(), **kwargs):
+        """Make one request, record it and return ``(status, parsed body)``."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            status, body = await loop.run_in_executor(
+                self.executor, lambda: session.request(method, path, **kwargs)
+            )
+        except (OSError, http.client.HTTPException):
+            self.stats.record(operation, time.perf_counter() - start, 'error')
+            return None, None
+        elapsed = time.perf_counter() - start
+        if status in ok:
+            outcome = 'ok'
+        elif status in conflict:
+            outcome = 'conflict'
+        else:
+            outcome = 'error'
+        self.stats.record(operation, elapsed, outcome)
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            data = body.decode(errors='replace')
+        return status, data
+
+    async def login(self, session, username):
+        status, page = await self.call(session, 'login_page', 'GET', '/accounts/login/')
+        match = CSRF_INPUT.search(page or '') if isinstance(page, str) else None
+        if match is None:
+            return False
+        status, _ = await self.call(
+            session, 'login', 'POST', '/accounts/login/', ok=(302,),
+            form={'username': username, 'password': self.password, 'csrfmiddlewaretoken': match.group(1)},
+        )
+        return status == 302
+
+    def week(self):
+        """The seven days of the calendar, starting tomorrow."""
+        days, day = [], date.today()
+        while len(days) < 7:
+            day += timedelta(days=1)
+            days.append(day)
+        return days
+
+    async def user_session(self, number):
+        rng = random.Random(self.random.random())
+        session = HttpSession(self.base_url)
+        try:
+            if not await self.login(session, self.user_template.format(number)):
+                return
+            for _ in range(self.iterations):
+                await self.user_round(session, rng)
+        finally:
+            session.close()
+
+    async def user_round(self, session, rng):
+        status, rooms = await self.call(
+            session, 'search_rooms', 'GET', '/api/rooms/',
+            params={'min_capacity': rng.choice([2, 4, 6]), 'has_wifi': 'true'},
+        )
+        rooms = (rooms or {}).get('results') if isinstance(rooms, dict) else None
+        if not rooms:
+            return
+        room = rng.choice(rooms[:ROOM_CHOICES])
+
+        free = []
+        for day in self.week():
+            status, calendar = await self.call(
+                session, 'availability', 'GET', f"/api/rooms/{room['id']}/availability/",
+                params={'date': day.isoformat()},
+            )
+            if status == 200 and day <= date.today() + timedelta(days=self.days):
+                free += [(day, slot['start']) for slot in calendar['time_slots'] if slot['available']]
+        if not free:
+            return
+
+        day, start = rng.choice(free)
+        start_time = datetime.combine(day, datetime.strptime(start, '%H:%M').time())
+        status, reservation = await self.call(
+            session, 'create', 'POST', '/api/reservations/', ok=(201,), conflict=(400,),
+            json_body={
+                'title': 'Load test booking',
+                'room_id': room['id'],
+                'start_time': start_time.isoformat(),
+                'end_time': (start_time + timedelta(hours=1)).isoformat(),
+            },
+        )
+        if status != 201:
+            return
+        self.created[reservation['id']] = reservation
+        if reservation['status'] == 'PENDING':
+            self.approvals.put_nowait(reservation['id'])
+
+        await self.call(
+            session, 'update', 'PATCH', f"/api/reservations/{reservation['id']}/",
+            json_body={'title': 'Load test booking (renamed)'},
+        )
+        await self.call(session, 'notifications', 'GET', '/api/notifications/unread/')
+        if rng.random() < self.cancel_rate:
+            # A booking already approved or cancelled elsewhere is a conflict, not an error
+            await self.call(
+                session, 'cancel', 'POST', f"/api/reservations/{reservation['id']}/cancel/",
+                conflict=(400,),
+            )
+
+    async def admin_session(self, done):
+        session = HttpSession(self.base_url)
+        try:
+            if not await self.login(session, self.admin):
+                print(f'Admin {self.admin} could not log in', file=sys.stderr)
+                return
+            while not (done.is_set() and self.approvals.empty()):
+                try:
+                    reservation_id = await asyncio.wait_for(self.approvals.get(), timeout=0.2)
+                except asyncio.TimeoutError:
+                    continue
+                # Cancelled before the admin got to it
+                await self.call(
+                    session, 'approve', 'POST', f'/api/reservations/{reservation_id}/approve/',
+                    conflict=(400,),
+                )
+        finally:
+            session.close()
+
+    async def verify(self):
+        """
+        Fetch the final state of every booking made and return the pairs that
+        overlap, or None without an admin to read them all.
+        """
+        if not self.admin:
+            return None
+        session = HttpSession(self.base_url)
+        final = []
+        try:
+            if not await self.login(session, self.admin):
+                return None
+            for reservation_id in self.created:
+                status, reservation = await self.call(
+                    session, 'verify', 'GET', f'/api/reservations/{reservation_id}/'
+                )
+                if status == 200:
+                    final.append({
+                        'id': reservation['id'],
+                        'room_id': reservation['room']['id'],
+                        'status': reservation['status'],
+                        'start_time': datetime.fromisoformat(reservation['start_time']),
+                        'end_time': datetime.fromisoformat(reservation['end_time']),
+                    })
+        finally:
+            session.close()
+        return find_overlaps(final)
+
+    async def run(self):
+        done = asyncio.Event()
+        admin = asyncio.create_task(self.admin_session(done)) if self.admin else None
+        await asyncio.gather(*(self.user_session(number) for number in range(1, self.users + 1)))
+        done.set()
+        if admin:
+            await admin
+        self.stats.finished = time.perf_counter()
+        # Report before verifying so its requests stay out of the numbers
+        report = self.stats.report()
+        report['reservations_created'] = len(self.created)
+        report['double_bookings'] = await self.verify()
+        self.executor.shutdown()
+        return report
+
+
+def format_report(report):
+    lines = [
+        f"{report['requests']} requests in {report['elapsed_s']}s: "
+        f"{report['throughput_rps']} req/s, p50 {report['p50_ms']} ms, "
+        f"p95 {report['p95_ms']} ms, p99 {report['p99_ms']} ms",
+        f"error rate {report['error_rate']:.2%}, conflict rate {report['conflict_rate']:.2%}, "
+        f"{report['reservations_created']} reservations created",
+        f"{'operation':<16}{'requests':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'conflicts':>11}",
+    ]
+    for name, operation in report['operations'].items():
+        lines.append(
+            f"{name:<16}{operation['requests']:>9}{operation['p50_ms']:>9}{operation['p95_ms']:>9}"
+            f"{operation['p99_ms']:>9}{operation.get('error', 0):>8}{operation.get('conflict', 0):>11}"
+        )
+    return '\n'.join(lines)
+
+
+def add_arguments(parser):
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--users', type=int, default=20, help='Simulated users, all active at once')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='Most requests in flight at once (default: one per user and the admin)')
+    parser.add_argument('--iterations', type=int, default=3, help='Booking rounds per user')
+    parser.add_argument('--user-template', default='gen0_{}', help='Username pattern, filled with 1, 2, ...')
+    parser.add_argument('--password', required=True, help='Password of every simulated user')
+    parser.add_argument('--admin', default='gen0_0', help="Staff user approving bookings; '' to skip")
+    parser.add_argument('--days', type=int, default=5, help='How many days ahead users book')
+    parser.add_argument('--cancel-rate', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+
+def run(options):
+    test = LoadTest(
+        base_url=options['base_url'],
+        users=options['users'],
+        password=options['password'],
+        admin=options['admin'] or None,
+        iterations=options['iterations'],
+        user_template=options['user_template'],
+        days=options['days'],
+        cancel_rate=options['cancel_rate'],
+        seed=options['seed'],
+        concurrency=options['concurrency'],
+    )
+    return asyncio.run(test.run())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    add_arguments(parser)
+    options = vars(parser.parse_args(argv))
+    report = run(options)
+    print(json.dumps(report, indent=2) if options['json'] else format_report(report))
+    if report['double_bookings']:
+        print(f"Double bookings: {report['double_bookings']}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
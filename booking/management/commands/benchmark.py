@@ -0,0 +1,119 @@
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.utils import load_backend
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from booking.benchmarks import BENCHMARKS, BenchmarkError, compare, run_benchmarks
+from booking.dataset import DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the booking hot paths against a generated dataset in a throwaway '
+        'database, optionally saving or comparing against a JSON baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', metavar='benchmark', help=f"Any of: {', '.join(BENCHMARKS)}")
+        parser.add_argument('--rooms', type=int, default=100)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--reservations', type=int, default=20000)
+        parser.add_argument('--notifications', type=int, default=40000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=30, help='Measured calls per benchmark')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured calls per benchmark')
+        parser.add_argument('--save', nargs='?', const='', metavar='FILE',
+                            help='Write the results as a baseline (default: benchmarks/<database>.json)')
+        parser.add_argument('--compare', nargs='?', const='', metavar='FILE',
+                            help='Fail on regressions against a baseline (default: benchmarks/<database>.json)')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed growth in latency and allocations, as a fraction')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the benchmark database and its dataset between runs')
+        parser.add_argument('--postgres', metavar='DBNAME', default=os.getenv('BENCHMARK_PGDATABASE'),
+                            help='Benchmark a local PostgreSQL database instead of the default one; the '
+                                 'host, user and password come from the PG* variables '
+                                 '(default: $BENCHMARK_PGDATABASE)')
+
+    def baseline_path(self, value):
+        if value:
+            return Path(value)
+        return Path(settings.BASE_DIR) / 'benchmarks' / f'{connection.vendor}.json'
+
+    def handle(self, *args, **options):
+        if not options['postgres']:
+            return self.benchmark(options)
+        # Only this command switches databases, so the override stays out of settings
+        default = connections['default']
+        settings_dict = connections.configure_settings({
+            'default': {'ENGINE': 'django.db.backends.postgresql', 'NAME': options['postgres']},
+        })['default']
+        connections['default'] = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, 'default')
+        try:
+            return self.benchmark(options)
+        finally:
+            connections['default'].close()
+            connections['default'] = default
+
+    def benchmark(self, options):
+        baseline = None
+        if options['compare'] is not None:
+            path = self.baseline_path(options['compare'])
+            if not path.exists():
+                raise CommandError(f'No baseline at {path}; run with --save first.')
+            baseline = json.loads(path.read_text())
+
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        if options['save'] is not None:
+            path = self.baseline_path(options['save'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(results, indent=2) + '\n')
+            self.stdout.write(f'Saved the results to {path}')
+
+        if baseline is not None:
+            if baseline['meta'].get('rows') != results['meta']['rows']:
+                self.stderr.write(self.style.WARNING(
+                    'The baseline was measured on a different dataset; the comparison may not hold.'
+                ))
+            regressions = compare(baseline, results, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    def run(self, options):
+        generator = DatasetGenerator(
+            rooms=options['rooms'],
+            users=options['users'],
+            reservations=options['reservations'],
+            notifications=options['notifications'],
+            seed=options['seed'],
+        )
+        if not generator.exists():
+            self.stdout.write('Generating the dataset...')
+            generator.generate()
+
+        self.stdout.write(f"{'benchmark':<24}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'alloc KiB':>11}")
+
+        def progress(name, result):
+            self.stdout.write(
+                f"{name:<24}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                f"{result['queries']:>9}{result['alloc_kib']:>11.1f}"
+            )
+
+        try:
+            return run_benchmarks(options['names'], options['repeat'], options['warmup'], progress)
+        except BenchmarkError as exc:
+            raise CommandError(exc)
@@ -1,14 +1,46 @@
+import gzip
+import hashlib
+import json
 import os
+import posixpath
+import re
 import shutil
 from pathlib import Path
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
 
+# Read by ManifestStaticFilesStorage to resolve {% static %} to hashed names
+MANIFEST_NAME = 'staticfiles.json'
+MANIFEST_VERSION = '1.1'
+# Source mtime/size/hash of every collected file, used to skip unchanged files
+STATE_NAME = '.collectstatic-state.json'
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.xml',
+    '.ico', '.eot', '.ttf', '.otf',
+}
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
 class Command(BaseCommand):
-    help = 'Custom collectstatic command that copies static files safely.'
+    help = (
+        'Collects static files into STATIC_ROOT, skipping unchanged files. '
+        'Each file is also written under a content-hashed name, recorded in '
+        'staticfiles.json, with pre-compressed .gz siblings.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Ignore the previous run and rebuild every file'
+        )
 
     def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
         base_dir = Path(__file__).resolve().parent.parent.parent.parent
-        static_root = base_dir / 'staticfiles'
+        static_root = Path(settings.STATIC_ROOT)
         static_dirs = [
             base_dir / 'static',
             base_dir / 'booking' / 'static',
@@ -17,19 +49,178 @@ class Command(BaseCommand):
         # Create static root
         os.makedirs(static_root, exist_ok=True)
 
+        # Later directories override earlier ones, as before
+        sources = {}
         for static_dir in static_dirs:
             if not static_dir.exists():
                 self.stdout.write(self.style.WARNING(f"Static directory not found: {static_dir}"))
                 continue
-
-            self.stdout.write(f"Copying files from {static_dir} to {static_root}")
-
             for item in static_dir.rglob('*'):
                 if item.is_file() and not item.name.startswith('.'):
-                    rel_path = item.relative_to(static_dir)
-                    dest_path = static_root / rel_path
-                    os.makedirs(dest_path.parent, exist_ok=True)
-                    shutil.copy2(item, dest_path)
-                    self.stdout.write(f"  - Copied {rel_path}")
+                    sources[item.relative_to(static_dir).as_posix()] = item
+
+        previous = {} if options['clear'] else self.load_state(static_root)
+        collector = Collector(static_root, previous)
+
+        # Stylesheets go last so their url() references can be rewritten
+        # to the hashed names of the files they point at.
+        ordered = sorted(sources, key=lambda name: (name.endswith('.css'), name))
+        for name in ordered:
+            if collector.collect(name, sources[name]):
+                self.log(f"  - Copied {name}")
 
+        for name in sorted(set(previous) - set(sources)):
+            collector.remove(name, previous[name])
+            self.log(f"  - Removed {name}")
+
+        self.write_json(static_root / STATE_NAME, collector.state)
+        self.write_manifest(static_root, collector.hashed_names)
+
+        self.stdout.write(
+            f"{len(collector.copied)} copied, {len(sources) - len(collector.copied)} unchanged, "
+            f"{len(set(previous) - set(sources))} removed, {collector.compressed} compressed."
+        )
         self.stdout.write(self.style.SUCCESS("Static files collection complete."))
+
+    def log(self, message):
+        if self.verbosity >= 2:
+            self.stdout.write(message)
+
+    def load_state(self, static_root):
+        try:
+            with open(static_root / STATE_NAME) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_json(self, path, data):
+        content = json.dumps(data, indent=1, sort_keys=True)
+        if not path.exists() or path.read_text() != content:
+            path.write_text(content)
+
+    def write_manifest(self, static_root, hashed_names):
+        """Write the manifest in the format ManifestStaticFilesStorage reads."""
+        paths = dict(sorted(hashed_names.items()))
+        manifest_hash = hashlib.md5(json.dumps(sorted(paths.items())).encode()).hexdigest()[:12]
+        self.write_json(static_root / MANIFEST_NAME, {
+            'paths': paths,
+            'version': MANIFEST_VERSION,
+            'hash': manifest_hash,
+        })
+
+
+class Collector:
+    """Copies, hashes and compresses files into ``static_root``."""
+
+    def __init__(self, static_root, previous):
+        self.static_root = static_root
+        self.previous = previous
+        self.state = {}
+        self.hashed_names = {}
+        self.copied = set()
+        self.compressed = 0
+
+    def collect(self, name, source):
+        """Collect one file, returning True if anything was written."""
+        stat = source.stat()
+        entry = self.previous.get(name)
+        deps_changed = entry is not None and any(dep in self.copied for dep in entry.get('deps', ()))
+
+        if (
+            entry is not None and not deps_changed
+            and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size
+            and self.outputs_exist(name, entry['hashed'])
+        ):
+            self.keep(name, entry)
+            return False
+
+        content = source.read_bytes()
+        deps = []
+        if name.endswith('.css'):
+            output, deps = self.rewrite_css(name, content)
+        else:
+            output = content
+        digest = hashlib.md5(output).hexdigest()
+        hashed = hashed_name(name, digest)
+
+        if (
+            entry is not None and entry['md5'] == digest
+            and self.outputs_exist(name, hashed)
+        ):
+            # Touched but not modified; only the recorded mtime changes
+            self.keep(name, {**entry, 'mtime': stat.st_mtime_ns, 'size': stat.st_size})
+            return False
+
+        dest = self.static_root / name
+        os.makedirs(dest.parent, exist_ok=True)
+        shutil.copy2(source, dest)
+        (self.static_root / hashed).write_bytes(output)
+        self.compress(name, content)
+        self.compress(hashed, output)
+
+        if entry is not None and entry['hashed'] != hashed:
+            self.delete(entry['hashed'])
+
+        self.keep(name, {
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'md5': digest,
+            'hashed': hashed,
+            'deps': deps,
+        })
+        self.copied.add(name)
+        return True
+
+    def keep(self, name, entry):
+        self.state[name] = entry
+        self.hashed_names[name] = entry['hashed']
+
+    def remove(self, name, entry):
+        self.delete(name)
+        self.delete(entry['hashed'])
+
+    def outputs_exist(self, name, hashed):
+        return (self.static_root / name).exists() and (self.static_root / hashed).exists()
+
+    def delete(self, name):
+        for path in (self.static_root / name, self.static_root / f'{name}.gz'):
+            if path.exists():
+                path.unlink()
+
+    def compress(self, name, content):
+        """Write ``name.gz`` when compression saves at least 5%."""
+        gz_path = self.static_root / f'{name}.gz'
+        if posixpath.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            compressed = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(compressed) < len(content) * 0.95:
+                gz_path.write_bytes(compressed)
+                self.compressed += 1
+                return
+        if gz_path.exists():
+            gz_path.unlink()
+
+    def rewrite_css(self, name, content):
+        """Point relative url() references at hashed names already collected."""
+        directory = posixpath.dirname(name)
+        deps = set()
+
+        def replace(match):
+            quote, url = match.groups()
+            if url.startswith(('data:', 'http:', 'https:', '//', '#', '/')):
+                return match.group(0)
+            path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+            target = posixpath.normpath(posixpath.join(directory, path))
+            if target not in self.hashed_names:
+                return match.group(0)
+            deps.add(target)
+            hashed = posixpath.relpath(self.hashed_names[target], directory or '.')
+            return f'url({quote}{hashed}{suffix}{quote})'
+
+        text = CSS_URL.sub(replace, content.decode('utf-8', errors='surrogateescape'))
+        return text.encode('utf-8', errors='surrogateescape'), sorted(deps)
+
+
+def hashed_name(name, digest):
+    """Return ``name`` with the first 12 characters of ``digest`` before its extension."""
+    root, ext = posixpath.splitext(name)
+    return f'{root}.{digest[:12]}{ext}'
@@ -0,0 +1,64 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from booking.dataset import DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates a deterministic synthetic dataset of rooms, users, reservations and '
+        'notifications for load and benchmark testing'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=200)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--reservations', type=int, default=50000)
+        parser.add_argument('--notifications', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=0, help='Same seed, same dataset')
+        parser.add_argument('--days-back', type=int, default=365, help='Days of history to fill')
+        parser.add_argument('--days-ahead', type=int, default=90, help='Days of future bookings to fill')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='gen', help='Prefix of generated usernames and room names')
+        parser.add_argument('--password', default=None, help='Password of every generated user (default: unusable)')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Use bulk_create on PostgreSQL too instead of COPY',
+        )
+
+    def handle(self, *args, **options):
+        if options['reservations'] and not (options['rooms'] and options['users']):
+            raise CommandError('Reservations need at least one room and one user.')
+        generator = DatasetGenerator(
+            rooms=options['rooms'],
+            users=options['users'],
+            reservations=options['reservations'],
+            notifications=options['notifications'] if options['reservations'] else 0,
+            seed=options['seed'],
+            days_back=options['days_back'],
+            days_ahead=options['days_ahead'],
+            prefix=options['prefix'],
+            password=options['password'],
+            using=options['database'],
+        )
+        if generator.exists():
+            raise CommandError(
+                f"A dataset with prefix {options['prefix']!r} and seed {options['seed']} already exists."
+            )
+        use_copy = connections[options['database']].vendor == 'postgresql' and not options['no_copy']
+
+        def progress(model, count):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {model._meta.verbose_name_plural}: {count}')
+
+        start = perf_counter()
+        written = generator.generate(options['batch_size'], use_copy=use_copy, progress=progress)
+        for label, count in written.items():
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated the dataset with {'COPY' if use_copy else 'bulk_create'} "
+            f'in {perf_counter() - start:.1f}s. Run rebuild_search_index to index it for search.'
+        ))
@@ -0,0 +1,56 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from booking.models import Room
+from booking.thumbnails import refresh_thumbnails, thumbnails_stale
+
+
+class Command(BaseCommand):
+    help = 'Generates missing or outdated thumbnails for room images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 2,
+            help='Number of images to resize in parallel'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Refresh every room, not just those with stale thumbnails'
+        )
+
+    def handle(self, *args, **options):
+        rooms = Room.objects.only('id', 'name', 'image', 'thumbnails')
+        pending = [room for room in rooms if options['force'] or thumbnails_stale(room)]
+        if not pending:
+            self.stdout.write('All room thumbnails are up to date.')
+            return
+
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            futures = {executor.submit(self.refresh, room.pk): room for room in pending}
+            for future in as_completed(futures):
+                room = futures[future]
+                try:
+                    thumbnails = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"  - {room.name}: {e}")
+                    continue
+                count = sum(len(sizes) for sizes in (thumbnails or {}).get('variants', {}).values())
+                self.stdout.write(f"  - {room.name}: {count} variants")
+
+        self.stdout.write(f"Processed {len(pending)} rooms, {failed} failed")
+        self.stdout.write(self.style.SUCCESS('Room thumbnails generated.'))
+
+    @staticmethod
+    def refresh(room_id):
+        try:
+            return refresh_thumbnails(room_id)
+        finally:
+            connections.close_all()
@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+
+from booking import loadtest
+from booking.models import Reservation
+from booking.utils import overlap_q
+
+
+class Command(BaseCommand):
+    help = (
+        'Drives simulated user sessions through the booking flow against a running server '
+        'and reports throughput, latency, error and conflict rates'
+    )
+
+    def add_arguments(self, parser):
+        loadtest.add_arguments(parser)
+        parser.add_argument(
+            '--no-db-check', action='store_true',
+            help="Skip the database check for double bookings (when the server uses another database)",
+        )
+
+    def handle(self, *args, **options):
+        test = loadtest.LoadTest(
+            base_url=options['base_url'],
+            users=options['users'],
+            password=options['password'],
+            admin=options['admin'] or None,
+            iterations=options['iterations'],
+            user_template=options['user_template'],
+            days=options['days'],
+            cancel_rate=options['cancel_rate'],
+            seed=options['seed'],
+            concurrency=options['concurrency'],
+        )
+        report = asyncio.run(test.run())
+        if not options['no_db_check']:
+            report['db_double_bookings'] = self.double_bookings(test.created)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(loadtest.format_report(report))
+
+        if report['double_bookings'] is None:
+            self.stderr.write(self.style.WARNING('Double bookings were not checked over HTTP: no admin user.'))
+        if report['double_bookings'] or report.get('db_double_bookings'):
+            raise CommandError(
+                f"Double bookings: {report['double_bookings'] or report['db_double_bookings']}"
+            )
+
+    def double_bookings(self, created_ids):
+        """Ids of open reservations in the rooms the run booked that overlap another one."""
+        rooms = Reservation.objects.filter(pk__in=list(created_ids)).values('room')
+        open_statuses = ['PENDING', 'APPROVED']
+        return list(
+            Reservation.objects.filter(room__in=rooms, status__in=open_statuses)
+            .filter(Exists(
+                Reservation.objects.filter(
+                    overlap_q(OuterRef('start_time'), OuterRef('end_time')),
+                    room=OuterRef('room'), status__in=open_statuses,
+                ).exclude(pk=OuterRef('pk'))
+            ))
+            .values_list('pk', flat=True)
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from booking.models import Room, Reservation
+from booking.search import index_room, index_reservation
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for rooms and reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            rooms = 0
+            for room in Room.objects.iterator(chunk_size=batch_size):
+                index_room(room)
+                rooms += 1
+        self.stdout.write(f"Indexed {rooms} rooms")
+
+        reservations = 0
+        queryset = Reservation.objects.select_related('user', 'room').order_by('pk')
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                for reservation in batch:
+                    index_reservation(reservation)
+            reservations += len(batch)
+            last_pk = batch[-1].pk
+        self.stdout.write(f"Indexed {reservations} reservations")
+
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from booking.room_state import refresh_room_state
+
+
+class Command(BaseCommand):
+    help = "Recomputes every room's current and next reservation (run every minute from cron)"
+
+    def handle(self, *args, **options):
+        rooms = refresh_room_state()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed the state of {rooms} rooms.'))
@@ -0,0 +1,116 @@
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+# Runs in a fresh interpreter so nothing is already imported.
+STARTUP_SCRIPT = """
+import django
+django.setup()
+from django.urls import get_resolver
+resolver = get_resolver()
+resolver.url_patterns
+resolver.reverse_dict
+if {warmup!r}:
+    from Assignment1.serverless import warmup
+    warmup()
+"""
+
+
+class Command(BaseCommand):
+    help = 'Reports import-time costs of a cold start, aggregated per installed app'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--settings-module',
+            default=os.environ.get('DJANGO_SETTINGS_MODULE', 'Assignment1.settings'),
+            help='Settings module to profile, e.g. Assignment1.serverless_settings'
+        )
+        parser.add_argument('--top', type=int, default=15, help='Number of modules to list')
+        parser.add_argument('--warmup', action='store_true', help='Include template warmup')
+        parser.add_argument('--runs', type=int, default=1, help='Cold starts to time')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': options['settings_module']}
+        command = [
+            sys.executable, '-X', 'importtime', '-c',
+            STARTUP_SCRIPT.format(warmup=options['warmup'])
+        ]
+
+        wall_times = []
+        for _ in range(max(options['runs'], 1)):
+            started = time.perf_counter()
+            result = subprocess.run(
+                command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True
+            )
+            wall_times.append((time.perf_counter() - started) * 1000)
+            if result.returncode != 0:
+                errors = [
+                    line for line in result.stderr.splitlines()
+                    if not line.startswith('import time:')
+                ]
+                raise CommandError('\n'.join(errors[-5:]))
+
+        modules = parse_importtime(result.stderr)
+        groups = aggregate_by_app(modules)
+        total = sum(self_us for self_us, cumulative_us in modules.values())
+
+        wall_times.sort()
+        self.stdout.write(f"Settings: {options['settings_module']}")
+        self.stdout.write(
+            f"Cold start wall time: median {wall_times[len(wall_times) // 2]:.0f} ms, "
+            f"max {wall_times[-1]:.0f} ms over {len(wall_times)} run(s)"
+        )
+        self.stdout.write(f"Imports: {len(modules)} modules, {total / 1000:.1f} ms\n")
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Import time by app'))
+        for group, (self_us, count) in sorted(groups.items(), key=lambda item: -item[1][0]):
+            self.stdout.write(
+                f"  {self_us / 1000:8.1f} ms  {100 * self_us / total:5.1f}%  {count:4d}  {group}"
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nSlowest {options['top']} modules (cumulative)"))
+        slowest = sorted(modules.items(), key=lambda item: -item[1][1])[:options['top']]
+        for module, (self_us, cumulative_us) in slowest:
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+
+def parse_importtime(output):
+    """Return ``{module: (self_us, cumulative_us)}`` from ``-X importtime`` output."""
+    modules = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules[module] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def aggregate_by_app(modules):
+    """
+    Group module self times by the installed app that owns them.
+
+    Modules outside every app are grouped by top-level package, with the
+    rest of Django reported as ``django (core)``.
+    """
+    app_modules = sorted((config.name for config in apps.get_app_configs()), key=len, reverse=True)
+    groups = defaultdict(lambda: [0, 0])
+    for module, (self_us, cumulative_us) in modules.items():
+        for app in app_modules:
+            if module == app or module.startswith(app + '.'):
+                group = app
+                break
+        else:
+            top_level = module.split('.')[0]
+            group = 'django (core)' if top_level == 'django' else top_level
+        groups[group][0] += self_us
+        groups[group][1] += 1
+    return {group: tuple(values) for group, values in groups.items()}
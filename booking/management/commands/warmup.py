@@ -0,0 +1,34 @@
+import compileall
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from Assignment1.serverless import warmup
+
+
+class Command(BaseCommand):
+    help = (
+        'Resolves the URLconf and compiles hot templates, reporting timings. '
+        'Run at build time with --compile-bytecode so the deployment bundle '
+        'ships precompiled .pyc files.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--compile-bytecode',
+            action='store_true',
+            help='Byte-compile the project and installed packages ahead of time'
+        )
+
+    def handle(self, *args, **options):
+        timings = warmup()
+        for name, elapsed in timings.items():
+            self.stdout.write(f"  {elapsed:8.1f} ms  {name}")
+
+        if options['compile_bytecode']:
+            ok = compileall.compile_dir(settings.BASE_DIR, quiet=1, workers=0)
+            ok = compileall.compile_path(quiet=1) and ok
+            if not ok:
+                self.stdout.write(self.style.WARNING('Some files failed to byte-compile.'))
+
+        self.stdout.write(self.style.SUCCESS('Warmup complete.'))
@@ -0,0 +1,222 @@
+"""
+Allocation and memory profiling.
+
+With ``MEMORY_PROFILING = True`` the process runs under ``tracemalloc``
+and ``MemoryProfilingMiddleware`` records, for every request, the peak
+memory allocated above what was in use when the request started and the
+``MEMORY_PROFILING_TOP`` source lines holding the most new memory when the
+response is ready (the response body, serialized data and anything the
+request added to in-process caches). Serializers using
+``MemoryProfiledSerializer`` also report the bytes each object they
+serialize holds, nested serializers included, so a reservation's figure
+covers its user, room and attendees.
+
+Requests are folded into per-route and per-serializer aggregates, and the
+last ``MEMORY_PROFILING_BUFFER_SIZE`` requests are kept with their
+allocation sites; staff read both at ``/api/admin/memory/``.
+
+``tracemalloc`` traces every allocation of the process and snapshots are
+taken twice per request, so this is a diagnostic mode: expect requests to
+run several times slower. Its counters are process-wide, so run it with a
+single-threaded worker for figures that belong to one request. With the
+setting off the middleware removes itself at startup and the serializer
+mixin costs a context variable lookup per object.
+"""
+import linecache
+import os
+import sysconfig
+import threading
+import tracemalloc
+from collections import deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+from .perf import UNRESOLVED
+
+DEFAULT_TOP = 10
+DEFAULT_BUFFER_SIZE = 50
+
+_current = ContextVar('booking_memory_metrics', default=None)
+_lock = threading.Lock()
+_routes = {}
+_serializers = {}
+_recent = deque(maxlen=getattr(settings, 'MEMORY_PROFILING_BUFFER_SIZE', DEFAULT_BUFFER_SIZE))
+
+_PROJECT_DIR = str(settings.BASE_DIR)
+_STDLIB_DIR = sysconfig.get_paths()['stdlib']
+# Snapshots, and the bookkeeping of this module, are not the request's memory
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, os.path.abspath(__file__)),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+class SerializerMetrics:
+    __slots__ = ('objects', 'bytes', 'max_bytes')
+
+    def __init__(self):
+        self.objects = 0
+        self.bytes = 0
+        self.max_bytes = 0
+
+    def add(self, size):
+        self.objects += 1
+        self.bytes += size
+        self.max_bytes = max(self.max_bytes, size)
+
+
+class MemoryProfiledSerializer:
+    """
+    Serializer mixin recording the memory held by each serialized object.
+
+    Put it before the DRF base class. The figure is the growth of traced
+    memory across ``to_representation``, which for a read is the size of
+    the returned data plus anything cached on the way.
+    """
+
+    def to_representation(self, instance):
+        serializers = _current.get()
+        if serializers is None:
+            return super().to_representation(instance)
+        before = tracemalloc.get_traced_memory()[0]
+        data = super().to_representation(instance)
+        size = tracemalloc.get_traced_memory()[0] - before
+        name = type(self).__name__
+        metrics = serializers.get(name)
+        if metrics is None:
+            metrics = serializers[name] = SerializerMetrics()
+        metrics.add(size)
+        return data
+
+
+def _site(stat):
+    frame = stat.traceback[0]
+    filename = os.path.abspath(frame.filename)
+    if filename.startswith(_PROJECT_DIR) and 'site-packages' not in filename:
+        filename = os.path.relpath(filename, _PROJECT_DIR)
+    elif 'site-packages' in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[1]
+    elif filename.startswith(_STDLIB_DIR):
+        filename = os.path.relpath(filename, _STDLIB_DIR)
+    return {
+        'site': f'{filename}:{frame.lineno}',
+        'kib': round(stat.size_diff / 1024, 1),
+        'blocks': stat.count_diff,
+    }
+
+
+def top_sites(before, after, limit):
+    """The ``limit`` source lines whose memory grew most between two snapshots."""
+    stats = after.filter_traces(_FILTERS).compare_to(before.filter_traces(_FILTERS), 'lineno')
+    return [_site(stat) for stat in stats[:limit] if stat.size_diff > 0]
+
+
+def _aggregate(view_name, peak, serializers):
+    with _lock:
+        entry = _routes.get(view_name)
+        if entry is None:
+            entry = _routes[view_name] = {'requests': 0, 'peak_bytes': 0, 'max_peak_bytes': 0}
+        entry['requests'] += 1
+        entry['peak_bytes'] += peak
+        entry['max_peak_bytes'] = max(entry['max_peak_bytes'], peak)
+        for name, metrics in serializers.items():
+            total = _serializers.get(name)
+            if total is None:
+                total = _serializers[name] = {'objects': 0, 'bytes': 0, 'max_bytes': 0}
+            total['objects'] += metrics.objects
+            total['bytes'] += metrics.bytes
+            total['max_bytes'] = max(total['max_bytes'], metrics.max_bytes)
+
+
+def memory_stats():
+    """Return per-route peaks, per-serializer sizes and the recent requests of this process."""
+    with _lock:
+        routes = {name: dict(entry) for name, entry in _routes.items()}
+        serializers = {name: dict(entry) for name, entry in _serializers.items()}
+        recent = list(_recent)
+    route_rows = [
+        {
+            'route': name,
+            'requests': entry['requests'],
+            'avg_peak_kib': round(entry['peak_bytes'] / entry['requests'] / 1024, 1),
+            'max_peak_kib': round(entry['max_peak_bytes'] / 1024, 1),
+        }
+        for name, entry in routes.items()
+    ]
+    route_rows.sort(key=lambda row: row['max_peak_kib'], reverse=True)
+    serializer_rows = [
+        {
+            'serializer': name,
+            'objects': entry['objects'],
+            'avg_bytes': round(entry['bytes'] / entry['objects']),
+            'max_bytes': entry['max_bytes'],
+        }
+        for name, entry in serializers.items()
+    ]
+    serializer_rows.sort(key=lambda row: row['avg_bytes'], reverse=True)
+    return {
+        'tracing': tracemalloc.is_tracing(),
+        'routes': route_rows,
+        'serializers': serializer_rows,
+        'recent': recent,
+    }
+
+
+def reset_memory_stats():
+    with _lock:
+        _routes.clear()
+        _serializers.clear()
+        _recent.clear()
+
+
+class MemoryProfilingMiddleware:
+    """Record the peak memory and top allocation sites of every request."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'MEMORY_PROFILING', False):
+            raise MiddlewareNotUsed
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.get_response = get_response
+        self.top = getattr(settings, 'MEMORY_PROFILING_TOP', DEFAULT_TOP)
+
+    def __call__(self, request):
+        if not tracemalloc.is_tracing():
+            # Stopped by someone else since startup
+            return self.get_response(request)
+        before = tracemalloc.take_snapshot() if self.top else None
+        serializers = {}
+        token = _current.set(serializers)
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        sites = top_sites(before, tracemalloc.take_snapshot(), self.top) if self.top else []
+
+        match = request.resolver_match
+        view_name = match.view_name if match else UNRESOLVED
+        _aggregate(view_name, peak, serializers)
+        with _lock:
+            _recent.appendleft({
+                'time': timezone.now().isoformat(),
+                'method': request.method,
+                'path': request.path,
+                'view': view_name,
+                'status': response.status_code,
+                'peak_kib': round(peak / 1024, 1),
+                'serializers': {
+                    name: {'objects': metrics.objects, 'bytes': metrics.bytes}
+                    for name, metrics in serializers.items()
+                },
+                'top_sites': sites,
+            })
+        return response
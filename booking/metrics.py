@@ -0,0 +1,139 @@
+"""
+Prometheus metrics.
+
+The metrics below are updated where things happen (requests by
+``RequestMetricsMiddleware``, reservations and notifications by signal
+handlers, sessions by ``booking.sessions``, caches by the instrumented
+cache backend) and exposed in the Prometheus text format by
+``metrics_view`` at ``/metrics``. The middleware only times the request
+and counts its queries, so unlike ``booking.perf`` it is always on.
+
+With several worker processes, set ``PROMETHEUS_MULTIPROC_DIR`` to an empty,
+writable directory before the workers start. Every process then writes its
+samples to memory-mapped files there and ``/metrics`` merges them, so any
+worker answers with totals for the whole server. Under gunicorn, clear the
+directory on startup and add a ``child_exit`` hook calling
+``prometheus_client.multiprocess.mark_process_dead(worker.pid)``.
+
+``METRICS_ALLOWED_IPS`` limits who may scrape; other clients get a 404.
+"""
+import os
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+
+UNRESOLVED = '<unresolved>'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+REQUEST_LATENCY = Histogram(
+    'booking_request_duration_seconds', 'Request wall time by URL name',
+    ['view', 'method'], buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    'booking_requests', 'Requests by URL name and status class', ['view', 'method', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'booking_request_db_queries', 'Database queries per request by URL name',
+    ['view'], buckets=QUERY_BUCKETS,
+)
+DB_QUERIES = Counter('booking_db_queries', 'Database queries by URL name', ['view'])
+DB_TIME = Counter('booking_db_time_seconds', 'Time spent in database queries by URL name', ['view'])
+RESERVATION_EVENTS = Counter(
+    'booking_reservation_events', 'Reservations created, approved, rejected or cancelled, '
+    'and bookings rejected for a conflict', ['event'],
+)
+NOTIFICATIONS = Counter('booking_notifications', 'Notifications created by type', ['type'])
+SESSION_WRITES = Counter(
+    'booking_session_writes', 'Session saves by outcome (written or avoided)', ['result'],
+)
+CACHE_REQUESTS = Counter('booking_cache_requests', 'Cache lookups by cache and result', ['cache', 'result'])
+
+
+class QueryCounter:
+    """Execute wrapper counting the queries of one request and the time they take."""
+    __slots__ = ('db_queries', 'db_time')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += perf_counter() - start
+
+
+def observe_request(view_name, method, status_code, wall_time, metrics):
+    """Record one request; ``metrics`` carries its ``db_queries`` and ``db_time``."""
+    REQUEST_LATENCY.labels(view_name, method).observe(wall_time)
+    REQUESTS.labels(view_name, method, f'{status_code // 100}xx').inc()
+    REQUEST_QUERIES.labels(view_name).observe(metrics.db_queries)
+    if metrics.db_queries:
+        DB_QUERIES.labels(view_name).inc(metrics.db_queries)
+        DB_TIME.labels(view_name).inc(metrics.db_time)
+
+
+class RequestMetricsMiddleware:
+    """Export the latency, status and query count of every request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        start = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        wall_time = perf_counter() - start
+
+        match = request.resolver_match
+        view_name = match.view_name if match else UNRESOLVED
+        observe_request(view_name, request.method, response.status_code, wall_time, counter)
+        return response
+
+
+def count_reservation_event(event):
+    RESERVATION_EVENTS.labels(event).inc()
+
+
+def count_notification(notification_type):
+    NOTIFICATIONS.labels(notification_type).inc()
+
+
+def count_session_write(written):
+    SESSION_WRITES.labels('written' if written else 'avoided').inc()
+
+
+def count_cache_lookup(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def collect():
+    """Return the current metrics in the Prometheus text format."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def metrics_view(request):
+    """Serve the metrics to Prometheus."""
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', None)
+    if allowed is not None and request.META.get('REMOTE_ADDR') not in allowed:
+        raise Http404
+    return HttpResponse(collect(), content_type=CONTENT_TYPE_LATEST)
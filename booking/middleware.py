@@ -1,6 +1,8 @@
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 
+from .principal import get_principal
+
 class TimezoneMiddleware(MiddlewareMixin):
     """
     Middleware to handle timezone for the current session.
@@ -8,15 +10,11 @@ class TimezoneMiddleware(MiddlewareMixin):
     activate it. Otherwise, use the default timezone.
     """
     def process_request(self, request):
-        if hasattr(request, 'user') and request.user.is_authenticated:
-            try:
-                # Check if user has a profile with timezone
-                if hasattr(request.user, 'profile') and request.user.profile.timezone:
-                    timezone.activate(request.user.profile.timezone)
-                    return
-            except Exception:
-                # If there's any issue with the profile, use default timezone
-                pass
+        if hasattr(request, 'user'):
+            zoneinfo = get_principal(request).zoneinfo
+            if zoneinfo is not None:
+                timezone.activate(zoneinfo)
+                return
         
-        # Default to UTC if no timezone is set
+        # Fall back to the site default (TIME_ZONE)
         timezone.deactivate()
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['room', 'status', 'start_time'], name='booking_res_room_id_a98967_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['user', 'start_time'], name='booking_res_user_id_dc4b81_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:39
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+POSTGRESQL_FORWARDS = [
+    'CREATE INDEX booking_room_search_gin ON booking_room USING gin (search_vector)',
+    'CREATE INDEX booking_reservation_search_gin ON booking_reservation USING gin (search_vector)',
+]
+
+POSTGRESQL_BACKWARDS = [
+    'DROP INDEX IF EXISTS booking_room_search_gin',
+    'DROP INDEX IF EXISTS booking_reservation_search_gin',
+]
+
+SQLITE_FORWARDS = [
+    "CREATE VIRTUAL TABLE booking_room_fts USING fts5(title, subtitle, body, tokenize='porter unicode61')",
+    "CREATE VIRTUAL TABLE booking_reservation_fts USING fts5(title, subtitle, body, tokenize='porter unicode61')",
+]
+
+SQLITE_BACKWARDS = [
+    'DROP TABLE IF EXISTS booking_room_fts',
+    'DROP TABLE IF EXISTS booking_reservation_fts',
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0002_reservation_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run_for_vendor({'postgresql': POSTGRESQL_FORWARDS, 'sqlite': SQLITE_FORWARDS}),
+            run_for_vendor({'postgresql': POSTGRESQL_BACKWARDS, 'sqlite': SQLITE_BACKWARDS}),
+        ),
+    ]
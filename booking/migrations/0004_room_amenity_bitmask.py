@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+AMENITY_FIELDS = [
+    'has_projector', 'has_whiteboard', 'has_video_conference', 'has_teleconference',
+    'has_wifi', 'has_tv', 'has_podium',
+]
+
+
+def backfill_amenities(apps, schema_editor):
+    Room = apps.get_model('booking', 'Room')
+    for room in Room.objects.all():
+        room.amenities = sum(
+            1 << bit for bit, field in enumerate(AMENITY_FIELDS) if getattr(room, field)
+        )
+        room.save(update_fields=['amenities'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='amenities',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Bitmask of the amenity flags, maintained on save'),
+        ),
+        migrations.RunPython(backfill_amenities, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['is_active', 'capacity', 'amenities'], name='booking_roo_is_acti_fe4150_idx'),
+        ),
+    ]
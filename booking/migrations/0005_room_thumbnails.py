@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0004_room_amenity_bitmask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized variants of the image, maintained by booking.thumbnails'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:53
+
+import booking.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0005_room_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='room',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=booking.storage.ContentAddressedStorage(), upload_to='room_images/'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:56
+
+import booking.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0006_room_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='timezone',
+            field=models.CharField(blank=True, help_text='IANA time zone, e.g. Pacific/Auckland; blank uses the site default', max_length=64, validators=[booking.utils.validate_timezone]),
+        ),
+    ]
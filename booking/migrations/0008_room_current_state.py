@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0007_profile_timezone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomCurrentState',
+            fields=[
+                ('room', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='current_state', serialize=False, to='booking.room')),
+                ('current_until', models.DateTimeField(blank=True, null=True)),
+                ('next_start', models.DateTimeField(blank=True, null=True)),
+                ('valid_until', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('refreshed_at', models.DateTimeField()),
+                ('current_reservation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='booking.reservation')),
+                ('next_reservation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='booking.reservation')),
+            ],
+        ),
+    ]
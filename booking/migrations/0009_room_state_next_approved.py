@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def expire_states(apps, schema_editor):
+    # Existing rows lack the new columns; stale rows are rebuilt on their next read
+    RoomCurrentState = apps.get_model('booking', 'RoomCurrentState')
+    RoomCurrentState.objects.update(valid_until=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0008_room_current_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roomcurrentstate',
+            name='next_approved_reservation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='booking.reservation'),
+        ),
+        migrations.AddField(
+            model_name='roomcurrentstate',
+            name='next_approved_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(expire_states, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from datetime import datetime, time as datetime_time
+from .storage import ContentAddressedStorage
+from .utils import get_zoneinfo, validate_timezone
 
 
 class Profile(models.Model):
@@ -10,10 +13,46 @@ class Profile(models.Model):
     phone_number = models.CharField(max_length=20, blank=True)
     department = models.CharField(max_length=100, blank=True)
     is_admin = models.BooleanField(default=False)
+    timezone = models.CharField(
+        max_length=64,
+        blank=True,
+        validators=[validate_timezone],
+        help_text='IANA time zone, e.g. Pacific/Auckland; blank uses the site default'
+    )
 
     def __str__(self):
         return f"{self.user.get_full_name() or self.user.username}'s Profile"
 
+    @property
+    def zoneinfo(self):
+        """The user's time zone as a ZoneInfo, or None for the site default."""
+        return get_zoneinfo(self.timezone) if self.timezone else None
+
+
+class RoomQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(is_active=True)
+
+    def with_amenities(self, amenities):
+        """Rooms offering every amenity in ``amenities``, as one bitwise predicate."""
+        mask = Room.amenity_mask(amenities)
+        if not mask:
+            return self
+        return self.alias(
+            matched_amenities=models.F('amenities').bitand(mask)
+        ).filter(matched_amenities=mask)
+
+
+class RoomManager(models.Manager):
+    def get_queryset(self):
+        return RoomQuerySet(self.model, using=self._db)
+
+    def active(self):
+        return self.get_queryset().active()
+
+    def with_amenities(self, amenities):
+        return self.get_queryset().with_amenities(amenities)
+
 
 class Room(models.Model):
     ROOM_TYPES = [
@@ -31,6 +70,18 @@ class Room(models.Model):
         ('WEST', 'West Wing'),
     ]
 
+    # Amenity names and their boolean fields, in bitmask order. Append only:
+    # each position is the bit stored in ``amenities``.
+    AMENITIES = [
+        ('projector', 'has_projector'),
+        ('whiteboard', 'has_whiteboard'),
+        ('video_conference', 'has_video_conference'),
+        ('teleconference', 'has_teleconference'),
+        ('wifi', 'has_wifi'),
+        ('tv', 'has_tv'),
+        ('podium', 'has_podium'),
+    ]
+
     name = models.CharField(max_length=100, unique=True)
     room_type = models.CharField(max_length=20, choices=ROOM_TYPES, default='CONFERENCE')
     building = models.CharField(max_length=20, choices=BUILDING_CHOICES, default='MAIN')
@@ -46,6 +97,11 @@ class Room(models.Model):
     has_wifi = models.BooleanField(default=True, verbose_name='WiFi')
     has_tv = models.BooleanField(default=False, verbose_name='TV')
     has_podium = models.BooleanField(default=False, verbose_name='Podium')
+    amenities = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text='Bitmask of the amenity flags, maintained on save'
+    )
     
     # Status
     is_active = models.BooleanField(default=True, help_text='Is this room available for booking?')
@@ -53,12 +109,24 @@ class Room(models.Model):
     
     # Additional info
     description = models.TextField(blank=True, help_text='Detailed description of the room and its features')
-    image = models.ImageField(upload_to='room_images/', blank=True, null=True)
+    image = models.ImageField(
+        upload_to='room_images/',
+        storage=ContentAddressedStorage(),
+        blank=True,
+        null=True
+    )
+    thumbnails = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text='Resized variants of the image, maintained by booking.thumbnails'
+    )
     max_occupancy = models.PositiveIntegerField(blank=True, null=True, help_text='Maximum number of people allowed (for fire safety)')
     
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
     
     # Relationships
     managed_by = models.ForeignKey(
@@ -70,12 +138,52 @@ class Room(models.Model):
         help_text='Staff member responsible for this room'
     )
 
+    objects = RoomManager()
+
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['is_active', 'capacity', 'amenities']),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.get_room_type_display()}, {self.capacity} people)"
 
+    @classmethod
+    def amenity_mask(cls, amenities):
+        """
+        Return the bitmask for an iterable of amenity names.
+
+        Accepts either the short name (``'wifi'``) or the field name
+        (``'has_wifi'``); raises ValueError for anything else.
+        """
+        mask = 0
+        for amenity in amenities:
+            name = amenity.removeprefix('has_')
+            for bit, (amenity_name, field) in enumerate(cls.AMENITIES):
+                if name == amenity_name:
+                    mask |= 1 << bit
+                    break
+            else:
+                raise ValueError(f"Unknown amenity: {amenity}")
+        return mask
+
+    def compute_amenities(self):
+        """Return the bitmask for this room's amenity flags."""
+        return sum(
+            1 << bit
+            for bit, (name, field) in enumerate(self.AMENITIES)
+            if getattr(self, field)
+        )
+
+    def save(self, *args, **kwargs):
+        # Queryset.update() bypasses this; use save() to change amenity flags.
+        self.amenities = self.compute_amenities()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'amenities'}
+        super().save(*args, **kwargs)
+
     def is_available(self, start_time, end_time, exclude_booking_id=None):
         """Check if the room is available for the given time slot."""
         overlapping_bookings = self.reservations.filter(
@@ -96,6 +204,12 @@ class ReservationQuerySet(models.QuerySet):
     
     def pending(self):
         return self.filter(status='PENDING')
+    
+    def with_related(self):
+        """Load the room, owner and attendees (with profiles) that the API renders."""
+        return self.select_related('room', 'user__profile').prefetch_related(
+            models.Prefetch('attendees', queryset=User.objects.select_related('profile'))
+        )
 
 class ReservationManager(models.Manager):
     def get_queryset(self):
@@ -106,6 +220,9 @@ class ReservationManager(models.Manager):
     
     def pending(self):
         return self.get_queryset().pending()
+    
+    def with_related(self):
+        return self.get_queryset().with_related()
 
 class Reservation(models.Model):
     STATUS_CHOICES = [
@@ -246,12 +363,19 @@ class Reservation(models.Model):
         default=False,
         help_text='Has a reminder been sent for this reservation?'
     )
+    
+    # Search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ReservationManager()
 
     class Meta:
         ordering = ['start_time']
         indexes = [
             models.Index(fields=['start_time', 'end_time']),
             models.Index(fields=['status']),
+            models.Index(fields=['room', 'status', 'start_time']),
+            models.Index(fields=['user', 'start_time']),
         ]
 
     def __str__(self):
@@ -288,6 +412,61 @@ class Reservation(models.Model):
         return self.end_time < timezone.now()
 
 
+class RoomCurrentState(models.Model):
+    """
+    Each room's current and next active reservation, and its next approved
+    one (which a pending booking may come before), kept by
+    ``booking.room_state``.
+
+    A row stays correct until ``valid_until``, when the current reservation
+    ends or the next one starts; reservation changes refresh it immediately.
+    """
+    room = models.OneToOneField(
+        Room,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='current_state'
+    )
+    current_reservation = models.ForeignKey(
+        Reservation,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    current_until = models.DateTimeField(null=True, blank=True)
+    next_reservation = models.ForeignKey(
+        Reservation,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    next_start = models.DateTimeField(null=True, blank=True)
+    next_approved_reservation = models.ForeignKey(
+        Reservation,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    next_approved_start = models.DateTimeField(null=True, blank=True)
+    valid_until = models.DateTimeField(null=True, blank=True, db_index=True)
+    refreshed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"State of {self.room_id} at {self.refreshed_at}"
+
+    def is_stale(self, now):
+        return self.valid_until is not None and self.valid_until <= now
+
+    def is_free(self, start, end):
+        """Whether no pending or approved reservation overlaps ``[start, end)``."""
+        if self.current_until is not None and self.current_until > start:
+            return False
+        return self.next_start is None or self.next_start >= end
+
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('BOOKING_CONFIRMATION', 'Booking Confirmation'),
@@ -329,6 +508,8 @@ def create_booking_notification(sender, instance, created, **kwargs):
 def update_booking_notification(sender, instance, **kwargs):
     if instance.pk:
         old_instance = Reservation.objects.get(pk=instance.pk)
+        # Read by record_reservation_metrics once the save succeeds
+        instance._previous_status = old_instance.status
         if old_instance.status != instance.status:
             if instance.status == 'APPROVED':
                 Notification.objects.create(
@@ -346,7 +527,90 @@ def update_booking_notification(sender, instance, **kwargs):
                 )
 
 
+# Signal handlers keeping the full-text search index in sync
+def update_room_search_index(sender, instance, **kwargs):
+    from .search import index_room
+    index_room(instance)
+
+
+def delete_room_search_index(sender, instance, **kwargs):
+    from .search import unindex_room
+    unindex_room(instance)
+
+
+def update_reservation_search_index(sender, instance, **kwargs):
+    from .search import index_reservation
+    index_reservation(instance)
+
+
+def delete_reservation_search_index(sender, instance, **kwargs):
+    from .search import unindex_reservation
+    unindex_reservation(instance)
+
+
+# Signal handler invalidating the in-process room catalog in every worker
+def bump_room_catalog_version(sender, instance, using=None, **kwargs):
+    from .catalog import bump_version
+    bump_version(using=using)
+
+
+# Signal handler queueing thumbnail generation when a room's image changes
+def schedule_room_thumbnails(sender, instance, using=None, **kwargs):
+    from .thumbnails import schedule_thumbnails, thumbnails_stale
+    if thumbnails_stale(instance):
+        schedule_thumbnails(instance.pk, using=using)
+
+
+# Signal handler expiring the anonymous page cache when rooms or bookings change
+def bump_page_cache_generation(sender, instance, using=None, **kwargs):
+    from .page_cache import bump_generation
+    bump_generation(using=using)
+
+
+# Signal handler refreshing the room state snapshot when a reservation changes
+def refresh_room_current_state(sender, instance, using=None, **kwargs):
+    from .room_state import schedule_refresh
+    schedule_refresh(instance, using=using)
+
+
+# Signal handlers feeding the Prometheus counters in booking.metrics
+def record_reservation_metrics(sender, instance, created, **kwargs):
+    from .metrics import count_reservation_event
+    if created:
+        count_reservation_event('created')
+    elif getattr(instance, '_previous_status', instance.status) != instance.status:
+        if instance.status in ('APPROVED', 'REJECTED', 'CANCELLED'):
+            count_reservation_event(instance.status.lower())
+    instance._previous_status = instance.status
+
+
+def record_notification_metrics(sender, instance, created, **kwargs):
+    if created:
+        from .metrics import count_notification
+        count_notification(instance.notification_type)
+
+
 # Connect signals
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 post_save.connect(create_booking_notification, sender=Reservation)
 pre_save.connect(update_booking_notification, sender=Reservation)
+post_save.connect(update_room_search_index, sender=Room)
+post_delete.connect(delete_room_search_index, sender=Room)
+post_save.connect(bump_room_catalog_version, sender=Room)
+post_delete.connect(bump_room_catalog_version, sender=Room)
+post_save.connect(schedule_room_thumbnails, sender=Room)
+post_save.connect(update_reservation_search_index, sender=Reservation)
+post_delete.connect(delete_reservation_search_index, sender=Reservation)
+post_save.connect(bump_page_cache_generation, sender=Room)
+post_delete.connect(bump_page_cache_generation, sender=Room)
+post_save.connect(bump_page_cache_generation, sender=Reservation)
+post_delete.connect(bump_page_cache_generation, sender=Reservation)
+post_save.connect(refresh_room_current_state, sender=Reservation)
+post_save.connect(record_reservation_metrics, sender=Reservation)
+post_save.connect(record_notification_metrics, sender=Notification)
+post_delete.connect(refresh_room_current_state, sender=Reservation)
+
+# Time every query on new connections for the slow-query log
+from django.db.backends.signals import connection_created
+from .slow_queries import install as install_slow_query_log
+connection_created.connect(install_slow_query_log)
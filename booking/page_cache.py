@@ -0,0 +1,120 @@
+"""
+Full-page cache for anonymous visitors.
+
+``anonymous_page_cache(timeout)`` caches a public view's rendered response
+for visitors without a session, keyed on the path and the normalized query
+string. Entries are tied to a generation counter in the shared cache that
+room and reservation changes bump, so a change is visible on the next
+request. Responses that used the CSRF token, set cookies or weren't 200
+are never stored, and cached responses carry ``Cache-Control: public`` and
+``Vary: Cookie`` so a reverse proxy can keep them too.
+"""
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from .metrics import count_cache_lookup
+
+GENERATION_CACHE_KEY = 'booking:page_cache_generation'
+KEY_PREFIX = 'booking:page'
+MESSAGES_COOKIE_NAME = 'messages'
+
+
+def current_generation():
+    generation = cache.get(GENERATION_CACHE_KEY)
+    if generation is None:
+        cache.add(GENERATION_CACHE_KEY, 1, timeout=None)
+        generation = cache.get(GENERATION_CACHE_KEY, 1)
+    return generation
+
+
+def bump_generation(using=None):
+    """Invalidate every cached page once the current transaction commits."""
+    def bump():
+        try:
+            cache.incr(GENERATION_CACHE_KEY)
+        except ValueError:
+            cache.set(GENERATION_CACHE_KEY, 1, timeout=None)
+
+    transaction.on_commit(bump, using=using)
+
+
+def page_cache_key(request):
+    """Cache key for ``request`` from its path and normalized query string."""
+    query = sorted(
+        (key, value)
+        for key, values in request.GET.lists()
+        for value in values if value != ''
+    )
+    url = f"{request.path}?{urlencode(query)}"
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f"{KEY_PREFIX}:{current_generation()}:{digest}"
+
+
+def is_cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and MESSAGES_COOKIE_NAME not in request.COOKIES
+        and not request.user.is_authenticated
+    )
+
+
+def is_cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and not getattr(getattr(request, 'session', None), 'modified', False)
+    )
+
+
+def anonymous_page_cache(timeout):
+    """Cache the decorated view's responses to anonymous visitors for ``timeout`` seconds."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not is_cacheable_request(request):
+                response = view_func(request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+                return response
+
+            key = page_cache_key(request)
+            cached = cache.get(key)
+            count_cache_lookup('pages', cached is not None)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Page-Cache'] = 'hit'
+                return finalize(response, timeout)
+
+            response = view_func(request, *args, **kwargs)
+
+            def store(response):
+                if is_cacheable_response(request, response):
+                    cache.set(key, (response.content, response['Content-Type']), timeout)
+                    response['X-Page-Cache'] = 'miss'
+                    finalize(response, timeout)
+                else:
+                    patch_cache_control(response, private=True)
+
+            if hasattr(response, 'render') and callable(response.render):
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+            return response
+        return wrapper
+    return decorator
+
+
+def finalize(response, timeout):
+    patch_cache_control(response, public=True, max_age=timeout)
+    patch_vary_headers(response, ['Cookie'])
+    return response
@@ -0,0 +1,202 @@
+"""
+Per-request performance instrumentation.
+
+``PerformanceMiddleware`` measures each request's wall time, database
+queries and time, cache hits and misses and template render time, tags the
+measurements with the resolved URL name (``booking:room-list``,
+``room-detail``, ...), adds them to the response as a ``Server-Timing``
+header and folds them into an in-process aggregate read by
+``perf_stats()``.
+
+Database queries are counted with ``connection.execute_wrapper``. Cache
+lookups and template renders are counted by the instrumented backends below
+(``InstrumentedLocMemCache`` and ``InstrumentedDjangoTemplates``), which
+only do work while a request is being measured, apart from the cache's
+Prometheus counters (see ``booking.metrics``). With
+``PERF_INSTRUMENTATION = False`` the middleware removes itself at startup
+and the backends cost a context variable lookup per call.
+"""
+import threading
+from contextlib import ExitStack
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import UNRESOLVED, count_cache_lookup
+
+_current = ContextVar('booking_perf_metrics', default=None)
+_lock = threading.Lock()
+_stats = {}
+
+
+class RequestMetrics:
+    """Counters for the request being measured."""
+    __slots__ = ('db_queries', 'db_time', 'cache_hits', 'cache_misses', 'template_time')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+
+
+def current_metrics():
+    """Return the metrics of the request being measured, or None."""
+    return _current.get()
+
+
+def _record_query(execute, sql, params, many, context):
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.db_queries += 1
+            metrics.db_time += perf_counter() - start
+
+
+def _aggregate(view_name, status_code, wall_time, metrics):
+    with _lock:
+        entry = _stats.get(view_name)
+        if entry is None:
+            entry = _stats[view_name] = {
+                'requests': 0, 'errors': 0, 'wall_time': 0.0, 'max_wall_time': 0.0,
+                'db_queries': 0, 'db_time': 0.0, 'cache_hits': 0, 'cache_misses': 0,
+                'template_time': 0.0,
+            }
+        entry['requests'] += 1
+        entry['errors'] += status_code >= 500
+        entry['wall_time'] += wall_time
+        entry['max_wall_time'] = max(entry['max_wall_time'], wall_time)
+        entry['db_queries'] += metrics.db_queries
+        entry['db_time'] += metrics.db_time
+        entry['cache_hits'] += metrics.cache_hits
+        entry['cache_misses'] += metrics.cache_misses
+        entry['template_time'] += metrics.template_time
+
+
+def perf_stats():
+    """Return per-route totals and averages for this process, busiest routes first."""
+    with _lock:
+        snapshot = {name: dict(entry) for name, entry in _stats.items()}
+    routes = []
+    for name, entry in snapshot.items():
+        count = entry['requests']
+        routes.append({
+            'route': name,
+            **entry,
+            'avg_wall_ms': round(entry['wall_time'] / count * 1000, 3),
+            'avg_db_queries': round(entry['db_queries'] / count, 2),
+            'avg_db_ms': round(entry['db_time'] / count * 1000, 3),
+            'avg_template_ms': round(entry['template_time'] / count * 1000, 3),
+        })
+    routes.sort(key=lambda route: route['db_queries'], reverse=True)
+    return routes
+
+
+def reset_perf_stats():
+    with _lock:
+        _stats.clear()
+
+
+def server_timing(wall_time, metrics):
+    """Format ``metrics`` as a Server-Timing header value."""
+    return ', '.join([
+        f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.db_queries} queries"',
+        f'cache;desc="{metrics.cache_hits} hits, {metrics.cache_misses} misses"',
+        f'tpl;dur={metrics.template_time * 1000:.2f}',
+        f'total;dur={wall_time * 1000:.2f}',
+    ])
+
+
+class PerformanceMiddleware:
+    """
+    Measure every request and report it per resolved URL name.
+
+    ``PERF_SERVER_TIMING`` decides who sees the ``Server-Timing`` header:
+    ``'all'``, ``'staff'`` (the default) or ``'off'``.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'PERF_SERVER_TIMING', 'staff')
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        wall_time = perf_counter() - start
+
+        match = request.resolver_match
+        view_name = match.view_name if match else UNRESOLVED
+        _aggregate(view_name, response.status_code, wall_time, metrics)
+        if self.show_header(request):
+            response['Server-Timing'] = server_timing(wall_time, metrics)
+        return response
+
+    def show_header(self, request):
+        if self.server_timing == 'all':
+            return True
+        if self.server_timing == 'staff':
+            user = getattr(request, 'user', None)
+            return bool(user is not None and user.is_staff)
+        return False
+
+
+class InstrumentedLocMemCache(LocMemCache):
+    """LocMemCache that counts hits and misses, overall and for the request being measured."""
+    _miss = object()
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self.metrics_name = name or 'default'
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._miss, version)
+        hit = value is not self._miss
+        count_cache_lookup(self.metrics_name, hit)
+        metrics = _current.get()
+        if metrics is not None:
+            if hit:
+                metrics.cache_hits += 1
+            else:
+                metrics.cache_misses += 1
+        return value if hit else default
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        start = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Django template backend that times renders for the request being measured."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
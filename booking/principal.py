@@ -0,0 +1,59 @@
+"""
+The user behind a request, resolved once.
+
+``get_principal(request)`` wraps ``request.user`` with its profile and the
+derived admin flag and time zone, and caches the result on the request, so
+middleware, views, permissions and serializers share a single lookup. With
+``booking.backends.ProfileModelBackend`` the profile arrives in the same
+query as the user.
+"""
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.functional import cached_property
+
+
+def get_profile(user):
+    """Return the user's Profile, or None if they have none."""
+    if not user.is_authenticated:
+        return None
+    try:
+        return user.profile
+    except ObjectDoesNotExist:
+        return None
+
+
+class Principal:
+    """Request-scoped view of the current user."""
+
+    def __init__(self, user):
+        self.user = user
+
+    @property
+    def is_authenticated(self):
+        return self.user.is_authenticated
+
+    @cached_property
+    def profile(self):
+        return get_profile(self.user)
+
+    @cached_property
+    def is_admin(self):
+        """Staff members and users whose profile is flagged as admin."""
+        if not self.user.is_authenticated:
+            return False
+        return self.user.is_staff or bool(self.profile and self.profile.is_admin)
+
+    @cached_property
+    def zoneinfo(self):
+        return self.profile.zoneinfo if self.profile else None
+
+
+def get_principal(request):
+    """Return the Principal for ``request``, a Django or REST framework request."""
+    http_request = getattr(request, '_request', request)
+    user = request.user
+    principal = getattr(http_request, '_principal', None)
+    # REST framework may authenticate a different user than the session did
+    if principal is None or principal.user is not user:
+        principal = Principal(user)
+        http_request._principal = principal
+    return principal
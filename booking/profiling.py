@@ -0,0 +1,180 @@
+"""
+On-demand request profiling.
+
+``ProfilingMiddleware`` runs a request under ``cProfile`` when a staff user
+asks for it with ``?_profile=1`` or an ``X-Profile: 1`` header, and for one
+in every ``PROFILE_SAMPLE_RATE`` requests from anyone (0 turns sampling
+off). Each profile goes to a per-process rolling store of
+``PROFILE_STORE_SIZE`` entries and a profiled response carries its id in
+``X-Profile-Id``.
+
+Staff download a profile from ``/api/admin/profiles/<id>/pstats/`` (load it
+with ``pstats.Stats`` or snakeviz) or ``/collapsed/``, folded stacks for
+``flamegraph.pl`` and speedscope. cProfile records caller/callee edges
+rather than whole stacks, so ``collapsed_stacks`` rebuilds stacks by
+splitting each function's time between its callers in proportion to the
+time each call edge took.
+"""
+import cProfile
+import itertools
+import marshal
+import os
+import threading
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from time import perf_counter
+
+from django.conf import settings
+from django.utils import timezone
+
+QUERY_PARAM = '_profile'
+HEADER = 'HTTP_X_PROFILE'
+DEFAULT_STORE_SIZE = 20
+# Subtrees under this share of the profile are folded into their parent
+MIN_STACK_SHARE = 0.001
+MAX_STACK_DEPTH = 128
+
+_lock = threading.Lock()
+_profiles = OrderedDict()
+_requests = itertools.count(1)
+
+
+def _store(profile):
+    limit = getattr(settings, 'PROFILE_STORE_SIZE', DEFAULT_STORE_SIZE)
+    with _lock:
+        _profiles[profile['id']] = profile
+        while len(_profiles) > limit:
+            _profiles.popitem(last=False)
+
+
+def get_profile(profile_id):
+    with _lock:
+        return _profiles.get(profile_id)
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first."""
+    with _lock:
+        profiles = list(_profiles.values())
+    return [
+        {key: value for key, value in profile.items() if key != 'stats'}
+        for profile in reversed(profiles)
+    ]
+
+
+def clear_profiles():
+    with _lock:
+        _profiles.clear()
+
+
+def dump_pstats(stats):
+    """Serialize ``stats`` in the format written by ``Profile.dump_stats``."""
+    return marshal.dumps(stats)
+
+
+def _label(func):
+    filename, lineno, name = func
+    if filename == '~':
+        return name
+    return f'{name} ({os.path.basename(filename)}:{lineno})'
+
+
+def collapsed_stacks(stats):
+    """Fold cProfile ``stats`` into ``frame;frame;frame microseconds`` lines."""
+    callees = defaultdict(dict)
+    for func, (_cc, _nc, _tt, _ct, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge[3]
+    roots = [
+        func for func, entry in stats.items()
+        if not any(caller in stats for caller in entry[4])
+    ]
+    total = sum(stats[root][3] for root in roots)
+    min_share = total * MIN_STACK_SHARE
+    folded = Counter()
+
+    def walk(func, share, path, labels):
+        _cc, _nc, tt, ct, _callers = stats[func]
+        labels = labels + (_label(func),)
+        fraction = share / ct if ct else 0
+        remaining = share
+        if len(labels) < MAX_STACK_DEPTH:
+            for callee, edge_time in callees[func].items():
+                callee_share = edge_time * fraction
+                # Recursive calls are already counted in the outer frame
+                if callee in path or callee_share < min_share:
+                    continue
+                remaining -= callee_share
+                walk(callee, callee_share, path | {callee}, labels)
+        # Own time plus whatever wasn't walked stays on this frame
+        folded[';'.join(labels)] += max(remaining, tt * fraction)
+
+    for root in roots:
+        walk(root, stats[root][3], frozenset((root,)), ())
+    lines = [
+        f'{stack} {round(seconds * 1e6)}'
+        for stack, seconds in folded.items() if round(seconds * 1e6) > 0
+    ]
+    return '\n'.join(sorted(lines)) + '\n'
+
+
+def wants_profile(request):
+    """Whether a staff user asked for ``request`` to be profiled."""
+    asked = request.GET.get(QUERY_PARAM) == '1' or request.META.get(HEADER) == '1'
+    user = getattr(request, 'user', None)
+    return asked and user is not None and user.is_staff
+
+
+def is_sampled():
+    rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+    return bool(rate) and next(_requests) % rate == 0
+
+
+class ProfilingMiddleware:
+    """Profile requests staff ask for, and a sample of all requests."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if wants_profile(request):
+            trigger = 'request'
+        elif is_sampled():
+            trigger = 'sample'
+        else:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this process
+            return self.get_response(request)
+        start = perf_counter()
+        try:
+            response = self.profiled(request)
+        finally:
+            profiler.disable()
+        duration = perf_counter() - start
+
+        profiler.create_stats()
+        match = request.resolver_match
+        profile = {
+            'id': uuid.uuid4().hex,
+            'time': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'trigger': trigger,
+            'stats': profiler.stats,
+        }
+        _store(profile)
+        response['X-Profile-Id'] = profile['id']
+        return response
+
+    def profiled(self, request):
+        # The middleware chain below calls back into itself, so without a
+        # frame of its own no function in the profile would be a root
+        return self.get_response(request)
@@ -0,0 +1,98 @@
+"""
+Per-view database query budgets.
+
+A view declares how many queries one request may run, either with the
+``query_budget`` decorator on a function view or a ``query_budget``
+attribute on a class-based view or viewset. The attribute may be a dict
+keyed by viewset action (``{'list': 6, 'retrieve': 4}``) or by lower-case
+HTTP method, with ``'default'`` as the fallback.
+
+``QueryBudgetMiddleware`` counts each request's queries and compares them
+with the resolved view's budget. ``QUERY_BUDGET_MODE`` decides what an
+overrun does: ``'raise'`` (the default in DEBUG, and so under the test
+runner) raises ``QueryBudgetExceeded``, ``'log'`` writes a warning and
+``'off'`` removes the middleware.
+"""
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(budget):
+    """Declare the query budget of a function view."""
+    def decorator(view_func):
+        view_func.query_budget = budget
+        return view_func
+    return decorator
+
+
+def get_budget(request):
+    """Return the query budget of the view ``request`` resolved to, or None."""
+    match = request.resolver_match
+    if match is None:
+        return None
+    func = match.func
+    owner = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    budget = getattr(owner if owner is not None else func, 'query_budget', None)
+    if isinstance(budget, dict):
+        method = request.method.lower()
+        action = (getattr(func, 'actions', None) or {}).get(method)
+        for key in (action, method, 'default'):
+            if key in budget:
+                return budget[key]
+        return None
+    return budget
+
+
+class QueryCounter:
+    """``execute_wrapper`` that counts queries and remembers their SQL."""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    """Enforce the query budgets declared on views."""
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, 'QUERY_BUDGET_MODE', 'off')
+        if self.mode == 'off':
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+
+        budget = get_budget(request)
+        if budget is not None and counter.count > budget:
+            message = (
+                f"{request.resolver_match.view_name} ran {counter.count} queries, "
+                f"over its budget of {budget}"
+            )
+            if self.mode == 'raise':
+                raise QueryBudgetExceeded(message + ':\n' + '\n'.join(counter.statements))
+            logger.warning(message, extra={
+                'view': request.resolver_match.view_name,
+                'queries': counter.count,
+                'budget': budget,
+            })
+        return response
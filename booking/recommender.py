@@ -0,0 +1,66 @@
+"""
+Best-fit room recommendations.
+
+Candidates come from the room catalog's capacity-sorted index, so only rooms
+that can seat the group are considered, smallest first. The occupancy of
+those rooms over the requested day(s) is then read in a single query.
+"""
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .catalog import get_room_catalog
+from .models import Reservation
+from .utils import date_range_window, overlap_q
+
+ACTIVE_STATUSES = ['PENDING', 'APPROVED']
+
+
+def day_occupancy(start, end, room_ids):
+    """
+    Return ``{room_id: [(start, end), ...]}`` for every active booking of the
+    rooms in ``room_ids`` that overlaps the local day(s) spanned by ``start``
+    and ``end``.
+    """
+    window = date_range_window(timezone.localdate(start), timezone.localdate(end))
+    occupancy = defaultdict(list)
+    for room_id, booked_start, booked_end in Reservation.objects.filter(
+        overlap_q(*window),
+        room_id__in=room_ids,
+        status__in=ACTIVE_STATUSES
+    ).order_by().values_list('room_id', 'start_time', 'end_time'):
+        occupancy[room_id].append((booked_start, booked_end))
+    return occupancy
+
+
+def recommend_rooms(start, end, attendees, amenities=0, limit=5):
+    """
+    Return up to ``limit`` free rooms for ``[start, end)`` that seat
+    ``attendees`` and offer every amenity in the ``amenities`` bitmask.
+
+    Rooms are ordered by capacity, smallest first. Among rooms of the same
+    size, the one already busiest that day wins, keeping emptier rooms free
+    for longer bookings.
+    """
+    candidates = [
+        room for room in get_room_catalog().with_capacity(attendees)
+        if room.has_amenities(amenities)
+    ]
+    if not candidates:
+        return []
+
+    occupancy = day_occupancy(start, end, [room.pk for room in candidates])
+
+    def booked_seconds(room):
+        return sum((b - a).total_seconds() for a, b in occupancy.get(room.pk, ()))
+
+    free = []
+    for room in candidates:
+        # Candidates are capacity-sorted: once ``limit`` rooms are found,
+        # only rooms of the same size can still displace them.
+        if len(free) >= limit and room.capacity > free[limit - 1].capacity:
+            break
+        if not any(a < end and b > start for a, b in occupancy.get(room.pk, ())):
+            free.append(room)
+    free.sort(key=lambda room: (room.capacity, -booked_seconds(room), room.name))
+    return free[:limit]
@@ -0,0 +1,107 @@
+"""
+What every room is doing right now.
+
+``RoomCurrentState`` holds one row per room with its current and next
+pending or approved reservation, plus the next approved one for the
+``reserved_soon`` status. Reservation saves and deletes refresh the
+affected rows once the transaction commits, and a row whose ``valid_until``
+has passed (its current booking ended or the next one started) is refreshed
+the next time it is read, so ``get_room_states()`` is normally a single
+primary-key scan no matter how many reservations exist.
+
+``manage.py refresh_room_state`` rebuilds every row and can run from cron
+every minute to keep reads from ever paying for a refresh.
+"""
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .catalog import get_room_catalog
+from .models import Reservation, Room, RoomCurrentState
+
+ACTIVE_STATUSES = ['PENDING', 'APPROVED']
+UPDATE_FIELDS = [
+    'current_reservation', 'current_until', 'next_reservation', 'next_start',
+    'next_approved_reservation', 'next_approved_start', 'valid_until', 'refreshed_at',
+]
+
+
+def refresh_room_state(room_ids=None, now=None):
+    """Recompute the state of ``room_ids`` (every room if None) in one query and upsert it."""
+    now = now or timezone.now()
+    active = Reservation.objects.filter(
+        room=OuterRef('pk'), status__in=ACTIVE_STATUSES
+    ).order_by('start_time')
+    current = active.filter(start_time__lte=now, end_time__gt=now)
+    upcoming = active.filter(start_time__gt=now)
+    upcoming_approved = upcoming.filter(status='APPROVED')
+
+    rooms = Room.objects.order_by()
+    if room_ids is not None:
+        rooms = rooms.filter(pk__in=room_ids)
+    rows = rooms.annotate(
+        current_id=Subquery(current.values('pk')[:1]),
+        current_until=Subquery(current.values('end_time')[:1]),
+        next_id=Subquery(upcoming.values('pk')[:1]),
+        next_start=Subquery(upcoming.values('start_time')[:1]),
+        next_approved_id=Subquery(upcoming_approved.values('pk')[:1]),
+        next_approved_start=Subquery(upcoming_approved.values('start_time')[:1]),
+    ).values_list(
+        'pk', 'current_id', 'current_until', 'next_id', 'next_start',
+        'next_approved_id', 'next_approved_start',
+    )
+
+    states = []
+    for (room_id, current_id, current_until, next_id, next_start,
+         next_approved_id, next_approved_start) in rows:
+        boundaries = [t for t in (current_until, next_start) if t is not None]
+        states.append(RoomCurrentState(
+            room_id=room_id,
+            current_reservation_id=current_id,
+            current_until=current_until,
+            next_reservation_id=next_id,
+            next_start=next_start,
+            next_approved_reservation_id=next_approved_id,
+            next_approved_start=next_approved_start,
+            valid_until=min(boundaries) if boundaries else None,
+            refreshed_at=now,
+        ))
+    RoomCurrentState.objects.bulk_create(
+        states, update_conflicts=True, unique_fields=['room'], update_fields=UPDATE_FIELDS
+    )
+    return len(states)
+
+
+def schedule_refresh(reservation, using=None):
+    """Refresh the rooms ``reservation`` affects once the current transaction commits."""
+    room_ids = {reservation.room_id}
+    # The booking may have moved rooms, or been another room's current/next one
+    room_ids.update(RoomCurrentState.objects.using(using).filter(
+        Q(current_reservation_id=reservation.pk) | Q(next_reservation_id=reservation.pk)
+        | Q(next_approved_reservation_id=reservation.pk)
+    ).values_list('room_id', flat=True))
+    schedule_room_refresh(room_ids, using=using)
+
+
+def schedule_room_refresh(room_ids, using=None):
+    """Refresh ``room_ids`` once the current transaction commits, e.g. after a bulk update."""
+    room_ids = set(room_ids)
+    if room_ids:
+        transaction.on_commit(lambda: refresh_room_state(room_ids), using=using)
+
+
+def get_room_states(now=None):
+    """Return ``{room_id: RoomCurrentState}`` for every room, refreshing stale rows."""
+    now = now or timezone.now()
+    queryset = RoomCurrentState.objects.select_related(
+        'current_reservation__user', 'next_reservation__user', 'next_approved_reservation__user'
+    )
+    states = {state.room_id: state for state in queryset}
+    stale = [
+        pk for pk in get_room_catalog().by_id
+        if pk not in states or states[pk].is_stale(now)
+    ]
+    if stale:
+        refresh_room_state(stale, now)
+        states.update((state.room_id, state) for state in queryset.filter(room_id__in=stale))
+    return states
@@ -0,0 +1,145 @@
+"""
+Full-text search for rooms and reservations.
+
+PostgreSQL keeps a weighted ``tsvector`` in each row's ``search_vector``
+column, backed by a GIN index. SQLite keeps a parallel FTS5 table keyed by
+the row id. Other backends fall back to ``icontains`` matching.
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'english'
+
+ROOM_FTS_TABLE = 'booking_room_fts'
+RESERVATION_FTS_TABLE = 'booking_reservation_fts'
+
+# Column weights, most to least significant: PostgreSQL labels and the
+# matching FTS5 bm25() multipliers.
+WEIGHTS = ('A', 'B', 'C')
+BM25_WEIGHTS = '10.0, 4.0, 1.0'
+
+MAX_TERMS = 16
+
+
+def tokenize(query):
+    """Split a user query into lowercase word terms, dropping any syntax."""
+    return re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+
+
+def room_document(room):
+    """Return the weighted text columns indexed for a room."""
+    return (
+        f'{room.name} {room.room_number}',
+        f'{room.get_room_type_display()} {room.room_type} {room.get_building_display()}',
+        room.description,
+    )
+
+
+def reservation_document(reservation):
+    """Return the weighted text columns indexed for a reservation."""
+    user = reservation.user
+    return (
+        reservation.title,
+        f'{user.username} {user.get_full_name()} {reservation.room.name}',
+        reservation.description,
+    )
+
+
+def _index(instance, table, document):
+    connection = connections[instance._state.db or 'default']
+    if connection.vendor == 'postgresql':
+        vector = reduce(lambda a, b: a + b, (
+            SearchVector(Value(text or ''), weight=weight, config=SEARCH_CONFIG)
+            for text, weight in zip(document, WEIGHTS)
+        ))
+        type(instance)._default_manager.using(connection.alias).filter(
+            pk=instance.pk
+        ).update(search_vector=vector)
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [instance.pk])
+            cursor.execute(
+                f'INSERT INTO {table} (rowid, title, subtitle, body) VALUES (%s, %s, %s, %s)',
+                [instance.pk, *(text or '' for text in document)]
+            )
+
+
+def _unindex(instance, table):
+    connection = connections[instance._state.db or 'default']
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [instance.pk])
+
+
+def index_room(room):
+    _index(room, ROOM_FTS_TABLE, room_document(room))
+
+
+def index_reservation(reservation):
+    _index(reservation, RESERVATION_FTS_TABLE, reservation_document(reservation))
+
+
+def unindex_room(room):
+    _unindex(room, ROOM_FTS_TABLE)
+
+
+def unindex_reservation(reservation):
+    _unindex(reservation, RESERVATION_FTS_TABLE)
+
+
+def _search(queryset, query, table, fallback_fields):
+    terms = tokenize(query)
+    if not terms:
+        return queryset.none()
+
+    ordering = ('-search_rank', *queryset.query.order_by)
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'postgresql':
+        tsquery = SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms),
+            search_type='raw',
+            config=SEARCH_CONFIG
+        )
+        return queryset.filter(search_vector=tsquery).annotate(
+            search_rank=SearchRank(F('search_vector'), tsquery)
+        ).order_by(*ordering)
+
+    if vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        opts = queryset.model._meta
+        pk_column = f'"{opts.db_table}"."{opts.pk.column}"'
+        matches = RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [match])
+        rank = RawSQL(
+            f'SELECT -bm25({table}, {BM25_WEIGHTS}) FROM {table} '
+            f'WHERE {table} MATCH %s AND rowid = {pk_column}',
+            [match],
+            output_field=FloatField()
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank).order_by(*ordering)
+
+    condition = Q()
+    for term in terms:
+        condition &= reduce(or_, (Q(**{f'{field}__icontains': term}) for field in fallback_fields))
+    return queryset.filter(condition).annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    ).order_by(*ordering)
+
+
+def search_rooms(queryset, query):
+    """Filter ``queryset`` to rooms matching ``query``, best match first."""
+    return _search(queryset, query, ROOM_FTS_TABLE, ['name', 'description', 'room_type'])
+
+
+def search_reservations(queryset, query):
+    """Filter ``queryset`` to reservations matching ``query``, best match first."""
+    return _search(
+        queryset, query, RESERVATION_FTS_TABLE,
+        ['title', 'description', 'user__username', 'room__name']
+    )
@@ -1,12 +1,37 @@
 from django.utils import timezone
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from booking.catalog import get_room_catalog
+from booking.memory import MemoryProfiledSerializer
+from booking.metrics import count_reservation_event
 from booking.models import Room, Reservation, Notification, Profile
+from booking.principal import get_principal, get_profile
+from booking.room_state import get_room_states
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class RoomPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """Active room id field validated against the room catalog, without a query."""
+    
+    def __init__(self, **kwargs):
+        kwargs.setdefault('queryset', Room.objects.filter(is_active=True))
+        super().__init__(**kwargs)
+    
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        record = get_room_catalog().get(pk)
+        if record is None:
+            self.fail('does_not_exist', pk_value=data)
+        return record.to_model()
+
+
+class UserSerializer(MemoryProfiledSerializer, serializers.ModelSerializer):
     """Serializer for the User model."""
     full_name = serializers.SerializerMethodField()
     is_admin = serializers.SerializerMethodField()
@@ -23,44 +48,63 @@ class UserSerializer(serializers.ModelSerializer):
         return f"{obj.first_name} {obj.last_name}"
     
     def get_is_admin(self, obj):
-        return hasattr(obj, 'profile') and obj.profile.is_admin
+        profile = get_profile(obj)
+        return bool(profile and profile.is_admin)
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(MemoryProfiledSerializer, serializers.ModelSerializer):
     """Serializer for the Profile model."""
     user = UserSerializer()
     
     class Meta:
         model = Profile
-        fields = ['id', 'user', 'phone_number', 'department', 'is_admin']
+        fields = ['id', 'user', 'phone_number', 'department', 'timezone', 'is_admin']
         read_only_fields = ['id', 'user', 'is_admin']
 
 
-class RoomSerializer(serializers.ModelSerializer):
+class RoomSerializer(MemoryProfiledSerializer, serializers.ModelSerializer):
     """Serializer for the Room model."""
     status = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Room
         fields = [
             'id', 'name', 'room_type', 'capacity', 'floor',
             'has_projector', 'has_whiteboard', 'has_video_conference',
-            'is_active', 'description', 'image', 'status'
+            'is_active', 'description', 'image', 'image_srcset', 'status'
         ]
         read_only_fields = ['id', 'status']
     
+    def get_image_srcset(self, obj):
+        """``srcset`` values per format, or None until thumbnails exist."""
+        from django.core.files.storage import default_storage
+        variants = (obj.thumbnails or {}).get('variants')
+        if not variants:
+            return None
+        request = self.context.get('request')
+        def absolute_url(name):
+            url = default_storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+        return {
+            fmt: ', '.join(f'{absolute_url(name)} {width}w' for width, name in sizes)
+            for fmt, sizes in variants.items()
+        }
+    
     def get_status(self, obj):
         """Get the current status of the room (available, in use, etc.)."""
         now = timezone.now()
+        # One snapshot read shared by every room in the response
+        states = self.context.get('room_states')
+        if states is None:
+            states = self.context['room_states'] = get_room_states(now)
+        state = states.get(obj.pk)
+        if state is None:
+            return {'status': 'available'}
         
         # Check if the room is currently in use
-        current_reservation = obj.reservations.filter(
-            start_time__lte=now,
-            end_time__gte=now,
-            status='APPROVED'
-        ).first()
-        
-        if current_reservation:
+        current_reservation = state.current_reservation
+        if current_reservation and current_reservation.status == 'APPROVED':
             return {
                 'status': 'in_use',
                 'until': current_reservation.end_time,
@@ -69,13 +113,9 @@ class RoomSerializer(serializers.ModelSerializer):
             }
         
         # Check if there's an upcoming reservation soon (within the next 15 minutes)
-        upcoming_reservation = obj.reservations.filter(
-            start_time__gt=now,
-            start_time__lte=now + timezone.timedelta(minutes=15),
-            status='APPROVED'
-        ).order_by('start_time').first()
-        
-        if upcoming_reservation:
+        upcoming_reservation = state.next_approved_reservation
+        if (upcoming_reservation and upcoming_reservation.status == 'APPROVED'
+                and upcoming_reservation.start_time <= now + timezone.timedelta(minutes=15)):
             return {
                 'status': 'reserved_soon',
                 'starts_at': upcoming_reservation.start_time,
@@ -87,12 +127,11 @@ class RoomSerializer(serializers.ModelSerializer):
         return {'status': 'available'}
 
 
-class ReservationSerializer(serializers.ModelSerializer):
+class ReservationSerializer(MemoryProfiledSerializer, serializers.ModelSerializer):
     """Serializer for the Reservation model."""
     user = UserSerializer(read_only=True)
     room = RoomSerializer(read_only=True)
-    room_id = serializers.PrimaryKeyRelatedField(
-        queryset=Room.objects.filter(is_active=True),
+    room_id = RoomPrimaryKeyField(
         source='room',
         write_only=True
     )
@@ -137,6 +176,7 @@ class ReservationSerializer(serializers.ModelSerializer):
             exclude_pk = self.instance.id if self.instance else None
             
             if not room.is_available(start_time, end_time, exclude_booking_id=exclude_pk):
+                count_reservation_event('conflict')
                 raise serializers.ValidationError(
                     "The selected time slot is not available. Please choose a different time or room."
                 )
@@ -152,14 +192,15 @@ class ReservationSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         
         # If the user is an admin, set status to approved
-        if hasattr(validated_data['user'], 'profile') and validated_data['user'].profile.is_admin:
+        profile = get_principal(self.context['request']).profile
+        if profile and profile.is_admin:
             validated_data['status'] = 'APPROVED'
             validated_data['created_by_admin'] = True
         
         return super().create(validated_data)
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(MemoryProfiledSerializer, serializers.ModelSerializer):
     """Serializer for the Notification model."""
     reservation = ReservationSerializer(read_only=True)
     notification_type_display = serializers.CharField(
@@ -178,7 +219,7 @@ class NotificationSerializer(serializers.ModelSerializer):
 
 class AvailabilitySerializer(serializers.Serializer):
     """Serializer for room availability checks."""
-    room_id = serializers.PrimaryKeyRelatedField(queryset=Room.objects.filter(is_active=True))
+    room_id = RoomPrimaryKeyField()
     start_time = serializers.DateTimeField()
     end_time = serializers.DateTimeField()
     
@@ -193,3 +234,40 @@ class AvailabilitySerializer(serializers.Serializer):
             raise serializers.ValidationError("The selected time slot is not available.")
         
         return data
+
+
+class RoomRecommendationSerializer(serializers.Serializer):
+    """Serializer for best-fit room recommendation requests."""
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+    attendees = serializers.IntegerField(min_value=1)
+    amenities = serializers.CharField(required=False, allow_blank=True)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=5)
+    
+    def validate_amenities(self, value):
+        """Convert a comma-separated amenity list into a bitmask."""
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        try:
+            return Room.amenity_mask(names)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+    
+    def validate(self, data):
+        """Validate the requested time window."""
+        if data['end_time'] <= data['start_time']:
+            raise serializers.ValidationError("End time must be after start time.")
+        return data
+
+
+class RoomRecommendationResultSerializer(serializers.Serializer):
+    """Serializer for recommended rooms read from the room catalog."""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    room_type = serializers.CharField()
+    building = serializers.CharField()
+    floor = serializers.IntegerField()
+    capacity = serializers.IntegerField()
+    spare_seats = serializers.SerializerMethodField()
+    
+    def get_spare_seats(self, obj):
+        return obj.capacity - self.context['attendees']
@@ -0,0 +1,134 @@
+"""
+Session engine that avoids rewriting unchanged sessions.
+
+With ``SESSION_SAVE_EVERY_REQUEST`` every response saves the session to
+extend its expiry, an UPDATE per page view. This engine only writes when
+the session data changed or when ``SESSION_REFRESH_FRACTION`` of its age
+has passed since the last write, so the expiry still slides forward but at
+most once per interval. Reads go through the cache first, like
+``cached_db``, but only when ``SESSION_CACHE_ALIAS`` is shared between
+workers: with a process-local cache (locmem, dummy) a logout in one worker
+would leave the session cached and valid in every other, so sessions are
+read from the database instead.
+
+Enable with ``SESSION_ENGINE = 'booking.sessions'``. ``session_stats()``
+reports how many writes were avoided in this process.
+"""
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+
+from .metrics import count_cache_lookup, count_session_write
+
+KEY_PREFIX = 'booking.sessions'
+DEFAULT_REFRESH_FRACTION = 0.1
+
+_lock = threading.Lock()
+_stats = {'cache_hits': 0, 'cache_misses': 0, 'writes': 0, 'writes_avoided': 0}
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+    if name in ('cache_hits', 'cache_misses'):
+        count_cache_lookup('sessions', name == 'cache_hits')
+    else:
+        count_session_write(name == 'writes')
+
+
+def session_stats():
+    """Return the session counters for this process."""
+    with _lock:
+        return dict(_stats)
+
+
+class SessionStore(CachedDBStore):
+    """
+    Cached, database-backed sessions whose expiry refreshes are coalesced.
+
+    The cache holds the session data together with the expiry last written
+    to the database, which is what decides whether a refresh is due.
+    """
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        self._stored_expiry = None
+        super().__init__(session_key)
+
+    @property
+    def shared_cache(self):
+        """Whether every worker sees the same session cache."""
+        return not isinstance(self._cache, (LocMemCache, DummyCache))
+
+    def load(self):
+        if not self.shared_cache:
+            s = self._get_session_from_db()
+            if not s:
+                return {}
+            self._stored_expiry = s.expire_date
+            return self.decode(s.session_data)
+
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            # Some backends (e.g. memcache) raise on invalid keys; see cached_db.
+            entry = None
+
+        if entry is not None:
+            _count('cache_hits')
+            self._stored_expiry = entry['expires']
+            return entry['data']
+
+        _count('cache_misses')
+        s = self._get_session_from_db()
+        if not s:
+            return {}
+        data = self.decode(s.session_data)
+        self._cache_entry(data, s.expire_date)
+        return data
+
+    def save(self, must_create=False):
+        if not must_create and not self.modified and not self.refresh_due():
+            _count('writes_avoided')
+            return
+        expire_date = self.get_expiry_date()
+        DBStore.save(self, must_create=must_create)
+        _count('writes')
+        self._cache_entry(self._session, expire_date)
+
+    def refresh_due(self):
+        """Whether enough of the session's lifetime has passed to re-save it."""
+        self._get_session()
+        if self._stored_expiry is None:
+            return True
+        fraction = getattr(settings, 'SESSION_REFRESH_FRACTION', DEFAULT_REFRESH_FRACTION)
+        age = self.get_expiry_age()
+        remaining = (self._stored_expiry - timezone.now()).total_seconds()
+        return age - remaining >= age * fraction
+
+    def _cache_entry(self, data, expire_date):
+        self._stored_expiry = expire_date
+        if not self.shared_cache:
+            return
+        try:
+            self._cache.set(
+                self.cache_key,
+                {'data': data, 'expires': expire_date},
+                self.get_expiry_age(expiry=expire_date)
+            )
+        except Exception:
+            # A failed cache write only costs a database read later
+            pass
+
+    # The async variants of cached_db store a different cache format
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create=must_create)
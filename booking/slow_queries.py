@@ -0,0 +1,181 @@
+"""
+Slow-query log.
+
+``record_slow_query`` is an ``execute_wrapper`` installed on every database
+connection as it is created. Queries slower than ``SLOW_QUERY_THRESHOLD_MS``
+are kept in an in-memory ring buffer of ``SLOW_QUERY_BUFFER_SIZE`` entries,
+together with the view that ran them (set by ``SlowQueryMiddleware``) and
+the first stack frame in the project's own code.
+
+With ``SLOW_QUERY_EXPLAIN`` the first slow occurrence of each normalized
+statement is also explained: ``EXPLAIN ANALYZE`` on PostgreSQL and
+``EXPLAIN QUERY PLAN`` on SQLite. ``ANALYZE`` runs the statement again,
+so only SELECTs are explained and ``SELECT ... FOR UPDATE`` is skipped,
+since it would take its row locks a second time. It defaults to DEBUG for
+that reason. The EXPLAIN runs on the driver's
+cursor, below Django's execute wrappers, so query budgets, performance
+counters and this log never see it. Staff can read the buffer at
+``/staff/slow-queries/``.
+"""
+import os
+import re
+import threading
+import traceback
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+DEFAULT_THRESHOLD_MS = 100
+DEFAULT_BUFFER_SIZE = 200
+MAX_PLANS = 500
+EXPLAIN_SAVEPOINT = 'booking_explain'
+
+_request = ContextVar('booking_slow_query_request', default=None)
+_lock = threading.Lock()
+_entries = deque(maxlen=getattr(settings, 'SLOW_QUERY_BUFFER_SIZE', DEFAULT_BUFFER_SIZE))
+_plans = OrderedDict()
+
+_PROJECT_DIR = str(settings.BASE_DIR)
+_THIS_FILE = os.path.abspath(__file__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Reduce ``sql`` to a fingerprint shared by statements differing only in values."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def _origin():
+    """The innermost stack frame in project code, outside this module."""
+    for frame in reversed(traceback.extract_stack()[:-3]):
+        filename = os.path.abspath(frame.filename)
+        if (filename.startswith(_PROJECT_DIR) and filename != _THIS_FILE
+                and 'site-packages' not in filename):
+            return f'{os.path.relpath(filename, _PROJECT_DIR)}:{frame.lineno} in {frame.name}'
+    return None
+
+
+def _explain(connection, sql, params):
+    if connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN ANALYZE '
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+    # A savepoint keeps a failed EXPLAIN from breaking the caller's transaction
+    savepoint = connection.in_atomic_block and connection.features.uses_savepoints
+    cursor = connection.create_cursor()
+    try:
+        with connection.wrap_database_errors:
+            if savepoint:
+                cursor.execute(connection.ops.savepoint_create_sql(EXPLAIN_SAVEPOINT))
+            try:
+                cursor.execute(prefix + sql, params)
+                rows = cursor.fetchall()
+            except DatabaseError:
+                if savepoint:
+                    cursor.execute(connection.ops.savepoint_rollback_sql(EXPLAIN_SAVEPOINT))
+                raise
+            if savepoint:
+                cursor.execute(connection.ops.savepoint_commit_sql(EXPLAIN_SAVEPOINT))
+    except DatabaseError as exc:
+        return f'EXPLAIN failed: {exc}'
+    finally:
+        cursor.close()
+    return '\n'.join(' '.join(str(value) for value in row) for row in rows)
+
+
+def _plan_for(fingerprint, connection, sql, params, many):
+    """Return the stored plan of ``fingerprint``, explaining it the first time."""
+    with _lock:
+        if fingerprint in _plans:
+            _plans.move_to_end(fingerprint)
+            return _plans[fingerprint]
+    statement = sql.lstrip().upper()
+    if many or not statement.startswith('SELECT') or 'FOR UPDATE' in statement:
+        plan = None
+    else:
+        plan = _explain(connection, sql, params)
+    with _lock:
+        _plans[fingerprint] = plan
+        while len(_plans) > MAX_PLANS:
+            _plans.popitem(last=False)
+    return plan
+
+
+def record_slow_query(execute, sql, params, many, context):
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration_ms = (perf_counter() - start) * 1000
+        threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', DEFAULT_THRESHOLD_MS)
+        if threshold is not None and duration_ms >= threshold:
+            _record(sql, params, many, context['connection'], duration_ms)
+
+
+def _record(sql, params, many, connection, duration_ms):
+    fingerprint = normalize(sql)
+    plan = None
+    if getattr(settings, 'SLOW_QUERY_EXPLAIN', False) and connection.is_usable():
+        plan = _plan_for(fingerprint, connection, sql, params, many)
+    request = _request.get()
+    match = getattr(request, 'resolver_match', None)
+    entry = {
+        'time': timezone.now(),
+        'duration_ms': round(duration_ms, 2),
+        'sql': sql,
+        'params': repr(params)[:500],
+        'fingerprint': fingerprint,
+        'database': connection.alias,
+        'view': match.view_name if match else None,
+        'path': request.path if request is not None else None,
+        'origin': _origin(),
+        'plan': plan,
+    }
+    with _lock:
+        _entries.appendleft(entry)
+
+
+def install(sender, connection, **kwargs):
+    """``connection_created`` receiver adding the slow-query wrapper."""
+    if record_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_slow_query)
+
+
+def slow_queries():
+    """Return the recorded slow queries, newest first."""
+    with _lock:
+        return list(_entries)
+
+
+def clear_slow_queries():
+    with _lock:
+        _entries.clear()
+        _plans.clear()
+
+
+class SlowQueryMiddleware:
+    """Make the current request available to the slow-query log."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
@@ -0,0 +1,74 @@
+"""
+Content-addressed file storage.
+
+Uploads are stored as ``<upload_to>/<ab>/<sha256><ext>``, so identical files
+are written once no matter how many rooms use them. The hash is computed
+while the upload is streamed to disk chunk by chunk, never holding the whole
+file in memory. Because names are derived from content, a stored file never
+changes and can be cached indefinitely (see ``booking.views.serve_media``).
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_NAME = re.compile(r'(?:^|/)[0-9a-f]{2}/([0-9a-f]{64})(?:\.[^/.]+)?$')
+
+
+def content_hash(name):
+    """Return the SHA-256 a content-addressed ``name`` was stored under, or None."""
+    match = CONTENT_NAME.search(name)
+    return match.group(1) if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names each file after the SHA-256 of its content."""
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save(); identical content
+        # is meant to map onto the existing file.
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        os.makedirs(self.location, exist_ok=True)
+
+        digest = hashlib.sha256()
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk (TemporaryFileUploadHandler): hash it in place
+            source = content.temporary_file_path()
+            content.seek(0)
+            for chunk in content.chunks():
+                digest.update(chunk)
+            staged = None
+        else:
+            fd, staged = tempfile.mkstemp(dir=self.location, suffix='.upload')
+            with os.fdopen(fd, 'wb') as f:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+            source = staged
+
+        hashed = digest.hexdigest()
+        name = posixpath.join(directory, hashed[:2], f'{hashed}{extension}')
+        path = self.path(name)
+
+        if os.path.exists(path):
+            if staged:
+                os.remove(staged)
+            return name
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if staged:
+            os.replace(staged, path)
+        else:
+            file_move_safe(source, path)
+        os.chmod(path, self.file_permissions_mode or 0o644)
+        return name
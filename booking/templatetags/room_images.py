@@ -0,0 +1,27 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from ..thumbnails import fallback_url, srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def room_picture(room, sizes='100vw', width=640, **attrs):
+    """
+    Render a room's image as a ``<picture>`` offering WebP and JPEG variants.
+
+    Rooms whose thumbnails haven't been generated yet get a plain ``<img>``
+    of the original. Extra keyword arguments become ``<img>`` attributes,
+    e.g. ``{% room_picture room sizes="33vw" class="card-img-top" %}``.
+    """
+    attrs = {'alt': room.name, 'loading': 'lazy', 'decoding': 'async', **attrs}
+    webp = srcset(room, 'webp')
+    if not webp:
+        return format_html('<img src="{}"{}>', room.image.url, flatatt(attrs))
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        webp, sizes, fallback_url(room, width), srcset(room, 'jpeg'), sizes, flatatt(attrs)
+    )
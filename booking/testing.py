@@ -0,0 +1,101 @@
+"""
+Test helpers for query-count regressions.
+
+``QueryScalingMixin`` requests every GET-able URL in the project at two
+dataset sizes and fails when a route's query count grows with the data,
+which is how N+1 patterns show up. A test case using it provides
+``seed_dataset(size)`` and ``route_kwargs(name, arguments)``; routes whose
+URL arguments it doesn't fill, or that resolve to another view (e.g.
+shadowed by the admin), are skipped.
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.template import TemplateDoesNotExist
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, resolve, reverse
+from django.urls.exceptions import NoReverseMatch, Resolver404
+
+
+def iter_routes(patterns=None, namespace=None):
+    """Yield ``(view_name, argument_names)`` for every named URL pattern."""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for entry in patterns:
+        if isinstance(entry, URLResolver):
+            child_namespace = namespace
+            if entry.namespace:
+                child_namespace = f'{namespace}:{entry.namespace}' if namespace else entry.namespace
+            yield from iter_routes(entry.url_patterns, child_namespace)
+        elif isinstance(entry, URLPattern) and entry.name:
+            name = f'{namespace}:{entry.name}' if namespace else entry.name
+            pattern = entry.pattern
+            converters = getattr(pattern, 'converters', None) or {}
+            arguments = tuple(converters) or tuple(pattern.regex.groupindex)
+            yield name, arguments
+
+
+class QueryScalingMixin:
+    """Fail when any route's query count grows with the size of the dataset."""
+    query_scaling_sizes = (2, 6)
+    # Routes never requested: side effects on GET or not pages at all
+    query_scaling_exclude = ()
+    # Third-party URL namespaces left out of the run
+    query_scaling_exclude_namespaces = ('admin',)
+
+    def seed_dataset(self, size):
+        """Grow the dataset so each kind of object has ``size`` rows."""
+        raise NotImplementedError
+
+    def route_kwargs(self, name, arguments):
+        """URL arguments for route ``name``, or None to skip it."""
+        return {} if not arguments else None
+
+    def reset_caches(self):
+        from .catalog import invalidate_local
+        cache.clear()
+        invalidate_local()
+
+    def measure_routes(self):
+        self.route_errors = {}
+        counts = {}
+        for name, arguments in iter_routes():
+            if name in self.query_scaling_exclude or 'format' in arguments:
+                continue
+            if name.split(':')[0] in self.query_scaling_exclude_namespaces:
+                continue
+            kwargs = self.route_kwargs(name, arguments)
+            if kwargs is None:
+                continue
+            try:
+                path = reverse(name, kwargs=kwargs)
+                if resolve(path).view_name != name:
+                    continue
+            except (NoReverseMatch, Resolver404):
+                continue
+            self.reset_caches()
+            try:
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(path)
+            except TemplateDoesNotExist as exc:
+                # A page without its template is broken, not slow; record
+                # it and move on.
+                self.route_errors[name] = exc
+                continue
+            if response.status_code == 200:
+                counts[name] = len(queries)
+        return counts
+
+    def assert_query_counts_constant(self):
+        small, large = self.query_scaling_sizes
+        self.seed_dataset(small)
+        before = self.measure_routes()
+        self.seed_dataset(large)
+        after = self.measure_routes()
+        self.assertTrue(before, 'No routes were measured')
+        growing = {
+            name: (before[name], after[name])
+            for name in before.keys() & after.keys()
+            if after[name] > before[name]
+        }
+        self.assertFalse(growing, f'Query counts grew with the dataset: {growing}')
+        return after
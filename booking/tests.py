@@ -1,3 +1,1387 @@
-from django.test import TestCase
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import logging
+import marshal
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from collections import Counter
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.db.models import Exists, F, OuterRef
+from django.http import Http404
+from django.templatetags.static import static
+from django.test import Client, LiveServerTestCase, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from PIL import Image
+from prometheus_client import REGISTRY
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from Assignment1.db import configure_pooling, pool_stats
+from Assignment1.log import DebugSampler, JsonFormatter, QueueStreamHandler
+
+from . import slow_queries
+from .api.views import RoomViewSet
+from .benchmarks import BENCHMARKS, compare, run_benchmarks
+from .catalog import _bump, get_room_catalog, invalidate_local
+from .dataset import DatasetGenerator, copy_buffer
+from .forms import ProfileForm, ReservationForm
+from .loadtest import LoadTest, find_overlaps
+from .management.commands import benchmark
+from .memory import memory_stats, reset_memory_stats
+from .metrics import metrics_view
+from .middleware import TimezoneMiddleware
+from .models import Notification, Profile, Room, RoomCurrentState, Reservation
+from .page_cache import current_generation
+from .perf import perf_stats, reset_perf_stats
+from .principal import get_principal
+from .profiling import clear_profiles, collapsed_stacks, list_profiles
+from .query_budget import QueryBudgetExceeded, get_budget
+from .recommender import day_occupancy, recommend_rooms
+from .room_state import get_room_states
+from .search import search_reservations, search_rooms
+from .serializers import RoomSerializer
+from .sessions import SessionStore, session_stats
+from .slow_queries import clear_slow_queries, normalize
+from .storage import ContentAddressedStorage, content_hash
+from .testing import QueryScalingMixin
+from .utils import day_window, date_range_window, overlap_q
+from .views import RoomListView, serve_media
+
+
+def index_name(*fields):
+    """Return the generated name of the Reservation index on ``fields``."""
+    for index in Reservation._meta.indexes:
+        if tuple(index.fields) == fields:
+            return index.name
+    raise LookupError(fields)
+
+
+class FreshCachesMixin:
+    """Start each test with an empty cache and no process-local room catalog."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        invalidate_local()
+
+
+class DayWindowTests(TestCase):
+    def test_day_window_is_half_open_in_active_timezone(self):
+        tz = ZoneInfo('Pacific/Auckland')
+        start, end = day_window(date(2025, 10, 9), tz)
+        self.assertEqual(start, datetime(2025, 10, 9, tzinfo=tz))
+        self.assertEqual(end, datetime(2025, 10, 10, tzinfo=tz))
+
+    def test_day_window_spans_dst_change(self):
+        # New Zealand daylight saving starts on 2025-09-28, a 23 hour day.
+        start, end = day_window(date(2025, 9, 28), ZoneInfo('Pacific/Auckland'))
+        utc = dt_timezone.utc
+        self.assertEqual(end.astimezone(utc) - start.astimezone(utc), timedelta(hours=23))
+
+    def test_date_range_window_allows_open_bounds(self):
+        start, end = date_range_window(None, date(2025, 10, 9))
+        self.assertIsNone(start)
+        self.assertEqual(end, day_window(date(2025, 10, 10))[0])
+
+
+class DateRangeFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='x')
+        cls.room = Room.objects.create(name='Focus Room', floor=2, room_number='S-205', capacity=6)
+        tz = timezone.get_current_timezone()
+        # Starts the evening before and runs past midnight.
+        cls.overnight = Reservation.objects.create(
+            user=cls.user, room=cls.room, title='Overnight',
+            start_time=datetime(2030, 1, 9, 22, tzinfo=tz),
+            end_time=datetime(2030, 1, 10, 2, tzinfo=tz),
+            status='APPROVED',
+        )
+
+    def test_overlap_includes_bookings_crossing_midnight(self):
+        reservations = self.room.reservations.filter(overlap_q(*day_window(date(2030, 1, 10))))
+        self.assertEqual(list(reservations), [self.overnight])
+
+    def test_room_availability_uses_room_status_start_index(self):
+        plan = self.room.reservations.filter(
+            overlap_q(*day_window(date(2030, 1, 10))),
+            status__in=['PENDING', 'APPROVED'],
+        ).order_by('start_time').explain()
+        self.assertIn(index_name('room', 'status', 'start_time'), plan)
+
+    def test_user_reservations_use_user_start_index(self):
+        plan = Reservation.objects.filter(user=self.user).order_by('-start_time').explain()
+        self.assertIn(index_name('user', 'start_time'), plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_date_range_uses_start_end_index(self):
+        plan = Reservation.objects.filter(
+            overlap_q(*date_range_window(date(2030, 1, 1), date(2030, 1, 31)))
+        ).explain()
+        self.assertIn(index_name('start_time', 'end_time'), plan)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('bob', password='x', first_name='Bob', last_name='Marley')
+        cls.ballroom = Room.objects.create(
+            name='Grand Ballroom', floor=1, room_number='GB-101', capacity=200,
+            description='Our largest conference space for company-wide meetings.'
+        )
+        cls.focus = Room.objects.create(
+            name='Focus Room', room_type='MEETING', floor=2, room_number='S-205', capacity=6,
+            description='Quiet space for a grand total of six people.'
+        )
+        tz = timezone.get_current_timezone()
+        cls.standup = Reservation.objects.create(
+            user=cls.user, room=cls.focus, title='Daily standup',
+            description='Quick sync for the platform team',
+            start_time=datetime(2030, 1, 10, 9, tzinfo=tz),
+            end_time=datetime(2030, 1, 10, 10, tzinfo=tz),
+        )
+
+    def test_room_name_match_ranks_above_description_match(self):
+        results = list(search_rooms(Room.objects.all(), 'grand'))
+        self.assertEqual(results, [self.ballroom, self.focus])
+
+    def test_prefix_and_room_type_terms_match(self):
+        self.assertEqual(list(search_rooms(Room.objects.all(), 'meet')), [self.focus, self.ballroom])
+        self.assertEqual(list(search_rooms(Room.objects.all(), 'ballr')), [self.ballroom])
+
+    def test_query_syntax_is_not_passed_through(self):
+        self.assertEqual(list(search_rooms(Room.objects.all(), '"ballroom* (')), [self.ballroom])
+        self.assertEqual(list(search_rooms(Room.objects.all(), '!!!')), [])
+
+    def test_reservations_match_username_and_room(self):
+        self.assertEqual(list(search_reservations(Reservation.objects.all(), 'bob focus')), [self.standup])
+        self.assertEqual(list(search_reservations(Reservation.objects.all(), 'ballroom')), [])
+
+    def test_index_follows_save_and_delete(self):
+        self.focus.name = 'Quiet Corner'
+        self.focus.save()
+        self.assertEqual(list(search_rooms(Room.objects.all(), 'corner')), [self.focus])
+        self.focus.delete()
+        self.assertEqual(list(search_rooms(Room.objects.all(), 'corner')), [])
+
+
+class AmenityBitmaskTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.basic = Room.objects.create(name='Huddle Space', floor=2, room_number='N-202', capacity=4)
+        cls.equipped = Room.objects.create(
+            name='Sky Lounge', floor=15, room_number='M-1501', capacity=25,
+            has_projector=True, has_tv=True, has_podium=True
+        )
+
+    def test_bitmask_is_maintained_on_save(self):
+        self.assertEqual(self.basic.amenities, Room.amenity_mask(['whiteboard', 'wifi']))
+        self.basic.has_tv = True
+        self.basic.save(update_fields=['has_tv'])
+        self.basic.refresh_from_db()
+        self.assertEqual(self.basic.amenities, Room.amenity_mask(['whiteboard', 'wifi', 'tv']))
+
+    def test_with_amenities_requires_every_amenity(self):
+        self.assertEqual(list(Room.objects.with_amenities(['wifi'])), [self.basic, self.equipped])
+        self.assertEqual(list(Room.objects.with_amenities(['has_tv', 'podium'])), [self.equipped])
+        self.assertEqual(list(Room.objects.with_amenities(['tv', 'video_conference'])), [])
+
+    def test_unknown_amenity_is_rejected(self):
+        with self.assertRaises(ValueError):
+            Room.amenity_mask(['jacuzzi'])
+
+    def test_api_accepts_every_amenity(self):
+        self.client.force_login(User.objects.create_user('carol', password='x'))
+        response = self.client.get('/api/rooms/', {'has_podium': 'true'})
+        self.assertEqual([room['id'] for room in response.json()['results']], [self.equipped.id])
+        response = self.client.get('/api/rooms/', {'amenities': 'wifi,tv'})
+        self.assertEqual([room['id'] for room in response.json()['results']], [self.equipped.id])
+        response = self.client.get('/api/rooms/', {'amenities': 'jacuzzi'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RoomCatalogTests(FreshCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.huddle = Room.objects.create(
+            name='Huddle Space', room_type='MEETING', building='NORTH',
+            floor=2, room_number='N-202', capacity=4, has_tv=True
+        )
+        cls.lab = Room.objects.create(
+            name='Tech Lab', room_type='TRAINING', building='WEST',
+            floor=2, room_number='W-201', capacity=15, has_projector=True
+        )
+        cls.closed = Room.objects.create(
+            name='Closed Room', floor=1, room_number='C-1', capacity=8, is_active=False
+        )
+
+    def test_steady_state_reads_cost_no_queries(self):
+        get_room_catalog()
+        with self.assertNumQueries(0):
+            catalog = get_room_catalog()
+            self.assertEqual([room.pk for room in catalog.rooms], [self.huddle.pk, self.lab.pk])
+            self.assertEqual(catalog.get(self.closed.pk), None)
+
+    def test_indexes_and_filters(self):
+        catalog = get_room_catalog()
+        self.assertEqual([room.pk for room in catalog.by_type['TRAINING']], [self.lab.pk])
+        self.assertEqual([room.pk for room in catalog.with_capacity(5)], [self.lab.pk])
+        self.assertEqual([room.pk for room in catalog.filter(building='NORTH')], [self.huddle.pk])
+        self.assertEqual(
+            [room.pk for room in catalog.filter(amenities=Room.amenity_mask(['projector']))],
+            [self.lab.pk]
+        )
+        self.assertTrue(catalog.get(self.huddle.pk).has_tv)
+
+    def test_records_are_immutable_and_materialize_rooms(self):
+        record = get_room_catalog().get(self.lab.pk)
+        with self.assertRaises(AttributeError):
+            record.capacity = 100
+        with self.assertNumQueries(0):
+            room = record.to_model()
+        self.assertEqual((room.pk, room.name, room.capacity), (self.lab.pk, 'Tech Lab', 15))
+        self.assertEqual(room._state.db, 'default')
+        self.assertFalse(room._state.adding)
+
+    def test_room_save_invalidates_snapshot(self):
+        get_room_catalog()
+        self.lab.capacity = 40
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lab.save()
+        self.assertEqual(get_room_catalog().get(self.lab.pk).capacity, 40)
+
+    def test_version_change_from_another_worker_triggers_rebuild(self):
+        with override_settings(ROOM_CATALOG_CHECK_INTERVAL=0):
+            version = get_room_catalog().version
+            Room.objects.filter(pk=self.lab.pk).update(capacity=30)  # No signals
+            self.assertEqual(get_room_catalog().get(self.lab.pk).capacity, 15)
+            _bump()
+            catalog = get_room_catalog()
+        self.assertNotEqual(catalog.version, version)
+        self.assertEqual(catalog.get(self.lab.pk).capacity, 30)
+
+    def test_snapshot_expires_after_max_age(self):
+        with override_settings(ROOM_CATALOG_CHECK_INTERVAL=0, ROOM_CATALOG_MAX_AGE=0):
+            get_room_catalog()
+            Room.objects.filter(pk=self.lab.pk).update(capacity=30)  # No signals, no bump
+            self.assertEqual(get_room_catalog().get(self.lab.pk).capacity, 30)
+
+    def test_reservation_form_room_choices_use_catalog(self):
+        get_room_catalog()
+        form = ReservationForm()
+        with self.assertNumQueries(0):
+            choices = [value for value, label in form.fields['room'].choices if value]
+        self.assertEqual([str(value) for value in choices], [str(self.huddle.pk), str(self.lab.pk)])
+        self.assertEqual(form.fields['room'].clean(str(self.lab.pk)), self.lab)
+        with self.assertRaises(Exception):
+            form.fields['room'].clean(str(self.closed.pk))
+
+
+class RoomRecommenderTests(FreshCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('dave', password='x')
+        cls.huddle = Room.objects.create(name='Huddle Space', floor=2, room_number='N-202', capacity=4)
+        cls.focus = Room.objects.create(name='Focus Room', floor=2, room_number='S-205', capacity=6)
+        cls.war_room = Room.objects.create(
+            name='War Room', floor=1, room_number='W-101', capacity=6, has_projector=True
+        )
+        cls.auditorium = Room.objects.create(
+            name='Main Auditorium', floor=1, room_number='AUD-1', capacity=300, has_projector=True
+        )
+        tz = timezone.get_current_timezone()
+        cls.start = datetime(2030, 3, 4, 10, tzinfo=tz)
+        cls.end = datetime(2030, 3, 4, 11, tzinfo=tz)
+        # The War Room already has a morning booking, so it packs first.
+        Reservation.objects.create(
+            user=cls.user, room=cls.war_room, title='Early sync', status='APPROVED',
+            start_time=datetime(2030, 3, 4, 8, tzinfo=tz), end_time=datetime(2030, 3, 4, 9, tzinfo=tz),
+        )
+
+    def test_smallest_free_rooms_first(self):
+        rooms = recommend_rooms(self.start, self.end, 5)
+        self.assertEqual([room.pk for room in rooms], [self.war_room.pk, self.focus.pk, self.auditorium.pk])
+
+    def test_busy_rooms_and_missing_amenities_are_skipped(self):
+        Reservation.objects.create(
+            user=self.user, room=self.war_room, title='Overlap',
+            start_time=self.start, end_time=self.end,
+        )
+        rooms = recommend_rooms(self.start, self.end, 5, amenities=Room.amenity_mask(['projector']))
+        self.assertEqual([room.pk for room in rooms], [self.auditorium.pk])
+
+    def test_occupancy_is_one_query(self):
+        get_room_catalog()
+        with self.assertNumQueries(1):
+            recommend_rooms(self.start, self.end, 2, limit=1)
+
+    def test_occupancy_is_read_for_candidates_only(self):
+        self.assertEqual(list(day_occupancy(self.start, self.end, [self.war_room.pk])), [self.war_room.pk])
+        self.assertEqual(dict(day_occupancy(self.start, self.end, [self.focus.pk, self.huddle.pk])), {})
+
+    def test_recommend_endpoint(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/api/rooms/recommend/', {
+            'start_time': self.start.isoformat(), 'end_time': self.end.isoformat(),
+            'attendees': 4, 'limit': 2,
+        })
+        self.assertEqual(response.status_code, 200)
+        rooms = response.json()['rooms']
+        self.assertEqual([room['id'] for room in rooms], [self.huddle.pk, self.war_room.pk])
+        self.assertEqual(rooms[0]['spare_seats'], 0)
+        response = self.client.get('/api/rooms/recommend/', {
+            'start_time': self.end.isoformat(), 'end_time': self.start.isoformat(), 'attendees': 4,
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class ConnectionPoolingTests(TestCase):
+    database = {'ENGINE': 'django.db.backends.postgresql', 'OPTIONS': {'sslmode': 'require'}}
+
+    def test_persistent_mode_enables_health_checks(self):
+        database = configure_pooling(self.database, conn_max_age=300, connect_timeout=3)
+        self.assertEqual(database['CONN_MAX_AGE'], 300)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertEqual(database['OPTIONS'], {'sslmode': 'require', 'connect_timeout': 3})
+        self.assertNotIn('connect_timeout', self.database['OPTIONS'])
+
+    def test_pgbouncer_mode_disables_server_side_cursors(self):
+        database = configure_pooling(self.database, mode='pgbouncer')
+        self.assertTrue(database['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            configure_pooling(self.database, mode='pooled')
+
+    def test_new_connections_are_counted(self):
+        opened = pool_stats()['databases']['default']['connections_opened']
+        extra = connections.create_connection('default')
+        self.addCleanup(extra.close)
+        extra.ensure_connection()
+        self.assertEqual(pool_stats()['databases']['default']['connections_opened'], opened + 1)
+
+    def test_stats_endpoint_is_admin_only(self):
+        user = User.objects.create_user('erin', password='x')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get('/api/admin/db-pool/').status_code, 403)
+        user.is_staff = True
+        user.save()
+        response = self.client.get('/api/admin/db-pool/')
+        self.assertEqual(response.status_code, 200)
+        default = response.json()['databases']['default']
+        self.assertTrue(default['connected'])
+        self.assertIsNone(default['pool'])
+
+
+class StaticPipelineTests(TestCase):
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        settings_override = override_settings(STATIC_ROOT=self.static_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def collect(self):
+        out = io.StringIO()
+        call_command('custom_collectstatic', stdout=out)
+        return out.getvalue()
+
+    def test_hashed_names_manifest_and_incremental_runs(self):
+        self.assertIn('0 unchanged', self.collect())
+        with open(os.path.join(self.static_root, 'staticfiles.json')) as f:
+            paths = json.load(f)['paths']
+        hashed = paths['rest_framework/css/font-awesome-4.0.3.css']
+        self.assertRegex(hashed, r'\.[0-9a-f]{12}\.css$')
+        self.assertTrue(os.path.exists(os.path.join(self.static_root, hashed + '.gz')))
+        with open(os.path.join(self.static_root, hashed)) as f:
+            self.assertIn(paths['rest_framework/fonts/fontawesome-webfont.woff'].split('/')[-1], f.read())
+        self.assertIn('0 copied', self.collect())
+
+    def test_hashed_files_are_served_compressed_and_immutable(self):
+        self.collect()
+        url = static('rest_framework/css/bootstrap-tweaks.css')
+        self.assertRegex(url, r'\.[0-9a-f]{12}\.css$')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        response.close()
+
+
+class RoomThumbnailTests(FreshCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, ROOM_THUMBNAIL_WORKERS=0, ROOM_IMAGE_WIDTHS=(320, 640)
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def make_room(self, name, width=1000):
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, width * 3 // 4), 'steelblue').save(buffer, 'JPEG')
+        with self.captureOnCommitCallbacks(execute=True):
+            room = Room.objects.create(
+                name=name, floor=1, room_number=name[:3], capacity=8,
+                image=SimpleUploadedFile(f'{name}.jpg', buffer.getvalue(), content_type='image/jpeg'),
+            )
+        room.refresh_from_db()
+        return room, buffer.getvalue()
+
+    def test_variants_are_generated_on_upload_and_shared_by_content(self):
+        room, data = self.make_room('Atrium')
+        variants = room.thumbnails['variants']
+        self.assertEqual([width for width, name in variants['webp']], [320, 640])
+        self.assertTrue(all(default_storage.exists(name) for width, name in variants['jpeg']))
+        # The same photo uploaded for another room reuses the same files
+        other, _ = self.make_room('Boardroom')
+        self.assertEqual(other.thumbnails['variants'], variants)
+
+    def test_small_images_keep_their_own_width(self):
+        room, _ = self.make_room('Nook', width=200)
+        self.assertEqual([width for width, name in room.thumbnails['variants']['jpeg']], [200])
+
+    def test_srcset_in_templates_and_api(self):
+        room, _ = self.make_room('Atrium')
+        response = self.client.get('/rooms/')
+        self.assertContains(response, '<source type="image/webp" srcset=')
+        self.assertContains(response, '320w')
+        user = User.objects.create_user('fay', password='x')
+        self.client.force_login(user)
+        data = self.client.get(f'/api/rooms/{room.pk}/').json()
+        self.assertIn('640w', data['image_srcset']['webp'])
+
+
+class ContentAddressedMediaTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def store(self, content, filename='photo.JPG'):
+        return ContentAddressedStorage().save(f'room_images/{filename}', SimpleUploadedFile(filename, content))
+
+    def test_identical_uploads_are_stored_once(self):
+        name = self.store(b'first image')
+        digest = hashlib.sha256(b'first image').hexdigest()
+        self.assertEqual(name, f'room_images/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(content_hash(name), digest)
+        self.assertEqual(self.store(b'first image', 'copy.jpg'), name)
+        self.assertNotEqual(self.store(b'second image'), name)
+
+        upload = TemporaryUploadedFile('big.jpg', 'image/jpeg', 11, None)
+        upload.write(b'first image')
+        upload.flush()
+        self.assertEqual(ContentAddressedStorage().save('room_images/big.jpg', upload), name)
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, 'room_images', digest[:2]))), 1)
+
+    def test_etag_revalidation_and_immutable_caching(self):
+        name = self.store(b'0123456789')
+        response = self.client.get(f'/media/{name}')
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertIn('immutable', response['Cache-Control'])
+        response = self.client.get(f'/media/{name}', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        with self.assertRaises(Http404):
+            serve_media(RequestFactory().get('/'), '../settings.py')
+
+    def test_thumbnail_variants_are_immutable(self):
+        thumb = default_storage.save('room_thumbs/ab/0123456789abcdef/320w.webp', ContentFile(b'webp'))
+        other = default_storage.save('room_images/plain.jpg', ContentFile(b'jpeg'))
+        self.assertIn('immutable', self.client.get(f'/media/{thumb}')['Cache-Control'])
+        self.assertEqual(self.client.get(f'/media/{other}')['Cache-Control'], 'public, max-age=3600')
+
+    def test_byte_ranges(self):
+        name = self.store(b'0123456789')
+        response = self.client.get(f'/media/{name}', HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        response = self.client.get(f'/media/{name}', HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        response = self.client.get(f'/media/{name}', HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        # A stale If-Range gets the whole file
+        response = self.client.get(f'/media/{name}', HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_sendfile_offload(self):
+        name = self.store(b'0123456789')
+        with override_settings(MEDIA_SENDFILE='x-accel-redirect'):
+            response = self.client.get(f'/media/{name}')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{name}')
+        self.assertEqual(response.content, b'')
+
+
+class SessionEngineTests(FreshCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('gus', password='x', is_staff=True)
+        self.client.force_login(self.user)
+
+    def session_updates(self, path, count=5):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(count):
+                self.client.get(path)
+        return [q for q in queries if q['sql'].startswith('UPDATE "django_session"')]
+
+    def test_unchanged_sessions_are_not_rewritten(self):
+        before = session_stats()
+        self.assertEqual(self.session_updates('/api/me/'), [])
+        after = session_stats()
+        self.assertEqual(after['writes_avoided'] - before['writes_avoided'], 5)
+        self.assertEqual(after['writes'], before['writes'])
+        response = self.client.get('/api/admin/sessions/')
+        self.assertGreaterEqual(response.json()['writes_avoided'], 5)
+
+    def test_expiry_is_refreshed_once_the_interval_passes(self):
+        later = timezone.now() + timedelta(days=2)
+        with mock.patch('booking.sessions.timezone.now', return_value=later):
+            self.assertEqual(len(self.session_updates('/api/me/', count=3)), 1)
+
+    def test_modified_sessions_are_saved(self):
+        session = self.client.session
+        session['theme'] = 'dark'
+        session.save()
+        key = session.session_key
+        self.assertEqual(Session.objects.get(pk=key).get_decoded()['theme'], 'dark')
+        self.assertEqual(self.client.session['theme'], 'dark')
+
+    def test_process_local_cache_is_not_trusted_after_logout_elsewhere(self):
+        key = self.client.session.session_key
+        self.assertEqual(self.client.get('/api/me/').status_code, 200)
+        # Another worker flushes the session; this worker's cache knows nothing of it
+        Session.objects.filter(pk=key).delete()
+        self.assertIn(self.client.get('/api/me/').status_code, (401, 403))
+
+    def test_shared_cache_serves_session_reads(self):
+        key = self.client.session.session_key
+        with mock.patch.object(SessionStore, 'shared_cache', True):
+            SessionStore(key).load()
+            before = session_stats()['cache_hits']
+            self.assertTrue(SessionStore(key).load())
+        self.assertEqual(session_stats()['cache_hits'], before + 1)
+
+
+class PrincipalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('hal', password='x')
+        Profile.objects.create(user=cls.admin, is_admin=True, timezone='Europe/London')
+        for name in ('ivy', 'jon', 'kim'):
+            Profile.objects.create(user=User.objects.create_user(name, password='x'))
+        cls.plain = User.objects.create_user('lee', password='x')
+
+    def profile_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return [q for q in queries if 'FROM "booking_profile"' in q['sql']]
+
+    def test_profile_loads_with_the_user(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.profile_queries('/api/reservations/'), [])
+        # Serializing every user doesn't query profiles one by one
+        self.assertEqual(self.profile_queries('/api/users/'), [])
+        self.assertEqual(len(self.client.get('/api/users/').json()['results']), 5)
+
+    def test_users_without_a_profile(self):
+        self.client.force_login(self.plain)
+        response = self.client.get('/api/users/')
+        self.assertEqual([user['username'] for user in response.json()['results']], ['lee'])
+
+    def test_profile_timezone_is_activated(self):
+        request = RequestFactory().get('/')
+        request.user = User.objects.select_related('profile').get(pk=self.admin.pk)
+        TimezoneMiddleware(lambda request: None).process_request(request)
+        self.assertEqual(str(timezone.get_current_timezone()), 'Europe/London')
+        self.assertIs(get_principal(request), get_principal(request))
+        self.assertTrue(get_principal(request).is_admin)
+        timezone.deactivate()
+
+    def test_unknown_timezone_is_rejected(self):
+        form = ProfileForm(data={'timezone': 'Mars/Olympus_Mons'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('timezone', form.errors)
+
+
+class FragmentCacheTests(FreshCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = Room.objects.create(name='Orchid Room', floor=1, room_number='O-1', capacity=6)
+        cls.other = Room.objects.create(name='Pine Room', floor=1, room_number='P-1', capacity=6)
+
+    def test_room_grid_is_served_from_cache_until_a_room_changes(self):
+        self.assertContains(self.client.get('/rooms/'), 'Orchid Room')
+        self.client.get(f'/rooms/{self.room.pk}/')
+        # Bypassing save() leaves the cached fragments in place
+        Room.objects.filter(pk=self.room.pk).update(name='Lotus Room')
+        self.assertContains(self.client.get('/rooms/'), 'Orchid Room')
+        self.assertContains(self.client.get(f'/rooms/{self.room.pk}/'), 'Orchid Room')
+
+        self.room.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.save()
+        self.assertContains(self.client.get('/rooms/'), 'Lotus Room')
+        self.assertContains(self.client.get(f'/rooms/{self.room.pk}/'), 'Lotus Room')
+
+    def test_unchanged_cards_are_reused_when_the_grid_is_rebuilt(self):
+        self.client.get('/rooms/')
+        Room.objects.filter(pk=self.other.pk).update(description='Stale description')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.save()
+        self.assertNotContains(self.client.get('/rooms/'), 'Stale description')
+
+
+class AnonymousPageCacheTests(FreshCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = Room.objects.create(name='Maple Room', floor=2, room_number='M-1', capacity=8)
+        cls.user = User.objects.create_user('visitor', password='pass12345')
+
+    def test_anonymous_pages_are_cached_with_public_headers(self):
+        first = self.client.get('/rooms/')
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        second = self.client.get('/rooms/')
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(second.content, first.content)
+        self.assertIn('public', second['Cache-Control'])
+        self.assertIn('max-age=300', second['Cache-Control'])
+        self.assertIn('Cookie', second['Vary'])
+        self.assertFalse(second.cookies)
+
+    def test_query_string_is_normalized(self):
+        self.client.get('/rooms/?capacity=4&q=')
+        response = self.client.get('/rooms/?capacity=4')
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        response = self.client.get('/rooms/?capacity=6')
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+
+    def test_reservation_changes_expire_cached_pages(self):
+        self.client.get('/')
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'hit')
+        start = timezone.now() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(
+                room=self.room, user=self.user, title='Standup',
+                start_time=start, end_time=start + timedelta(hours=1)
+            )
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'miss')
+
+    def test_authenticated_pages_are_not_cached(self):
+        self.client.login(username='visitor', password='pass12345')
+        response = self.client.get('/rooms/')
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('X-Page-Cache', self.client.get('/rooms/'))
+
+
+class RoomCurrentStateTests(FreshCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = Room.objects.create(name='Cedar Room', floor=3, room_number='C-1', capacity=4)
+        cls.user = User.objects.create_user('booker', password='pass12345')
+
+    def book(self, start, end, status='APPROVED'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Reservation.objects.create(
+                room=self.room, user=self.user, title='Review',
+                start_time=start, end_time=end, status=status
+            )
+
+    def test_reservation_changes_refresh_the_room_state(self):
+        now = timezone.now()
+        current = self.book(now - timedelta(minutes=30), now + timedelta(minutes=30))
+        upcoming = self.book(now + timedelta(hours=1), now + timedelta(hours=2))
+        state = RoomCurrentState.objects.get(room=self.room)
+        self.assertEqual(state.current_reservation_id, current.pk)
+        self.assertEqual(state.next_reservation_id, upcoming.pk)
+        self.assertEqual(state.valid_until, current.end_time)
+        self.assertFalse(state.is_free(now, now + timedelta(hours=2)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            current.delete()
+        state.refresh_from_db()
+        self.assertIsNone(state.current_reservation_id)
+        self.assertTrue(state.is_free(now, now + timedelta(minutes=30)))
+
+    def test_stale_states_are_refreshed_on_read(self):
+        now = timezone.now()
+        reservation = self.book(now + timedelta(minutes=10), now + timedelta(minutes=40))
+        later = now + timedelta(minutes=20)
+        get_room_catalog()
+        with self.assertNumQueries(1):
+            state = get_room_states(now)[self.room.pk]
+        self.assertEqual(state.next_reservation_id, reservation.pk)
+        state = get_room_states(later)[self.room.pk]
+        self.assertEqual(state.current_reservation_id, reservation.pk)
+        self.assertIsNone(state.next_reservation_id)
+
+    def test_reserved_soon_sees_approved_booking_behind_pending_one(self):
+        now = timezone.now()
+        self.book(now + timedelta(minutes=2), now + timedelta(minutes=5), status='PENDING')
+        approved = self.book(now + timedelta(minutes=10), now + timedelta(minutes=40))
+        status = RoomSerializer(self.room).data['status']
+        self.assertEqual(status['status'], 'reserved_soon')
+        self.assertEqual(status['reservation_id'], approved.pk)
+
+    def test_admin_bulk_actions_refresh_the_snapshot(self):
+        now = timezone.now()
+        reservation = self.book(now + timedelta(minutes=5), now + timedelta(minutes=35))
+        self.assertEqual(RoomSerializer(self.room).data['status']['status'], 'reserved_soon')
+        generation = current_generation()
+
+        model_admin = admin.site._registry[Reservation]
+        with mock.patch.object(model_admin, 'message_user'), \
+                self.captureOnCommitCallbacks(execute=True):
+            model_admin.cancel_reservations(None, Reservation.objects.filter(pk=reservation.pk))
+        self.assertEqual(RoomSerializer(self.room).data['status']['status'], 'available')
+        self.assertNotEqual(current_generation(), generation)
+
+    def test_status_and_home_read_the_snapshot(self):
+        now = timezone.now()
+        self.assertIn(self.room.pk, [
+            room.pk for room in self.client.get('/').context['available_rooms']
+        ])
+        self.book(now + timedelta(minutes=5), now + timedelta(minutes=35))
+        self.assertEqual(RoomSerializer(self.room).data['status']['status'], 'reserved_soon')
+        self.assertNotIn(self.room.pk, [
+            room.pk for room in self.client.get('/').context['available_rooms']
+        ])
+
+
+class StructuredLoggingTests(TestCase):
+    def test_queue_handler_writes_json_lines_off_thread(self):
+        stream = io.StringIO()
+        handler = QueueStreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        self.addCleanup(handler.close)
+        logger = logging.getLogger('tests.structured')
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        logger.warning('Slot %s checked', '09:00', extra={'room_id': 7})
+        handler.flush()
+        entry = json.loads(stream.getvalue())
+        self.assertEqual(entry['message'], 'Slot 09:00 checked')
+        self.assertEqual(entry['level'], 'WARNING')
+        self.assertEqual(entry['room_id'], 7)
+
+    def test_queue_handler_starts_a_writer_per_process(self):
+        stream = io.StringIO()
+        handler = QueueStreamHandler(stream)
+        self.addCleanup(handler.close)
+        # No writer thread until something is logged
+        self.assertIsNone(handler.listener)
+        record = logging.LogRecord('tests.fork', logging.WARNING, __file__, 1, 'first', (), None)
+        handler.handle(record)
+        handler.flush()
+        parent_listener = handler.listener
+
+        # What a forked child inherits: the handler, without its writer thread
+        parent_listener.stop()
+        handler._pid = -1
+        record = logging.LogRecord('tests.fork', logging.WARNING, __file__, 1, 'second', (), None)
+        handler.handle(record)
+        handler.flush()
+        self.assertIsNot(handler.listener, parent_listener)
+        self.assertEqual(stream.getvalue().splitlines(), ['first', 'second'])
+
+    def test_queue_handler_leaves_the_record_for_other_handlers(self):
+        handler = QueueStreamHandler(io.StringIO())
+        self.addCleanup(handler.close)
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = logging.LogRecord(
+                'tests.copy', logging.ERROR, __file__, 1, 'Slot %s', ('09:00',), sys.exc_info()
+            )
+        handler.handle(record)
+        handler.flush()
+        self.assertEqual((record.msg, record.args), ('Slot %s', ('09:00',)))
+        self.assertIsNotNone(record.exc_info)
+
+    def test_debug_sampler_uses_the_nearest_configured_logger(self):
+        sampler = DebugSampler({'booking.api': 0, 'booking.api.views': 1})
+        def record(name, level=logging.DEBUG):
+            return logging.LogRecord(name, level, __file__, 1, 'msg', (), None)
+        self.assertFalse(sampler.filter(record('booking.api.serializers')))
+        self.assertTrue(sampler.filter(record('booking.api.views')))
+        self.assertTrue(sampler.filter(record('booking.api', logging.INFO)))
+        self.assertTrue(sampler.filter(record('booking.views')))
+
+    def test_availability_does_not_write_to_stdout(self):
+        room = Room.objects.create(name='Birch Room', floor=1, room_number='B-1', capacity=4)
+        user = User.objects.create_user('slots', password='pass12345')
+        # booking.urls shadows this action's URL, so call the viewset directly
+        request = APIRequestFactory().get('/', {'date': '2030-01-07'})
+        force_authenticate(request, user=user)
+        view = RoomViewSet.as_view({'get': 'availability'})
+        out = io.StringIO()
+        with redirect_stdout(out):
+            response = view(request, pk=room.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['time_slots']), 48)
+        self.assertEqual(out.getvalue(), '')
+
+
+class PerformanceMiddlewareTests(FreshCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Room.objects.create(name='Elm Room', floor=1, room_number='E-1', capacity=4)
+        cls.staff = User.objects.create_user('perfstaff', password='pass12345', is_staff=True)
+
+    def setUp(self):
+        super().setUp()
+        reset_perf_stats()
+        overrides = override_settings(PERF_INSTRUMENTATION=True, PERF_SERVER_TIMING='all')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_server_timing_header_reports_the_request(self):
+        response = self.client.get('/rooms/')
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn('cache;desc=', timing)
+        self.assertRegex(timing, r'tpl;dur=[\d.]+')
+        self.assertRegex(timing, r'total;dur=[\d.]+')
+
+    def test_requests_are_aggregated_by_url_name(self):
+        self.client.get('/rooms/')
+        self.client.get('/rooms/')
+        routes = {route['route']: route for route in perf_stats()}
+        room_list = routes['booking:room-list']
+        self.assertEqual(room_list['requests'], 2)
+        self.assertGreater(room_list['template_time'], 0)
+        # The second request is served from the anonymous page cache
+        self.assertGreaterEqual(room_list['cache_hits'], 1)
+
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/admin/perf/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('booking:room-list', [route['route'] for route in response.json()])
+
+    def test_header_is_limited_to_staff_and_middleware_can_be_disabled(self):
+        with override_settings(PERF_SERVER_TIMING='staff'):
+            self.assertNotIn('Server-Timing', self.client_class().get('/rooms/'))
+            client = self.client_class()
+            client.force_login(self.staff)
+            self.assertIn('Server-Timing', client.get('/rooms/'))
+        with override_settings(PERF_INSTRUMENTATION=False):
+            self.assertNotIn('Server-Timing', self.client_class().get('/rooms/'))
+
+
+class PrometheusMetricsTests(FreshCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = Room.objects.create(name='Ash Room', floor=1, room_number='A-9', capacity=4)
+        cls.user = User.objects.create_user('metrics', password='pass12345')
+
+    def setUp(self):
+        super().setUp()
+        # Request metrics must not depend on the diagnostic instrumentation
+        overrides = override_settings(PERF_INSTRUMENTATION=False)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_and_caches_are_exported(self):
+        before = self.sample('booking_requests_total', view='booking:room-list', method='GET', status='2xx')
+        self.client.get('/rooms/')
+        self.client.get('/rooms/')
+        self.assertEqual(
+            self.sample('booking_requests_total', view='booking:room-list', method='GET', status='2xx'),
+            before + 2
+        )
+        self.assertGreater(self.sample('booking_cache_requests_total', cache='pages', result='hit'), 0)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('text/plain', response['Content-Type'])
+        body = response.content.decode()
+        self.assertIn('booking_request_duration_seconds_bucket{', body)
+        self.assertIn('view="booking:room-list"', body)
+
+    def test_requests_are_counted_once_with_instrumentation_on(self):
+        labels = {'view': 'booking:room-list', 'method': 'GET', 'status': '2xx'}
+        before = self.sample('booking_requests_total', **labels)
+        queries = self.sample('booking_request_db_queries_count', view='booking:room-list')
+        with override_settings(PERF_INSTRUMENTATION=True):
+            self.client.get('/rooms/')
+        self.assertEqual(self.sample('booking_requests_total', **labels), before + 1)
+        self.assertEqual(
+            self.sample('booking_request_db_queries_count', view='booking:room-list'), queries + 1
+        )
+
+    def test_reservation_lifecycle_and_notifications_are_counted(self):
+        created = self.sample('booking_reservation_events_total', event='created')
+        approved = self.sample('booking_reservation_events_total', event='approved')
+        conflicts = self.sample('booking_reservation_events_total', event='conflict')
+        notifications = self.sample('booking_notifications_total', type='ADMIN_APPROVAL')
+        start = timezone.now() + timedelta(days=2)
+        reservation = Reservation.objects.create(
+            room=self.room, user=self.user, title='Planning',
+            start_time=start, end_time=start + timedelta(hours=1)
+        )
+        reservation.status = 'APPROVED'
+        reservation.save()
+        # Probing availability isn't a conflict; rejecting a booking is
+        self.assertFalse(self.room.is_available(start, start + timedelta(minutes=30)))
+        self.assertEqual(self.sample('booking_reservation_events_total', event='conflict'), conflicts)
+        self.client.force_login(self.user)
+        response = self.client.post('/api/reservations/', {
+            'title': 'Clash', 'room_id': self.room.pk,
+            'start_time': start.isoformat(), 'end_time': (start + timedelta(minutes=30)).isoformat(),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(self.sample('booking_reservation_events_total', event='created'), created + 1)
+        self.assertEqual(self.sample('booking_reservation_events_total', event='approved'), approved + 1)
+        self.assertEqual(self.sample('booking_reservation_events_total', event='conflict'), conflicts + 1)
+        self.assertEqual(
+            self.sample('booking_notifications_total', type='ADMIN_APPROVAL'), notifications + 1
+        )
+
+    def test_scrapes_are_limited_to_allowed_addresses(self):
+        request = RequestFactory().get('/metrics', REMOTE_ADDR='203.0.113.9')
+        with self.assertRaises(Http404):
+            metrics_view(request)
+
+
+class QueryScalingTests(QueryScalingMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('scaling', password='pass12345', is_staff=True)
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def seed_dataset(self, size):
+        start = timezone.now() + timedelta(days=1)
+        for i in range(Room.objects.count(), size):
+            room = Room.objects.create(
+                name=f'Scaling Room {i}', floor=1, room_number=f'S-{i}', capacity=4 + i,
+                description=f'Room number {i}'
+            )
+            user = User.objects.create_user(f'member{i}', password='pass12345', first_name=f'M{i}')
+            for owner in (self.staff, user):
+                slot = start + timedelta(hours=2 * i + (owner is user))
+                reservation = Reservation.objects.create(
+                    room=room, user=owner, title=f'Meeting {i}', status='APPROVED',
+                    start_time=slot, end_time=slot + timedelta(minutes=30)
+                )
+                reservation.attendees.add(self.staff, user)
+            Notification.objects.create(
+                user=self.staff, message=f'Note {i}', notification_type='REMINDER'
+            )
+        self.room = Room.objects.order_by('pk').first()
+        self.reservation = Reservation.objects.filter(user=self.staff).order_by('pk').first()
+        self.notification = self.staff.notifications.order_by('pk').first()
+
+    def route_kwargs(self, name, arguments):
+        objects = {
+            'booking:room-detail': {'pk': self.room.pk},
+            'booking:reservation-create-room': {'room_id': self.room.pk},
+            'booking:reservation-detail': {'pk': self.reservation.pk},
+            'booking:reservation-update': {'pk': self.reservation.pk},
+            'booking:room-availability': {'room_id': self.room.pk},
+            'room-detail': {'pk': self.room.pk},
+            'room-availability': {'pk': self.room.pk},
+            'reservation-detail': {'pk': self.reservation.pk},
+            'notification-detail': {'pk': self.notification.pk},
+            'user-detail': {'pk': self.staff.pk},
+        }
+        if not arguments:
+            return {}
+        return objects.get(name)
+
+    def test_query_counts_do_not_grow_with_the_dataset(self):
+        counts = self.assert_query_counts_constant()
+        self.assertIn('booking:room-list', counts)
+        self.assertIn('reservation-list', counts)
+
+
+class QueryBudgetTests(FreshCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = Room.objects.create(name='Yew Room', floor=1, room_number='Y-1', capacity=4)
+
+    def test_budgets_resolve_per_action_and_method(self):
+        factory = RequestFactory()
+        def budget(method, path):
+            request = getattr(factory, method)(path)
+            request.resolver_match = resolve(path)
+            return get_budget(request)
+        self.assertEqual(budget('get', '/rooms/'), 8)
+        self.assertEqual(budget('get', '/api/rooms/'), 9)
+        self.assertEqual(budget('get', f'/api/reservations/{self.room.pk}/'), 10)
+        self.assertEqual(budget('post', '/api/reservations/'), 25)
+        self.assertEqual(budget('post', '/reservations/new/'), 20)
+        self.assertEqual(budget('get', '/'), 12)
+        self.assertIsNone(budget('get', '/api/me/'))
+
+    def test_over_budget_requests_raise_or_log(self):
+        with mock.patch.object(RoomListView, 'query_budget', 0):
+            with override_settings(DEBUG_PROPAGATE_EXCEPTIONS=True):
+                with self.assertRaisesMessage(QueryBudgetExceeded, 'over its budget of 0'):
+                    self.client.get('/rooms/')
+            # The first render was stored in the page cache; start cold again
+            self.setUp()
+            with override_settings(QUERY_BUDGET_MODE='log'):
+                with self.assertLogs('booking.query_budget', 'WARNING'):
+                    self.assertEqual(self.client_class().get('/rooms/').status_code, 200)
+
+
+class SlowQueryLogTests(FreshCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = Room.objects.create(name='Elm Room', floor=1, room_number='E-1', capacity=4)
+        cls.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        cls.user = User.objects.create_user('member', password='pw')
+
+    def setUp(self):
+        super().setUp()
+        clear_slow_queries()
+        self.addCleanup(clear_slow_queries)
+        # Record every query, with budgets enforced: the EXPLAINs mustn't count
+        overrides = override_settings(
+            SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN=True, QUERY_BUDGET_MODE='raise'
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_normalize_groups_statements_by_shape(self):
+        self.assertEqual(
+            normalize("SELECT *  FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            normalize("SELECT * FROM t WHERE id IN (%s, %s) AND name = 'y' LIMIT 5"),
+        )
+
+    def test_queries_are_recorded_with_view_and_plan_once(self):
+        with mock.patch.object(slow_queries, '_explain', wraps=slow_queries._explain) as explain:
+            self.client.get('/rooms/')
+            # Skip the page cache so the same statements run again
+            cache.clear()
+            self.client.get('/rooms/')
+        entries = [e for e in slow_queries.slow_queries() if 'booking_room' in e['sql']]
+        self.assertTrue(entries)
+        self.assertEqual(entries[0]['view'], 'booking:room-list')
+        self.assertEqual(entries[0]['path'], '/rooms/')
+        self.assertTrue(all(e['plan'] for e in entries if e['sql'].startswith('SELECT')))
+        explained = Counter(slow_queries.normalize(call.args[1]) for call in explain.call_args_list)
+        self.assertTrue(explained)
+        self.assertEqual(max(explained.values()), 1)
+
+    def test_writes_are_not_explained(self):
+        Room.objects.filter(pk=self.room.pk).update(capacity=6)
+        update = next(
+            entry for entry in slow_queries.slow_queries() if entry['sql'].startswith('UPDATE')
+        )
+        self.assertIsNone(update['plan'])
+        self.assertIsNone(update['view'])
+        self.assertIn('booking/tests.py', update['origin'])
+
+    def test_locking_selects_are_not_explained(self):
+        sql = 'SELECT "booking_room"."id" FROM "booking_room" WHERE "booking_room"."id" = %s FOR UPDATE'
+        with mock.patch.object(slow_queries, '_explain') as explain:
+            plan = slow_queries._plan_for(slow_queries.normalize(sql), connection, sql, [1], False)
+        self.assertIsNone(plan)
+        explain.assert_not_called()
+
+    def test_page_is_staff_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/staff/slow-queries/').status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get('/staff/slow-queries/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['queries'])
+        response = self.client.post('/staff/slow-queries/')
+        self.assertRedirects(response, '/staff/slow-queries/', fetch_redirect_response=False)
+
+
+class ProfilingTests(FreshCachesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = Room.objects.create(name='Oak Room', floor=1, room_number='O-1', capacity=4)
+        cls.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        cls.user = User.objects.create_user('member', password='pw')
+
+    def setUp(self):
+        super().setUp()
+        clear_profiles()
+        self.addCleanup(clear_profiles)
+
+    def test_staff_can_profile_a_request_and_download_it(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/rooms/?_profile=1')
+        profile_id = response['X-Profile-Id']
+
+        listing = self.client.get('/api/admin/profiles/').json()
+        self.assertEqual(listing[0]['id'], profile_id)
+        self.assertEqual(listing[0]['view'], 'booking:room-list')
+        self.assertEqual(listing[0]['trigger'], 'request')
+
+        pstats = self.client.get(f'/api/admin/profiles/{profile_id}/pstats/')
+        self.assertEqual(pstats.status_code, 200)
+        self.assertTrue(marshal.loads(pstats.content))
+
+        collapsed = self.client.get(f'/api/admin/profiles/{profile_id}/collapsed/')
+        lines = collapsed.content.decode().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(any(
+            line.startswith('profiled (profiling.py:') and 'get (list.py:' in line
+            for line in lines
+        ))
+        for line in lines:
+            stack, micros = line.rsplit(' ', 1)
+            self.assertTrue(stack and int(micros) > 0)
+
+    def test_other_users_cannot_profile(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/rooms/?_profile=1', HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(self.client.get('/api/admin/profiles/').status_code, 403)
+
+    def test_one_in_n_requests_are_sampled(self):
+        with override_settings(PROFILE_SAMPLE_RATE=2, PROFILE_STORE_SIZE=2):
+            for _ in range(6):
+                self.client.get('/rooms/', {'q': 'oak'})
+        profiles = list_profiles()
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual({profile['trigger'] for profile in profiles}, {'sample'})
+
+    def test_collapsed_stacks_split_time_between_callers(self):
+        root, a, b, leaf = (('app.py', n, name) for n, name in enumerate('root a b leaf'.split()))
+        stats = {
+            root: (1, 1, 0.1, 1.0, {}),
+            a: (1, 1, 0.1, 0.4, {root: (1, 1, 0.1, 0.4)}),
+            b: (1, 1, 0.2, 0.5, {root: (1, 1, 0.2, 0.5)}),
+            leaf: (2, 2, 0.6, 0.6, {a: (1, 1, 0.3, 0.3), b: (1, 1, 0.3, 0.3)}),
+        }
+        self.assertEqual(collapsed_stacks(stats).splitlines(), [
+            'root (app.py:0) 100000',
+            'root (app.py:0);a (app.py:1) 100000',
+            'root (app.py:0);a (app.py:1);leaf (app.py:3) 300000',
+            'root (app.py:0);b (app.py:2) 200000',
+            'root (app.py:0);b (app.py:2);leaf (app.py:3) 300000',
+        ])
+
+
+class GenerateDatasetTests(TestCase):
+    def rows(self, seed):
+        generator = DatasetGenerator(rooms=5, users=20, reservations=200, notifications=300, seed=seed)
+        rooms = [(room.name, room.capacity, room.amenities) for room in generator.room_rows()]
+        reservations = [
+            (r.room_id, r.user_id, r.start_time, r.end_time, r.status, r.expected_attendees)
+            for r in generator.reservation_rows()
+        ]
+        attendees = [(row.reservation_id, row.user_id) for row in generator.pending_attendees]
+        return rooms, reservations, attendees, len(generator.pending_notifications)
+
+    def test_same_seed_same_rows(self):
+        self.assertEqual(self.rows(7), self.rows(7))
+        self.assertNotEqual(self.rows(7), self.rows(8))
+        self.assertEqual(self.rows(7)[3], 300)
+
+    def test_command_writes_the_dataset_without_double_bookings(self):
+        options = dict(
+            rooms=4, users=30, reservations=400, notifications=600, seed=1, stdout=io.StringIO()
+        )
+        call_command('generate_dataset', batch_size=150, **options)
+
+        self.assertEqual(Room.objects.count(), 4)
+        self.assertEqual(User.objects.filter(username__startswith='gen1_').count(), 30)
+        self.assertEqual(Reservation.objects.count(), 400)
+        self.assertEqual(Notification.objects.count(), 600)
+        self.assertEqual(RoomCurrentState.objects.count(), 4)
+        attendees = Reservation.attendees.through.objects.all()
+        self.assertGreater(attendees.count(), 0)
+        self.assertFalse(attendees.filter(user=F('reservation__user')).exists())
+        for reservation in Reservation.objects.all()[:50]:
+            start = timezone.localtime(reservation.start_time)
+            end = timezone.localtime(reservation.end_time)
+            self.assertGreaterEqual(start.hour, 8)
+            self.assertLessEqual((end.hour, end.minute), (18, 0))
+            self.assertLessEqual(reservation.expected_attendees, reservation.room.capacity)
+
+        open_statuses = ['PENDING', 'APPROVED']
+        clashes = Reservation.objects.filter(status__in=open_statuses).filter(Exists(
+            Reservation.objects.filter(
+                overlap_q(OuterRef('start_time'), OuterRef('end_time')),
+                room=OuterRef('room'), status__in=open_statuses,
+            ).exclude(pk=OuterRef('pk'))
+        ))
+        self.assertFalse(clashes.exists())
+
+        with self.assertRaisesMessage(CommandError, 'already exists'):
+            call_command('generate_dataset', **options)
+
+    def test_copy_buffer_writes_json_fields_as_json(self):
+        rooms = list(DatasetGenerator(rooms=3, users=0, reservations=0, notifications=0).room_rows())
+        rooms[0].thumbnails = {'320': 'room_thumbs/a.webp'}
+        fields, buffer = copy_buffer(Room, rooms, connection)
+        column = [field.name for field in fields].index('thumbnails')
+        values = [json.loads(row[column]) for row in csv.reader(buffer)]
+        self.assertEqual(values, [{'320': 'room_thumbs/a.webp'}, {}, {}])
+
+
+class BenchmarkTests(FreshCachesMixin, TestCase):
+    def test_suite_runs_against_a_generated_dataset(self):
+        DatasetGenerator(rooms=5, users=20, reservations=150, notifications=300, seed=2).generate()
+        report = run_benchmarks(repeat=3, warmup=1)
+        self.assertEqual(set(report['results']), set(BENCHMARKS))
+        self.assertEqual(report['meta']['rows']['rooms'], 5)
+        for name, result in report['results'].items():
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'], name)
+            self.assertGreater(result['alloc_kib'], 0, name)
+        self.assertEqual(report['results']['conflict_check']['queries'], 1)
+        self.assertGreater(report['results']['reservation_serialize']['alloc_bytes_per_item'], 0)
+
+    def test_postgres_option_switches_the_connection_for_the_command_only(self):
+        seen = []
+        with mock.patch.object(benchmark.Command, 'benchmark', lambda command, options: seen.append(
+            (connection.vendor, connection.settings_dict['NAME'])
+        )):
+            call_command('benchmark', postgres='bench')
+        self.assertEqual(seen, [('postgresql', 'bench')])
+        self.assertEqual(connection.vendor, 'sqlite')
+
+    def test_compare_flags_regressions_beyond_tolerance(self):
+        def report(p50, p95, queries, alloc):
+            return {'results': {'home_page': {
+                'p50_ms': p50, 'p95_ms': p95, 'queries': queries, 'alloc_kib': alloc,
+            }}}
+        baseline = report(10.0, 20.0, 4, 100.0)
+        self.assertEqual(compare(baseline, report(11.5, 23.0, 4, 115.0), tolerance=0.2), [])
+        self.assertEqual(compare(baseline, report(13.0, 20.0, 5, 150.0), tolerance=0.2), [
+            'home_page: p50_ms 10.0 -> 13.0',
+            'home_page: queries 4 -> 5',
+            'home_page: alloc_kib 100.0 -> 150.0',
+        ])
+        # Sub-millisecond changes are noise
+        self.assertEqual(compare(report(0.5, 1.0, 1, 10.0), report(0.9, 1.4, 1, 10.0)), [])
+
+
+class LoadTestHarnessTests(FreshCachesMixin, LiveServerTestCase):
+    def setUp(self):
+        super().setUp()
+        DatasetGenerator(rooms=3, users=6, reservations=30, notifications=30, seed=5,
+                         password='load-test-pw').generate()
+
+    def test_sessions_book_without_double_bookings(self):
+        # The live server shares one in-memory SQLite connection between its
+        # threads, so requests go one at a time
+        test = LoadTest(self.live_server_url, users=4, password='load-test-pw', admin='gen5_0',
+                        iterations=2, user_template='gen5_{}', seed=1, concurrency=1)
+        report = asyncio.run(test.run())
+        operations = report['operations']
+        self.assertEqual(operations['login']['ok'], 5)
+        self.assertEqual(operations['availability']['requests'], 7 * operations['search_rooms']['requests'])
+        self.assertGreater(report['reservations_created'], 0)
+        self.assertEqual(report['error_rate'], 0.0, operations)
+        self.assertEqual(report['double_bookings'], [])
+        approved = Reservation.objects.filter(pk__in=list(test.created), status='APPROVED')
+        self.assertTrue(approved.exists())
+
+    def test_overlaps_are_found_per_room(self):
+        def booking(id, room, start, end, status='APPROVED'):
+            return {'id': id, 'room_id': room, 'status': status, 'start_time': start, 'end_time': end}
+        self.assertEqual(find_overlaps([
+            booking(1, 1, 9, 10), booking(2, 1, 10, 11), booking(3, 1, 10, 12, 'CANCELLED'),
+            booking(4, 2, 9, 11), booking(5, 2, 10, 11, 'PENDING'),
+        ]), [(4, 5)])
+
+
+class MemoryProfilingTests(FreshCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        reset_memory_stats()
+        self.addCleanup(reset_memory_stats)
+        if not tracemalloc.is_tracing():
+            self.addCleanup(tracemalloc.stop)
+        self.staff = User.objects.create_user('memstaff', password='pw', is_staff=True)
+        Profile.objects.create(user=self.staff, is_admin=True)
+        room = Room.objects.create(name='Memory Room', floor=1, room_number='M-101', capacity=6)
+        start = timezone.now() + timedelta(days=2)
+        for hour in range(3):
+            Reservation.objects.create(
+                user=self.staff, room=room, title=f'Booking {hour}',
+                start_time=start + timedelta(hours=hour), end_time=start + timedelta(hours=hour, minutes=30),
+            )
+
+    def profiled_client(self, **overrides):
+        override = override_settings(MEMORY_PROFILING=True, **overrides)
+        override.enable()
+        self.addCleanup(override.disable)
+        client = Client()
+        client.force_login(self.staff)
+        return client
+
+    def test_list_request_reports_peak_sites_and_serializer_sizes(self):
+        client = self.profiled_client()
+        self.assertEqual(client.get('/api/reservations/').status_code, 200)
+
+        stats = memory_stats()
+        self.assertTrue(stats['tracing'])
+        route = next(row for row in stats['routes'] if row['route'].endswith('reservation-list'))
+        self.assertEqual(route['requests'], 1)
+        self.assertGreater(route['max_peak_kib'], 0)
+        serializers = {row['serializer']: row for row in stats['serializers']}
+        self.assertEqual(serializers['ReservationSerializer']['objects'], 3)
+        self.assertEqual(serializers['RoomSerializer']['objects'], 3)
+        # A reservation's size includes its nested user and room
+        self.assertGreater(
+            serializers['ReservationSerializer']['avg_bytes'],
+            serializers['RoomSerializer']['avg_bytes'],
+        )
+        recent = stats['recent'][0]
+        self.assertEqual(recent['path'], '/api/reservations/')
+        self.assertEqual(recent['serializers']['ReservationSerializer']['objects'], 3)
+        self.assertTrue(recent['top_sites'])
+        self.assertLessEqual(len(recent['top_sites']), 10)
+        self.assertTrue(all(site['kib'] > 0 for site in recent['top_sites']))
+
+    def test_stats_endpoint_is_admin_only(self):
+        client = self.profiled_client(MEMORY_PROFILING_TOP=0)
+        client.get('/api/reservations/')
+        response = client.get('/api/admin/memory/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['recent'][0]['top_sites'], [])
+        self.assertEqual(Client().get('/api/admin/memory/').status_code, 403)
+
+    def test_disabled_by_default(self):
+        client = Client()
+        client.force_login(self.staff)
+        client.get('/api/reservations/')
+        stats = memory_stats()
+        self.assertEqual(stats['routes'], [])
+        self.assertEqual(stats['serializers'], [])
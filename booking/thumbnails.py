@@ -0,0 +1,164 @@
+"""
+Resized WebP and JPEG variants of room images.
+
+Variants are stored under names derived from the SHA-256 of the source
+image, so re-uploading the same photo (or regenerating after a restart)
+reuses files already on disk. The generated names are recorded in
+``Room.thumbnails``::
+
+    {'source': 'room_images/x.jpg', 'digest': '...',
+     'variants': {'webp': [[320, 'room_thumbs/...'], ...], 'jpeg': [...]}}
+
+Generation runs on a small thread pool after the saving transaction
+commits, so uploads don't wait for resizing. Set
+``ROOM_THUMBNAIL_WORKERS = 0`` to generate inline instead.
+"""
+import hashlib
+import io
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (320, 640, 960, 1280)
+DEFAULT_WORKERS = 2
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+THUMBNAIL_DIR = 'room_thumbs'
+THUMBNAIL_NAME = re.compile(
+    rf"^{THUMBNAIL_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{16}}/\d+w\.(?:{'|'.join(FORMATS)})$"
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def is_thumbnail_name(name):
+    """Whether ``name`` is a generated variant, whose content never changes."""
+    return THUMBNAIL_NAME.match(name) is not None
+
+
+def get_widths():
+    return tuple(sorted(getattr(settings, 'ROOM_IMAGE_WIDTHS', DEFAULT_WIDTHS)))
+
+
+def get_executor():
+    """Return the shared thumbnail worker pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ROOM_THUMBNAIL_WORKERS', DEFAULT_WORKERS),
+                thread_name_prefix='room-thumbnails'
+            )
+        return _executor
+
+
+def thumbnails_stale(room):
+    """Whether ``room.thumbnails`` no longer matches ``room.image``."""
+    source = room.image.name if room.image else None
+    return (room.thumbnails or {}).get('source') != source
+
+
+def schedule_thumbnails(room_id, using='default'):
+    """Refresh a room's thumbnails once the current transaction commits."""
+    def run():
+        if getattr(settings, 'ROOM_THUMBNAIL_WORKERS', DEFAULT_WORKERS) == 0:
+            refresh_thumbnails(room_id, using)
+        else:
+            get_executor().submit(_refresh_in_worker, room_id, using)
+
+    transaction.on_commit(run, using=using)
+
+
+def _refresh_in_worker(room_id, using):
+    try:
+        refresh_thumbnails(room_id, using)
+    except Exception:
+        logger.exception("Thumbnail generation failed for room %s", room_id)
+    finally:
+        # Worker threads hold their own connections
+        connections.close_all()
+
+
+def refresh_thumbnails(room_id, using='default'):
+    """Generate thumbnails for a room's current image and record them."""
+    from .catalog import bump_version
+    from .models import Room
+
+    room = Room.objects.using(using).filter(pk=room_id).only('id', 'image', 'thumbnails').first()
+    if room is None:
+        return None
+
+    rooms = Room.objects.using(using).filter(pk=room_id)
+    if room.image:
+        thumbnails = generate_thumbnails(room.image)
+        # Skip the write if the image was replaced while we were resizing
+        rooms = rooms.filter(image=room.image.name)
+    else:
+        thumbnails = {}
+    # Touch updated_at so fragments cached on it are re-rendered
+    updated = rooms.update(thumbnails=thumbnails, updated_at=timezone.now())
+    if updated:
+        bump_version(using=using)
+    return thumbnails
+
+
+def generate_thumbnails(image):
+    """Write the variants of ``image`` that don't exist yet and describe them."""
+    from PIL import Image, ImageOps
+
+    with image.open('rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    prefix = f'{THUMBNAIL_DIR}/{digest[:2]}/{digest[:16]}'
+
+    with Image.open(io.BytesIO(data)) as original:
+        largest = get_widths()[-1]
+        # Let the JPEG decoder downscale while decoding
+        original.draft('RGB', (largest, largest))
+        picture = ImageOps.exif_transpose(original)
+        if picture.mode != 'RGB':
+            picture = picture.convert('RGB')
+
+        widths = [width for width in get_widths() if width < picture.width] or [picture.width]
+        variants = {fmt: [] for fmt in FORMATS}
+        for width in widths:
+            resized = None
+            for fmt, (pil_format, save_options) in FORMATS.items():
+                name = f'{prefix}/{width}w.{fmt}'
+                if not default_storage.exists(name):
+                    if resized is None:
+                        height = max(1, round(picture.height * width / picture.width))
+                        resized = picture.resize((width, height), Image.LANCZOS)
+                    buffer = io.BytesIO()
+                    resized.save(buffer, pil_format, **save_options)
+                    default_storage.save(name, ContentFile(buffer.getvalue()))
+                variants[fmt].append([width, name])
+
+    return {'source': image.name, 'digest': digest, 'variants': variants}
+
+
+def srcset(room, fmt):
+    """Return the ``srcset`` attribute value for one format, or ''."""
+    variants = (room.thumbnails or {}).get('variants', {}).get(fmt, ())
+    return ', '.join(f'{default_storage.url(name)} {width}w' for width, name in variants)
+
+
+def fallback_url(room, width=640):
+    """URL of the JPEG variant closest to ``width``, or of the original image."""
+    variants = (room.thumbnails or {}).get('variants', {}).get('jpeg')
+    if not variants:
+        return room.image.url if room.image else None
+    width, name = min(variants, key=lambda variant: abs(variant[0] - width))
+    return default_storage.url(name)
@@ -60,4 +60,7 @@ urlpatterns = [
     path('admin/rooms/<int:pk>/delete/', views.delete_room, name='room-delete'),
     path('admin/reservations/', views.manage_reservations, name='manage-reservations'),
     path('admin/reservations/<int:pk>/<str:status>/', views.update_reservation_status, name='update-reservation-status'),
+
+    # Staff diagnostics
+    path('staff/slow-queries/', views.slow_queries, name='slow-queries'),
 ]
@@ -0,0 +1,61 @@
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+
+
+# Room for every IANA zone; names come from user input, so misses must not grow it forever
+@lru_cache(maxsize=1024)
+def get_zoneinfo(name):
+    """Return the ZoneInfo for an IANA time zone name, or None if it is unknown."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def validate_timezone(value):
+    if value and get_zoneinfo(value) is None:
+        raise ValidationError(f"{value} is not a known time zone.")
+
+
+def day_window(day, tz=None):
+    """
+    Return the ``[start, end)`` timestamps covering ``day`` in ``tz``.
+
+    Defaults to the active timezone, so the window follows whatever
+    TimezoneMiddleware activated for the request.
+    """
+    tz = tz or timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def date_range_window(start_date=None, end_date=None, tz=None):
+    """
+    Return the ``[start, end)`` timestamps covering the inclusive date range.
+
+    Either bound may be omitted, in which case it is returned as ``None``.
+    """
+    start = day_window(start_date, tz)[0] if start_date else None
+    end = day_window(end_date, tz)[1] if end_date else None
+    return start, end
+
+
+def overlap_q(start=None, end=None, prefix=''):
+    """
+    Build a filter matching reservations that overlap ``[start, end)``.
+
+    Compares the raw ``start_time``/``end_time`` columns so the lookup can
+    use the reservation indexes, and includes bookings that cross midnight.
+    """
+    q = Q()
+    if end is not None:
+        q &= Q(**{f'{prefix}start_time__lt': end})
+    if start is not None:
+        q &= Q(**{f'{prefix}end_time__gt': start})
+    return q
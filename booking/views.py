@@ -1,16 +1,28 @@
+import mimetypes
+import os
+import re
+import stat
 from datetime import timedelta, datetime, time
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages, auth
 from django.utils import timezone
 from django.db.models import Q
-from django.http import JsonResponse
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
 from django.core.paginator import Paginator
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.forms import UserChangeForm
 from django.views.decorators.http import require_http_methods
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 
 
 def is_admin_user(user):
@@ -27,6 +39,16 @@ from .forms import (
     RoomSearchForm
 )
 from .models import Reservation, Room, Notification, Profile, User
+from .catalog import get_room_catalog
+from .metrics import count_reservation_event
+from .page_cache import anonymous_page_cache
+from .query_budget import query_budget
+from .room_state import get_room_states
+from .search import search_rooms
+from . import slow_queries as slow_query_log
+from .storage import content_hash
+from .thumbnails import is_thumbnail_name
+from .utils import day_window, date_range_window, overlap_q
 
 
 def register(request):
@@ -46,6 +68,9 @@ def register(request):
     return render(request, 'booking/auth/register.html', {'form': form})
 
 
+# Short TTL: the page lists the rooms free right now
+@query_budget(12)
+@anonymous_page_cache(settings.PAGE_CACHE_HOME_TIMEOUT)
 def home(request):
     """View for the home page."""
     from datetime import timedelta
@@ -60,7 +85,7 @@ def home(request):
             user=request.user,
             start_time__gte=timezone.now(),
             status='APPROVED'
-        ).order_by('start_time')[:3]
+        ).select_related('room').order_by('start_time')[:3]
         
         # Get unread notifications
         unread_notifications = Notification.objects.filter(
@@ -70,13 +95,11 @@ def home(request):
     
     # Get available rooms for the next 2 hours
     now = timezone.now()
-    available_rooms = Room.objects.filter(
-        is_active=True
-    ).exclude(
-        reservations__start_time__lt=now + timedelta(hours=2),
-        reservations__end_time__gt=now,
-        reservations__status__in=['PENDING', 'APPROVED']
-    )[:5]
+    states = get_room_states(now)
+    available_rooms = [
+        room for room in get_room_catalog().rooms
+        if room.pk not in states or states[room.pk].is_free(now, now + timedelta(hours=2))
+    ][:5]
     
     context = {
         'upcoming_reservations': upcoming_reservations,
@@ -86,15 +109,18 @@ def home(request):
     return render(request, 'booking/home.html', context)
 
 
+@method_decorator(anonymous_page_cache(settings.PAGE_CACHE_TIMEOUT), name='dispatch')
 class RoomListView(ListView):
     """View for listing all available rooms with filtering options."""
+    query_budget = 8
     model = Room
     template_name = 'booking/room_list.html'
     context_object_name = 'rooms'
     paginate_by = 15  # Increased from 10 to show more rooms per page
     
     def get_queryset(self):
-        queryset = Room.objects.filter(is_active=True)
+        # Rooms come from the in-process catalog; only full-text search
+        # needs to hit the database.
         
         # Get search query
         search_query = self.request.GET.get('q', '').strip()
@@ -106,53 +132,57 @@ class RoomListView(ListView):
             # Remove capacity from search query
             search_query = ''
         
-        # Apply text-based search if there's a search query
+        # Apply full-text search if there's a search query, keeping rank order
+        ranked_ids = None
         if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(room_type__icontains=search_query)
-            )
+            ranked_ids = list(search_rooms(
+                Room.objects.filter(is_active=True), search_query
+            ).values_list('pk', flat=True))
         
         # Apply capacity filter (from search or dedicated field)
         capacity = self.request.GET.get('capacity')
+        min_capacity = None
         if capacity and capacity.isdigit():
-            queryset = queryset.filter(capacity__gte=int(capacity))
+            min_capacity = int(capacity)
         elif capacity_from_search is not None:
-            queryset = queryset.filter(capacity__gte=capacity_from_search)
+            min_capacity = capacity_from_search
         
-        # Apply other filters
-        room_type = self.request.GET.get('room_type')
-        has_projector = self.request.GET.get('has_projector') == 'on'
-        has_whiteboard = self.request.GET.get('has_whiteboard') == 'on'
-        has_video = self.request.GET.get('has_video') == 'on'
+        # Amenity filters, matched together against the amenity bitmask
+        amenities = [
+            field for name, field in Room.AMENITIES
+            if self.request.GET.get(field) == 'on'
+        ]
+        if self.request.GET.get('has_video') == 'on':  # Older search links
+            amenities.append('has_video_conference')
         
-        if room_type:
-            queryset = queryset.filter(room_type=room_type)
-        if has_projector:
-            queryset = queryset.filter(has_projector=True)
-        if has_whiteboard:
-            queryset = queryset.filter(has_whiteboard=True)
-        if has_video:
-            queryset = queryset.filter(has_video_conference=True)
-            
-        return queryset.order_by('name')
+        # Keep the snapshot so the grid's cache key matches what is listed
+        self.catalog = get_room_catalog()
+        return self.catalog.filter(
+            room_type=self.request.GET.get('room_type'),
+            min_capacity=min_capacity,
+            amenities=Room.amenity_mask(amenities),
+            ids=ranked_ids,
+        )
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['search_form'] = RoomSearchForm(self.request.GET or None)
+        # Fragment cache keys for the room grid
+        context['catalog_version'] = self.catalog.version
+        context['room_grid_key'] = ','.join(str(room.pk) for room in context['object_list'])
         return context
 
 
 class RoomDetailView(DetailView):
     """View for displaying room details and availability."""
+    query_budget = 8
     model = Room
     template_name = 'booking/room_detail.html'
     context_object_name = 'room'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        room = self.get_object()
+        room = self.object
         
         # Get upcoming reservations for this room
         upcoming_reservations = room.reservations.filter(
@@ -174,6 +204,7 @@ class RoomDetailView(DetailView):
         return context
 
 
+@query_budget({'get': 10, 'default': 20})
 @login_required
 def create_reservation(request, room_id=None):
     """View for creating a new reservation."""
@@ -189,6 +220,7 @@ def create_reservation(request, room_id=None):
             
             # Check if the room is available
             if not reservation.room.is_available(reservation.start_time, reservation.end_time):
+                count_reservation_event('conflict')
                 messages.error(request, 'The selected time slot is not available. Please choose a different time.')
             else:
                 # For admin users, set status to approved directly
@@ -203,6 +235,8 @@ def create_reservation(request, room_id=None):
                 
                 messages.success(request, 'Your reservation has been submitted successfully!', extra_tags='toast')
                 return redirect('booking:home')
+        elif form.slot_taken:
+            count_reservation_event('conflict')
     else:
         initial = {}
         if room:
@@ -217,6 +251,7 @@ def create_reservation(request, room_id=None):
 
 class ReservationDetailView(LoginRequiredMixin, DetailView):
     """View for displaying reservation details."""
+    query_budget = 8
     model = Reservation
     template_name = 'booking/reservation_detail.html'
     context_object_name = 'reservation'
@@ -231,6 +266,7 @@ class ReservationDetailView(LoginRequiredMixin, DetailView):
 
 class ReservationUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     """View for updating a reservation."""
+    query_budget = {'get': 12, 'default': 20}
     model = Reservation
     form_class = ReservationForm
     template_name = 'booking/reservation_form.html'
@@ -259,6 +295,11 @@ class ReservationUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView)
         messages.success(self.request, 'Reservation updated successfully!')
         return super().form_valid(form)
 
+    def form_invalid(self, form):
+        if form.slot_taken:
+            count_reservation_event('conflict')
+        return super().form_invalid(form)
+
 
 @login_required
 @require_http_methods(['POST'])
@@ -322,10 +363,13 @@ def profile_update(request):
     })
 
 
+@query_budget(8)
 @login_required
 def my_reservations(request):
     """View for users to see their reservations."""
-    reservations = Reservation.objects.filter(user=request.user).order_by('-start_time')
+    reservations = Reservation.objects.filter(
+        user=request.user
+    ).select_related('room').order_by('-start_time')
     
     # Filter by status if provided
     status = request.GET.get('status')
@@ -401,11 +445,13 @@ def manage_reservations(request):
     
     if start_date:
         start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-        reservations = reservations.filter(start_time__date__gte=start_date)
     
     if end_date:
         end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-        reservations = reservations.filter(end_time__date__lte=end_date)
+    
+    if start_date or end_date:
+        range_start, range_end = date_range_window(start_date, end_date)
+        reservations = reservations.filter(overlap_q(range_start, range_end))
     
     # Pagination
     paginator = Paginator(reservations, 20)
@@ -413,7 +459,7 @@ def manage_reservations(request):
     page_obj = paginator.get_page(page_number)
     
     # Get all rooms for filter dropdown
-    rooms = Room.objects.all()
+    rooms = get_room_catalog().all_rooms
     
     return render(request, 'booking/admin/manage_reservations.html', {
         'page_obj': page_obj,
@@ -426,6 +472,21 @@ def manage_reservations(request):
     })
 
 
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+@require_http_methods(['GET', 'POST'])
+def slow_queries(request):
+    """Recent slow queries with their plans (admin only)."""
+    if request.method == 'POST':
+        slow_query_log.clear_slow_queries()
+        messages.success(request, 'Slow-query log cleared.')
+        return redirect('booking:slow-queries')
+    return render(request, 'booking/slow_queries.html', {
+        'queries': slow_query_log.slow_queries(),
+        'threshold_ms': settings.SLOW_QUERY_THRESHOLD_MS,
+    })
+
+
 @login_required
 @require_http_methods(['POST'])
 def mark_notification_read(request, notification_id):
@@ -446,7 +507,7 @@ def get_room_availability(request, room_id):
         # Parse the date and make it timezone-aware
         naive_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         tz = timezone.get_current_timezone()
-        start_of_day = timezone.make_aware(datetime.combine(naive_date, time(0, 0)), tz)
+        start_of_day, end_of_day = day_window(naive_date, tz)
     except ValueError:
         return JsonResponse({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
     
@@ -456,9 +517,9 @@ def get_room_availability(request, room_id):
     workday_start = timezone.make_aware(datetime.combine(naive_date, time(9, 0)), tz)
     workday_end = timezone.make_aware(datetime.combine(naive_date, time(17, 0)), tz)
     
-    # Get all reservations for this room on the given date
+    # Get all reservations for this room that overlap the given date
     reservations = room.reservations.filter(
-        start_time__date=naive_date,
+        overlap_q(start_of_day, end_of_day),
         status__in=['PENDING', 'APPROVED']
     ).order_by('start_time')
     
@@ -576,6 +637,111 @@ def update_reservation_status(request, pk, status):
     return redirect('manage-reservations')
 
 
+MEDIA_CHUNK_SIZE = 64 * 1024
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+@require_http_methods(['GET', 'HEAD'])
+def serve_media(request, path):
+    """
+    Serve an uploaded file from MEDIA_ROOT.
+
+    Supports ETag/If-None-Match revalidation and single byte ranges, and
+    hands the transfer to the front-end server when ``MEDIA_SENDFILE`` is
+    ``'x-sendfile'`` (Apache, lighttpd) or ``'x-accel-redirect'`` (nginx).
+    Content-addressed files and thumbnail variants are cached for a year.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        file_stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('File not found')
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404('File not found')
+
+    digest = content_hash(path)
+    etag = f'"{digest}"' if digest else f'"{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"'
+    immutable = digest is not None or is_thumbnail_name(path)
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'public, max-age=31536000, immutable' if immutable else 'public, max-age=3600',
+    }
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        return HttpResponseNotModified(headers=headers)
+
+    headers['Last-Modified'] = http_date(file_stat.st_mtime)
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    sendfile = getattr(settings, 'MEDIA_SENDFILE', None)
+    if sendfile == 'x-accel-redirect':
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        headers['X-Accel-Redirect'] = prefix + quote(path)
+        return HttpResponse(content_type=content_type, headers=headers)
+    if sendfile == 'x-sendfile':
+        headers['X-Sendfile'] = full_path
+        return HttpResponse(content_type=content_type, headers=headers)
+
+    headers['Accept-Ranges'] = 'bytes'
+    size = file_stat.st_size
+    byte_range = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if byte_range and (not if_range or if_range.strip() == etag):
+        try:
+            span = parse_byte_range(byte_range, size)
+        except ValueError:
+            headers['Content-Range'] = f'bytes */{size}'
+            return HttpResponse(status=416, headers=headers)
+        if span is not None:
+            start, end = span
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+            headers['Content-Length'] = str(end - start + 1)
+            return StreamingHttpResponse(
+                read_file_range(full_path, start, end - start + 1),
+                status=206, content_type=content_type, headers=headers
+            )
+
+    response = FileResponse(open(full_path, 'rb'), content_type=content_type, headers=headers)
+    response.block_size = MEDIA_CHUNK_SIZE
+    return response
+
+
+def parse_byte_range(header, size):
+    """
+    Return the inclusive ``(start, end)`` of a single-range ``Range`` header.
+
+    Returns None for headers we don't handle (multiple ranges, other units),
+    so the whole file is sent; raises ValueError if the range can't be
+    satisfied.
+    """
+    match = BYTE_RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size or size == 0:
+        raise ValueError(header)
+    return start, end
+
+
+def read_file_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(MEDIA_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
 def handler400(request, exception, template_name='400.html'):
     """Handle 400 Bad Request errors."""
     response = render(request, template_name, status=400)